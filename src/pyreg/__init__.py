@@ -5,12 +5,9 @@ Last modified $Date$
 """
 # Search for #Py3k in the source to find areas that need work when Python3 comes out
 from __future__ import absolute_import
-import _winreg
-from .types import Binary, DWORD, DWORD_BigEndian, DWORD_LittleEndian, ExpandingString, Link, MultiString, ResourceList, String, rNone
-from .key import Key
-from .roots import HKEY_CLASSES_ROOT, HKEY_CURRENT_CONFIG, HKEY_CURRENT_USER, HKEY_DYN_DATA, HKEY_LOCAL_MACHINE, HKEY_PERFORMANCE_DATA, HKEY_PERFORMANCE_NLSTEXT, HKEY_PERFORMANCE_TEXT, HKEY_USERS
+from . import _lazy
 __all__ = (
-	'Binary', 'DWORD', 'DWORD_BigEndian', 'DWORD_LittleEndian', 'ExpandingString', 'Link', 'MultiString', 'ResourceList', 'String', 'rNone', 'Key',
+	'Binary', 'DWORD', 'DWORD_BigEndian', 'DWORD_LittleEndian', 'ExpandingString', 'Link', 'MultiString', 'QWORD', 'QWORD_LittleEndian', 'ResourceList', 'String', 'rNone', 'Key', 'Hive',
 		'HKEY_CLASSES_ROOT', 'HKEY_CURRENT_CONFIG', 'HKEY_CURRENT_USER', 'HKEY_DYN_DATA', 'HKEY_LOCAL_MACHINE', 'HKEY_PERFORMANCE_DATA', 'HKEY_PERFORMANCE_NLSTEXT', 'HKEY_PERFORMANCE_TEXT', 'HKEY_USERS',
 		'KEY_ALL_ACCESS', 'KEY_CREATE_LINK', 'KEY_CREATE_SUB_KEY', 'KEY_ENUMERATE_SUB_KEYS', 'KEY_EXECUTE', 'KEY_NOTIFY', 'KEY_QUERY_VALUE', 'KEY_READ', 'KEY_SET_VALUE', 'KEY_WRITE'
 		)
@@ -24,17 +21,6 @@ __all__ = (
 ##	"""The requested predefined key is not available in this version of Windows."""
 ##	key = 0
 
-#Constants forwarded from _winreg
-KEY_ALL_ACCESS          = _winreg.KEY_ALL_ACCESS
-KEY_CREATE_LINK         = _winreg.KEY_CREATE_LINK
-KEY_CREATE_SUB_KEY      = _winreg.KEY_CREATE_SUB_KEY
-KEY_ENUMERATE_SUB_KEYS  = _winreg.KEY_ENUMERATE_SUB_KEYS
-KEY_EXECUTE             = _winreg.KEY_EXECUTE
-KEY_NOTIFY              = _winreg.KEY_NOTIFY
-KEY_QUERY_VALUE         = _winreg.KEY_QUERY_VALUE
-KEY_READ                = _winreg.KEY_READ
-KEY_SET_VALUE           = _winreg.KEY_SET_VALUE
-KEY_WRITE               = _winreg.KEY_WRITE
 ##REG_CREATED_NEW_KEY         = 1
 ##REG_FULL_RESOURCE_DESCRIPTOR = 9
 ##REG_LEGAL_CHANGE_FILTER = 15
@@ -53,3 +39,15 @@ KEY_WRITE               = _winreg.KEY_WRITE
 ##REG_OPTION_VOLATILE = 1
 ##REG_REFRESH_HIVE = 2
 ##REG_WHOLE_HIVE_VOLATILE = 1
+
+# Nothing is imported until it is used, so that importing pyreg is quick;
+# see pyreg._lazy
+_lazy.lazy(__name__, {
+	'types': ('Binary', 'DWORD', 'DWORD_BigEndian', 'DWORD_LittleEndian', 'ExpandingString', 'Link', 'MultiString', 'QWORD', 'QWORD_LittleEndian', 'ResourceList', 'String', 'rNone'),
+	'key': ('Key',),
+	'roots': ('HKEY_CLASSES_ROOT', 'HKEY_CURRENT_CONFIG', 'HKEY_CURRENT_USER', 'HKEY_DYN_DATA', 'HKEY_LOCAL_MACHINE', 'HKEY_PERFORMANCE_DATA', 'HKEY_PERFORMANCE_NLSTEXT', 'HKEY_PERFORMANCE_TEXT', 'HKEY_USERS'),
+	'hive': ('Hive',),
+	#Constants forwarded from pyreg.backend
+	'backend': ('KEY_ALL_ACCESS', 'KEY_CREATE_LINK', 'KEY_CREATE_SUB_KEY', 'KEY_ENUMERATE_SUB_KEYS', 'KEY_EXECUTE', 'KEY_NOTIFY', 'KEY_QUERY_VALUE', 'KEY_READ', 'KEY_SET_VALUE', 'KEY_WRITE'),
+	}, ('aio', 'backend', 'batch', 'cache', 'changes', 'diff', 'flush', 'hive', 'index', 'instrument', 'key', 'keypath',
+		'memory', 'perf', 'pool', 'regfile', 'roots', 'scan', 'types'))
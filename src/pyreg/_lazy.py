@@ -0,0 +1,72 @@
+"""
+pyreg._lazy - Modules whose attributes are only imported when they are used
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import imp, sys
+from types import ModuleType
+
+__all__ = 'LazyModule', 'lazy'
+
+class LazyModule(ModuleType):
+	"""
+	A module some of whose attributes are only imported (or made) the first
+	time they are looked up, after which they are ordinary attributes.
+	"""
+	__slots__ = ('_module', '_imports', '_makers')
+	def __init__(self, module, imports, makers):
+		"""Initializer. module is the module being replaced; imports maps
+		attributes to the modules they are imported from, and makers maps
+		attributes to what makes them."""
+		ModuleType.__init__(self, module.__name__, module.__doc__)
+		self.__dict__.update(module.__dict__)
+		# The module's functions still use its globals, and Python 2 clears
+		# them when the module goes away #Py3k
+		self._module = module
+		self._imports = imports
+		self._makers = makers
+
+	def __getattr__(self, name):
+		"""x.__getattr__(y) <==> x.y"""
+		if name not in self._imports and name not in self._makers:
+			raise AttributeError("'module' object has no attribute %r" % name)
+		# The import lock, so that everything is only made once
+		imp.acquire_lock()
+		try:
+			if name in self.__dict__:
+				return self.__dict__[name]
+			if name in self._makers:
+				value = self._makers[name]()
+			else:
+				source = self._imports[name]
+				__import__(source)
+				value = sys.modules[source]
+				if source != self.__name__ + '.' + name:
+					value = getattr(value, name)
+			setattr(self, name, value)
+			return value
+		finally:
+			imp.release_lock()
+
+	def __dir__(self):
+		"""x.__dir__() -> list"""
+		return sorted(set(self.__dict__) | set(self._imports) | set(self._makers))
+
+def lazy(name, imports=None, submodules=(), makers=None):
+	"""lazy(name[, imports[, submodules[, makers]]]) -> LazyModule
+
+	Replaces the module called name (from the end of its own code, as it is
+	being imported) with a LazyModule. imports maps submodules of name (eg,
+	'key') to the attributes to import from them, submodules are the
+	submodules to import when they are looked up as attributes, and makers
+	maps attributes to callables that make them."""
+	table = {}
+	for source, attrs in (imports or {}).iteritems():
+		for attr in attrs:
+			table[attr] = name + '.' + source
+	for source in submodules:
+		table[source] = name + '.' + source
+	module = sys.modules[name] = LazyModule(sys.modules[name], table, makers or {})
+	return module
@@ -0,0 +1,112 @@
+"""
+pyreg._lru - A small least-recently-used mapping for pyreg's caches
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+
+__all__ = 'LRU',
+
+# Each link is [prev, next, key, value]
+_PREV, _NEXT, _KEY, _VALUE = 0, 1, 2, 3
+
+class LRU(object):
+	"""A mapping that remembers the order its keys were last used in. get()
+	and set() count as uses. It doesn't limit itself; callers call popOldest()
+	when it is too big. Not thread-safe, callers lock."""
+	__slots__ = ('_map', '_head')
+	def __init__(self):
+		self._map = {}
+		head = self._head = []
+		head[:] = [head, head, None, None]
+
+	def __len__(self):
+		return len(self._map)
+
+	def __contains__(self, key):
+		return key in self._map
+
+	def get(self, key, default=None):
+		"""l.get(key[, default]) -> value
+
+		Returns the value for key and makes it the most recently used."""
+		link = self._map.get(key)
+		if link is None:
+			return default
+		self._touch(link)
+		return link[_VALUE]
+
+	def peek(self, key, default=None):
+		"""l.peek(key[, default]) -> value
+
+		Like get(), but doesn't count as a use."""
+		link = self._map.get(key)
+		if link is None:
+			return default
+		return link[_VALUE]
+
+	def set(self, key, value):
+		"""l.set(key, value) -> None"""
+		link = self._map.get(key)
+		if link is None:
+			head = self._head
+			last = head[_PREV]
+			link = [last, head, key, value]
+			last[_NEXT] = head[_PREV] = self._map[key] = link
+		else:
+			link[_VALUE] = value
+			self._touch(link)
+
+	def pop(self, key, default=None):
+		"""l.pop(key[, default]) -> value
+
+		Removes key, returning its value."""
+		link = self._map.pop(key, None)
+		if link is None:
+			return default
+		link[_PREV][_NEXT] = link[_NEXT]
+		link[_NEXT][_PREV] = link[_PREV]
+		return link[_VALUE]
+
+	def popOldest(self):
+		"""l.popOldest() -> (key, value)
+
+		Removes and returns the least recently used item."""
+		link = self._head[_NEXT]
+		if link is self._head:
+			raise KeyError("popOldest(): LRU is empty")
+		self.pop(link[_KEY])
+		return link[_KEY], link[_VALUE]
+
+	def keys(self):
+		"""l.keys() -> list
+
+		Returns the keys, least recently used first."""
+		rv = []
+		link = self._head[_NEXT]
+		while link is not self._head:
+			rv.append(link[_KEY])
+			link = link[_NEXT]
+		return rv
+
+	def clear(self):
+		"""l.clear() -> None"""
+		# Break the links up, so that what they hold goes away right away
+		# rather than when the cycles are collected
+		for link in self._map.itervalues():
+			del link[:]
+		self._map.clear()
+		head = self._head
+		head[:] = [head, head, None, None]
+
+	def _touch(self, link):
+		head = self._head
+		if head[_PREV] is link:
+			return
+		link[_PREV][_NEXT] = link[_NEXT]
+		link[_NEXT][_PREV] = link[_PREV]
+		last = head[_PREV]
+		link[_PREV] = last
+		link[_NEXT] = head
+		last[_NEXT] = head[_PREV] = link
@@ -0,0 +1,363 @@
+"""
+pyreg.aio - Keys for event loops, which make their calls on other threads
+By Jamie Bliss
+Last modified $Date$
+
+Nothing here can be awaited, or used with async for: pyreg is Python 2 only,
+and those need Python 3. (#Py3k) Calls return Futures instead, which are
+handed to the loop with add_done_callback().
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import itertools, sys, threading
+from collections import deque
+
+__all__ = ('AsyncKey', 'Executor', 'Future', 'getExecutor', 'setExecutor')
+
+class Future(object):
+	"""
+	The result of a call made on an Executor, once there is one. Can be
+	waited for with result(), or handed to an event loop with
+	add_done_callback().
+	"""
+	__slots__ = ('_event', '_result', '_exc', '_callbacks', '_lock')
+	def __init__(self):
+		self._event = threading.Event()
+		self._lock = threading.Lock()
+		self._result = self._exc = None
+		self._callbacks = []
+
+	def done(self):
+		"""f.done() -> bool"""
+		return self._event.isSet()
+
+	def result(self, timeout=None):
+		"""f.result([timeout]) -> object
+
+		Waits for the call to finish, and returns what it returned (or raises
+		what it raised)."""
+		if not self._event.wait(timeout) and not self._event.isSet():
+			raise RuntimeError("Timed out")
+		if self._exc is not None:
+			raise self._exc[0], self._exc[1], self._exc[2]
+		return self._result
+
+	def add_done_callback(self, fn):
+		"""f.add_done_callback(fn) -> None
+
+		Calls fn(f) when the call finishes (right away if it has), in the
+		thread that finished it."""
+		self._lock.acquire()
+		try:
+			if not self._event.isSet():
+				self._callbacks.append(fn)
+				return
+		finally:
+			self._lock.release()
+		fn(self)
+
+	def _set(self, result, exc=None):
+		self._lock.acquire()
+		try:
+			self._result, self._exc = result, exc
+			self._event.set()
+			callbacks, self._callbacks = self._callbacks, None
+		finally:
+			self._lock.release()
+		for fn in callbacks:
+			fn(self)
+
+class Executor(object):
+	"""
+	Runs calls on a fixed number of threads, so that any number of callers
+	using AsyncKeys share the same few threads. submit() never blocks: it
+	queues the call and returns its Future straight away. To keep from
+	getting arbitrarily far ahead of the registry, a caller can wait for
+	ready() first, which is done once fewer than maxpending calls are
+	waiting for a thread. Nothing makes callers do that, though.
+	"""
+	def __init__(self, workers=4, maxpending=256):
+		"""Initializer. Threads are started as they are needed."""
+		self.workers = workers
+		self.maxpending = maxpending
+		self._cond = threading.Condition(threading.Lock())
+		self._pending = deque()
+		self._ready = []
+		self._threads = []
+		self._idle = 0
+		self._shutdown = False
+
+	def submit(self, fn, *args, **kwargs):
+		"""e.submit(fn, *args, **kwargs) -> Future
+
+		Arranges for fn(*args, **kwargs) to be called on one of the threads,
+		without waiting for there to be room (see ready())."""
+		future = Future()
+		cond = self._cond
+		cond.acquire()
+		try:
+			if self._shutdown:
+				raise RuntimeError("The executor has been shut down")
+			self._pending.append((future, fn, args, kwargs))
+			if len(self._pending) > self._idle and len(self._threads) < self.workers:
+				t = threading.Thread(target=self._work, name='pyreg.aio-%i' % len(self._threads))
+				t.setDaemon(True)
+				t.start()
+				self._threads.append(t)
+			cond.notifyAll()
+		finally:
+			cond.release()
+		return future
+
+	def ready(self):
+		"""e.ready() -> Future
+
+		Returns a Future that is done (with None) once fewer than maxpending
+		calls are waiting for a thread; right away, if that's already so."""
+		future = Future()
+		self._cond.acquire()
+		try:
+			if len(self._pending) >= self.maxpending and not self._shutdown:
+				self._ready.append(future)
+				return future
+		finally:
+			self._cond.release()
+		future._set(None)
+		return future
+
+	def _room(self):
+		"""Returns the ready() Futures to finish, if there is room now. Called
+		with the lock held."""
+		if self._ready and (len(self._pending) < self.maxpending or self._shutdown):
+			ready, self._ready = self._ready, []
+			return ready
+		return ()
+
+	def shutdown(self, wait=True):
+		"""e.shutdown([wait]) -> None
+
+		Stops the threads once the calls already submitted are done. If wait,
+		waits for that."""
+		self._cond.acquire()
+		try:
+			self._shutdown = True
+			ready = self._room()
+			self._cond.notifyAll()
+		finally:
+			self._cond.release()
+		for future in ready:
+			future._set(None)
+		if wait:
+			for t in self._threads:
+				t.join()
+
+	def _work(self):
+		cond = self._cond
+		while True:
+			cond.acquire()
+			try:
+				self._idle += 1
+				while not self._pending and not self._shutdown:
+					cond.wait()
+				self._idle -= 1
+				if not self._pending:
+					return
+				future, fn, args, kwargs = self._pending.popleft()
+				ready = self._room()
+			finally:
+				cond.release()
+			for waiting in ready:
+				waiting._set(None)
+			try:
+				result = fn(*args, **kwargs)
+			except BaseException:
+				future._set(None, sys.exc_info())
+			else:
+				future._set(result)
+
+_executor = None
+_executorLock = threading.Lock()
+
+def getExecutor():
+	"""getExecutor() -> Executor
+
+	Returns the Executor AsyncKeys use unless given another one."""
+	global _executor
+	_executorLock.acquire()
+	try:
+		if _executor is None:
+			_executor = Executor()
+		return _executor
+	finally:
+		_executorLock.release()
+
+def setExecutor(executor):
+	"""setExecutor(executor) -> None
+
+	Changes the Executor AsyncKeys use by default. Passing None goes back to
+	a new one with the default settings."""
+	global _executor
+	_executorLock.acquire()
+	try:
+		_executor = executor
+	finally:
+		_executorLock.release()
+
+class _AsyncIterator(object):
+	"""Runs an iterator on an Executor, chunk items at a time. fetch()
+	returns a Future of the next item, which raises StopIteration after the
+	last one."""
+	__slots__ = ('_executor', '_iterator', '_chunk', '_buffer', '_done')
+	def __init__(self, executor, iterator, chunk):
+		self._executor = executor
+		self._iterator = iterator
+		self._chunk = chunk
+		self._buffer = deque()
+		self._done = False
+
+	def _fill(self):
+		items = list(itertools.islice(self._iterator, self._chunk))
+		if len(items) < self._chunk:
+			self._done = True
+		if not items:
+			raise StopIteration
+		self._buffer.extend(items)
+		return self._buffer.popleft()
+
+	def fetch(self):
+		"""x.fetch() -> Future
+
+		Returns the next item, as a Future. The Future raises StopIteration
+		if there are no more."""
+		if self._buffer:
+			future = Future()
+			future._set(self._buffer.popleft())
+			return future
+		if self._done:
+			future = Future()
+			try:
+				raise StopIteration
+			except StopIteration:
+				future._set(None, sys.exc_info())
+			return future
+		return self._executor.submit(self._fill)
+
+class AsyncKey(object):
+	"""
+	Wraps a Key (or one of the roots, eg HKEY_CURRENT_USER) so that using it
+	from an event loop doesn't block it: each method that needs the
+	registry runs on an Executor and returns a Future, whose callbacks are
+	called on the Executor's thread (so hand them back to the loop, eg with
+	reactor.callFromThread()). Getting subkeys (akey / 'name') doesn't need
+	the registry, so it just returns another AsyncKey.
+
+	  >>> software = AsyncKey(HKEY_CURRENT_USER) / 'Software'
+	  >>> software.get('Spam').add_done_callback(gotSpam)
+	  >>> names = software.keys()
+	  >>> names.fetch().result()
+	  u'Classes'
+	"""
+	__slots__ = ('key', 'executor', 'chunk')
+	def __init__(self, key, executor=None, chunk=64):
+		"""Initializer. key is the Key to wrap. executor is the Executor to
+		use (see getExecutor()); chunk is how many items the iterators get
+		from the registry at a time."""
+		if isinstance(key, AsyncKey):
+			key = key.key
+		self.key = key
+		if executor is None:
+			executor = getExecutor()
+		self.executor = executor
+		self.chunk = chunk
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "AsyncKey(%r)" % (self.key,)
+
+	def __str__(self):
+		"""x.__str__() <==> str(x)"""
+		return str(self.key)
+
+	def __div__(self, other):
+		"""x.__div__(y) <==> x/y
+
+		Returns the AsyncKey of subkey other."""
+		return AsyncKey(self.key / other, self.executor, self.chunk)
+	__truediv__ = __div__
+
+	def _submit(self, fn, *args):
+		return self.executor.submit(fn, *args)
+
+	def get(self, name):
+		"""k.get(name) -> Future
+
+		Gets the value name (like akey[name]). The Future raises KeyError if
+		there isn't one."""
+		return self._submit(self.key.values.__getitem__, name)
+
+	def set(self, name, value):
+		"""k.set(name, value) -> Future
+
+		Sets the value name (like akey[name] = value)."""
+		return self._submit(self.key.values.__setitem__, name, value)
+
+	def delete(self, name):
+		"""k.delete(name) -> Future
+
+		Deletes the value name (like del akey[name])."""
+		return self._submit(self.key.values.__delitem__, name)
+
+	def deleteKey(self, name):
+		"""k.deleteKey(name) -> Future
+
+		Deletes the subkey name (like del akey.keys[name])."""
+		return self._submit(self.key.keys.__delitem__, name)
+
+	def exists(self, name):
+		"""k.exists(name) -> Future
+
+		Whether there is a subkey name (like name in akey)."""
+		return self._submit(self.key.keys.__contains__, name)
+
+	def create(self):
+		"""k.create() -> Future
+
+		Creates the key if it doesn't exist. The result is this AsyncKey."""
+		def create():
+			self.key.create()
+			return self
+		return self._submit(create)
+
+	def snapshot(self):
+		"""k.snapshot() -> Future
+
+		Reads all of the values (see Key.snapshot())."""
+		return self._submit(self.key.snapshot)
+
+	def getMTime(self):
+		"""k.getMTime() -> Future
+
+		Gets the last write time, as a datetime.datetime."""
+		return self._submit(self.key.getMTime)
+
+	def flush(self):
+		"""k.flush() -> Future"""
+		return self._submit(self.key.flush)
+
+	def keys(self):
+		"""k.keys() -> iterator of Futures
+
+		Iterates over the names of the subkeys (see fetch())."""
+		return _AsyncIterator(self.executor, iter(self.key.keys), self.chunk)
+
+	def values(self):
+		"""k.values() -> iterator of Futures
+
+		Iterates over (name, value) for each value."""
+		return _AsyncIterator(self.executor, self.key.values.iteritems(), self.chunk)
+
+	def walk(self, *args, **kwargs):
+		"""k.walk([topdown[, maxdepth[, prune[, onerror]]]]) -> iterator of Futures
+
+		Like Key.walk(), but a Future at a time."""
+		return _AsyncIterator(self.executor, self.key.walk(*args, **kwargs), self.chunk)
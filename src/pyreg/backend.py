@@ -0,0 +1,245 @@
+"""
+pyreg.backend - Defines what Key needs from whatever is behind it
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import struct
+
+__all__ = ('Backend', 'RegistryError', 'getDefault', 'setDefault')
+
+# The registry's constants. These are the same numbers _winreg uses, and are
+# here so that nothing has to import _winreg to get them.
+HKEY_CLASSES_ROOT        = -2147483648
+HKEY_CURRENT_USER        = -2147483647
+HKEY_LOCAL_MACHINE       = -2147483646
+HKEY_USERS               = -2147483645
+HKEY_PERFORMANCE_DATA    = -2147483644
+HKEY_CURRENT_CONFIG      = -2147483643
+HKEY_DYN_DATA            = -2147483642
+#define HKEY_PERFORMANCE_TEXT       (( HKEY ) (ULONG_PTR)((LONG)0x80000050) )
+HKEY_PERFORMANCE_TEXT    = -2147483568
+#define HKEY_PERFORMANCE_NLSTEXT    (( HKEY ) (ULONG_PTR)((LONG)0x80000060) )
+HKEY_PERFORMANCE_NLSTEXT = -2147483552
+
+KEY_QUERY_VALUE         = 0x0001
+KEY_SET_VALUE           = 0x0002
+KEY_CREATE_SUB_KEY      = 0x0004
+KEY_ENUMERATE_SUB_KEYS  = 0x0008
+KEY_NOTIFY              = 0x0010
+KEY_CREATE_LINK         = 0x0020
+KEY_READ                = 0x20019
+KEY_EXECUTE             = 0x20019
+KEY_WRITE               = 0x20006
+KEY_ALL_ACCESS          = 0xF003F
+
+REG_NONE                        = 0
+REG_SZ                          = 1
+REG_EXPAND_SZ                   = 2
+REG_BINARY                      = 3
+REG_DWORD                       = 4
+REG_DWORD_LITTLE_ENDIAN         = 4
+REG_DWORD_BIG_ENDIAN            = 5
+REG_LINK                        = 6
+REG_MULTI_SZ                    = 7
+REG_RESOURCE_LIST               = 8
+REG_FULL_RESOURCE_DESCRIPTOR    = 9
+REG_RESOURCE_REQUIREMENTS_LIST  = 10
+REG_QWORD                       = 11
+REG_QWORD_LITTLE_ENDIAN         = 11
+
+# Error codes (winerror.h) backends raise
+ERROR_FILE_NOT_FOUND = 2
+ERROR_ACCESS_DENIED = 5
+ERROR_INVALID_HANDLE = 6
+ERROR_CALL_NOT_IMPLEMENTED = 120
+ERROR_NO_MORE_ITEMS = 259
+ERROR_BADDB = 1009
+ERROR_KEY_DELETED = 1018
+
+try:
+	RegistryError = WindowsError
+except NameError:
+	class RegistryError(EnvironmentError):
+		"""Stands in for WindowsError off of Windows. errno is the Windows
+		error code."""
+		@property
+		def winerror(self):
+			return self.errno
+
+_dword = struct.Struct('<i')
+
+def _packData(typ, value):
+	"""_packData(typ, value) -> str
+
+	Converts something that could be passed to _winreg.SetValueEx() to the
+	bytes that the registry would store."""
+	if typ == REG_DWORD:
+		if value is None: value = 0
+		return struct.pack('<I', long(value) & 0xFFFFFFFF)
+	elif typ in (REG_SZ, REG_EXPAND_SZ):
+		if value is None: value = u''
+		return (unicode(value) + u'\0').encode('utf-16-le')
+	elif typ == REG_MULTI_SZ:
+		if value is None: value = []
+		if hasattr(value, 'toUTF16'): # LazyMultiString
+			return value.toUTF16()
+		if not value:
+			return '\0\0'
+		return (u'\0'.join(map(unicode, value)) + u'\0\0').encode('utf-16-le')
+	else:
+		if value is None:
+			return ''
+		elif isinstance(value, unicode):
+			# This is what the buffer interface gives on Windows
+			return value.encode('utf-16-le')
+		elif hasattr(value, 'tobytes'): # memoryview
+			return value.tobytes()
+		return str(value)
+
+def _unpackData(typ, raw):
+	"""_unpackData(typ, raw) -> object
+
+	Converts the raw bytes of a value to whatever _winreg would have returned
+	for that type, so that pyreg.types can do the rest."""
+	if typ == REG_DWORD:
+		if len(raw) < 4:
+			return 0
+		return _dword.unpack_from(raw)[0]
+	elif typ in (REG_SZ, REG_EXPAND_SZ):
+		if len(raw) & 1: raw = raw[:-1]
+		return raw.decode('utf-16-le', 'replace').split(u'\0', 1)[0]
+	elif typ == REG_MULTI_SZ:
+		if len(raw) & 1: raw = raw[:-1]
+		text = raw.decode('utf-16-le', 'replace')
+		end = text.find(u'\0\0')
+		if end != -1:
+			text = text[:end]
+		text = text.rstrip(u'\0')
+		if not text:
+			return []
+		return text.split(u'\0')
+	else:
+		if not raw:
+			return None
+		return raw
+
+def _setData(backend, typ, data):
+	"""_setData(backend, typ, data) -> object
+
+	Returns data (as pyreg.types._Object2Registry() gives it) as backend's
+	SetValueEx() takes it. Backends that pack the data themselves take a
+	LazyMultiString as it is, and encode it in one go (see _packData());
+	_winreg only takes a list."""
+	if typ == REG_MULTI_SZ and hasattr(data, 'toUTF16') and \
+			not getattr(backend, 'packsData', False):
+		return list(data)
+	return data
+
+class Backend(object):
+	"""
+	The functions Key calls, named and behaving like their _winreg
+	counterparts. The _winreg module itself is the backend used on Windows;
+	subclass this for anything else. Handles are whatever the backend likes,
+	except that the HKEY_* constants must work as handles to the roots.
+
+	Errors are raised as RegistryError (WindowsError on Windows) with the
+	Windows error code. The defaults here refuse to change anything.
+	"""
+	packsData = True
+	"""Whether SetValueEx() takes anything _packData() does, rather than
+	only what _winreg takes."""
+
+	def OpenKey(self, key, sub_key, reserved=0, sam=KEY_READ):
+		"""b.OpenKey(key, sub_key[, reserved[, sam]]) -> handle"""
+		raise RegistryError(ERROR_CALL_NOT_IMPLEMENTED, "This function is not supported")
+
+	def OpenKeyEx(self, key, sub_key, reserved=0, sam=KEY_READ):
+		"""b.OpenKeyEx(key, sub_key[, reserved[, sam]]) -> handle"""
+		return self.OpenKey(key, sub_key, reserved, sam)
+
+	def CreateKey(self, key, sub_key):
+		"""b.CreateKey(key, sub_key) -> handle
+
+		Opens sub_key, creating it (and any missing keys on the way) first."""
+		raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+
+	def CloseKey(self, key):
+		"""b.CloseKey(key) -> None"""
+		pass
+
+	def EnumKey(self, key, index):
+		"""b.EnumKey(key, index) -> unicode
+
+		Raises an error with ERROR_NO_MORE_ITEMS after the last subkey."""
+		raise RegistryError(ERROR_NO_MORE_ITEMS, "No more data is available")
+
+	def EnumValue(self, key, index):
+		"""b.EnumValue(key, index) -> (name, data, type)
+
+		Raises an error with ERROR_NO_MORE_ITEMS after the last value."""
+		raise RegistryError(ERROR_NO_MORE_ITEMS, "No more data is available")
+
+	def QueryValueEx(self, key, value_name):
+		"""b.QueryValueEx(key, value_name) -> (data, type)"""
+		raise RegistryError(ERROR_FILE_NOT_FOUND, "The system cannot find the file specified")
+
+	def QueryInfoKey(self, key):
+		"""b.QueryInfoKey(key) -> (subkeys, values, mtime)
+
+		mtime is the last write time in 100ns units since 1601."""
+		raise RegistryError(ERROR_CALL_NOT_IMPLEMENTED, "This function is not supported")
+
+	def SetValueEx(self, key, value_name, reserved, type, value):
+		"""b.SetValueEx(key, value_name, reserved, type, value) -> None"""
+		raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+
+	def DeleteValue(self, key, value):
+		"""b.DeleteValue(key, value) -> None"""
+		raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+
+	def DeleteKey(self, key, sub_key):
+		"""b.DeleteKey(key, sub_key) -> None
+
+		sub_key must not have subkeys of its own."""
+		raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+
+	def FlushKey(self, key):
+		"""b.FlushKey(key) -> None"""
+		pass
+
+	def LoadKey(self, key, sub_key, file_name):
+		"""b.LoadKey(key, sub_key, file_name) -> None"""
+		raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+
+	def SaveKey(self, key, file_name):
+		"""b.SaveKey(key, file_name) -> None"""
+		raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+
+_default = None
+
+def getDefault():
+	"""getDefault() -> backend
+
+	Returns the backend the roots in pyreg.roots use: _winreg where there is
+	one, otherwise a pyreg.memory.MemoryRegistry."""
+	global _default
+	if _default is None:
+		try:
+			import _winreg
+		except ImportError:
+			from .memory import MemoryRegistry
+			_default = MemoryRegistry()
+		else:
+			_default = _winreg
+	return _default
+
+def setDefault(backend):
+	"""setDefault(backend) -> None
+
+	Changes the backend the roots in pyreg.roots use, eg to run against a
+	MemoryRegistry on Windows. Keys already gotten from the roots keep using
+	the old one. Pass None to go back to the usual one."""
+	global _default
+	_default = backend
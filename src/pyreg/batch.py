@@ -0,0 +1,217 @@
+"""
+pyreg.batch - Collects writes to keys and makes them all at once
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import threading
+from collections import OrderedDict
+from .backend import ERROR_FILE_NOT_FOUND, _setData
+from .cache import getCache
+from .types import _Object2Registry, _Registry2Object
+
+__all__ = 'Batch',
+
+_local = threading.local()
+_cache = getCache()
+
+_DELETE = object()
+"""The type of a value that is to be deleted."""
+
+def _current(key):
+	"""Returns the innermost Batch in this thread that covers key, if any."""
+	stack = getattr(_local, 'stack', None)
+	if stack:
+		for batch in reversed(stack):
+			if batch.covers(key):
+				return batch
+	return None
+
+def _notFound(e):
+	return getattr(e, 'winerror', e.errno) == ERROR_FILE_NOT_FOUND
+
+class Batch(object):
+	"""
+	Holds on to the values set and deleted in a key and the keys under it,
+	while it is in effect (in a with statement, in this thread), and then
+	makes the changes all at once. Use Key.batch() to get one.
+
+	Values are converted when they are set, so conversion errors come up
+	where they happen. Setting or deleting the same value more than once
+	only makes the last change. At the end, each key's changes are made in
+	turn, in the order the keys were first changed, and each key that was
+	changed (or flushed, with Key.flush()) is flushed once, if flush is
+	True. Reading a value that was set or deleted gives the new value (or
+	KeyError); listing values doesn't see the changes yet.
+
+	If the with statement raises an error, nothing is changed. If making the
+	changes fails and rollback is True, the values that were changed are
+	put back the way they were (and keys that were created are deleted, if
+	they can be) before the error is raised.
+
+	Deleting a value that doesn't exist isn't an error in a batch.
+	"""
+	def __init__(self, key, flush=True, rollback=False):
+		"""Initializer."""
+		self.key = key
+		self.flush = flush
+		self.rollback = rollback
+		self._backend, self._root, self._path = key._ident()
+		# ident -> [Key, OrderedDict(lowercased name -> (name, data, type)), flush]
+		self._keys = OrderedDict()
+		self.writes = self.coalesced = 0
+
+	def __len__(self):
+		"""x.__len__() <==> len(x)
+
+		Returns the number of changes waiting to be made."""
+		return sum([len(entry[1]) for entry in self._keys.itervalues()])
+
+	def covers(self, key):
+		"""b.covers(key) -> bool
+
+		True if changes to key are held by this batch."""
+		backend, root, path = key._ident()
+		if backend is not self._backend or root != self._root:
+			return False
+		return not self._path or path == self._path or path.startswith(self._path + u'\\')
+
+	def _entry(self, key):
+		ident = key._ident()
+		entry = self._keys.get(ident)
+		if entry is None:
+			entry = self._keys[ident] = [key, OrderedDict(), False]
+		return entry
+
+	def set(self, key, name, value):
+		"""b.set(key, name, value) -> None
+
+		Notes that the value name of key is to be set to value."""
+		data, typ = _Object2Registry(value)
+		self._change(key, name, data, typ)
+
+	def setData(self, key, name, data, typ):
+		"""b.setData(key, name, data, typ) -> None
+
+		Like set(), but with the data already as SetValueEx() takes it."""
+		self._change(key, name, data, typ)
+
+	def delete(self, key, name):
+		"""b.delete(key, name) -> None
+
+		Notes that the value name of key is to be deleted."""
+		self._change(key, name, None, _DELETE)
+
+	def _change(self, key, name, data, typ):
+		name = unicode(name or u'')
+		ops = self._entry(key)[1]
+		lower = name.lower()
+		if lower in ops:
+			self.coalesced += 1
+		ops[lower] = (name, data, typ)
+
+	def get(self, key, name):
+		"""b.get(key, name) -> (bool, object)
+
+		Returns (True, value) if the value name of key was set in this
+		batch, raises KeyError if it was deleted, and returns (False, None)
+		if it wasn't touched."""
+		entry = self._keys.get(key._ident())
+		if entry is not None:
+			op = entry[1].get(unicode(name or u'').lower())
+			if op is not None:
+				if op[2] is _DELETE:
+					raise KeyError(name)
+				return True, _Registry2Object(op[2], op[1])
+		return False, None
+
+	def flushKey(self, key):
+		"""b.flushKey(key) -> None
+
+		Notes that key is to be flushed at the end."""
+		self._entry(key)[2] = True
+
+	def __enter__(self):
+		stack = getattr(_local, 'stack', None)
+		if stack is None:
+			stack = _local.stack = []
+		stack.append(self)
+		return self
+
+	def __exit__(self, typ, value, tb):
+		_local.stack.remove(self)
+		if typ is None:
+			self.apply()
+		else:
+			self.discard()
+
+	def discard(self):
+		"""b.discard() -> None
+
+		Forgets the changes without making them."""
+		self._keys.clear()
+
+	def apply(self):
+		"""b.apply() -> None
+
+		Makes the changes (and flushes), and forgets them. Called at the end
+		of the with statement."""
+		keys, self._keys = self._keys, OrderedDict()
+		undo = []
+		created = []
+		try:
+			for key, ops, flush in keys.itervalues():
+				if not ops:
+					continue
+				backend = key._backend
+				if self.rollback:
+					try:
+						key._checked()
+					except EnvironmentError:
+						created.append(key)
+				handle = key._checked(True)
+				for name, data, typ in ops.itervalues():
+					if self.rollback:
+						try:
+							old = backend.QueryValueEx(handle, name)
+						except EnvironmentError:
+							old = None
+						undo.append((key, name, old))
+					if typ is _DELETE:
+						try:
+							backend.DeleteValue(handle, name)
+						except EnvironmentError, e:
+							if not _notFound(e):
+								raise
+					else:
+						backend.SetValueEx(handle, name, 0, typ, _setData(backend, typ, data))
+					self.writes += 1
+					if _cache.enabled:
+						_cache.invalidate(key._ident(), name)
+		except:
+			if self.rollback:
+				self._undo(undo, created)
+			raise
+		for key, ops, flush in keys.itervalues():
+			if flush or (ops and self.flush):
+				key._read(key._backend.FlushKey)
+
+	def _undo(self, undo, created):
+		"""Puts back what apply() changed, as well as it can."""
+		for key, name, old in reversed(undo):
+			try:
+				handle = key._checked(True)
+				if old is None:
+					key._backend.DeleteValue(handle, name)
+				else:
+					key._backend.SetValueEx(handle, name, 0, old[1], old[0])
+			except EnvironmentError:
+				pass
+			if _cache.enabled:
+				_cache.invalidate(key._ident(), name)
+		for key in reversed(created):
+			try:
+				del key.parent.keys[key.myname]
+			except EnvironmentError:
+				pass
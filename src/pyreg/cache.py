@@ -0,0 +1,149 @@
+"""
+pyreg.cache - Remembers values read through Key.values
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import threading, time
+from ._lru import LRU
+from .pool import _stale
+from .types import _Registry2Object
+
+__all__ = ('ValueCache', 'getCache')
+
+class ValueCache(object):
+	"""
+	A read-through cache of decoded values, used by Key.values (and so
+	akey[name] and akey|name) once it has been enabled.
+
+	Cached values are checked against their key's last write time. For ttl
+	seconds after a check, values of that key are used without asking the
+	registry at all; after that, the next read checks the last write time
+	again (one QueryInfoKey()), and throws away what it had for the key if
+	the key was changed. At most maxsize values, and the last checks of at
+	most maxsize keys, are kept, least recently used ones going first.
+
+	Values set or deleted through pyreg are forgotten right away. Cached
+	values are shared, so don't change them (eg, a MultiString) in place.
+	"""
+	def __init__(self, ttl=1.0, maxsize=1024):
+		"""Initializer. The cache starts out disabled; see enable()."""
+		self._lock = threading.Lock()
+		self._values = LRU()
+		self._checked = LRU()
+		self.ttl = ttl
+		self.maxsize = maxsize
+		self.enabled = False
+		self.hits = self.misses = self.checks = self.evictions = 0
+
+	def enable(self, ttl=None, maxsize=None):
+		"""c.enable([ttl[, maxsize]]) -> None
+
+		Starts caching values, optionally changing the settings."""
+		if ttl is not None:
+			self.ttl = ttl
+		if maxsize is not None:
+			self.maxsize = maxsize
+		self.enabled = True
+
+	def disable(self):
+		"""c.disable() -> None
+
+		Stops caching values, and forgets the ones it has."""
+		self.enabled = False
+		self.clear()
+
+	def clear(self):
+		"""c.clear() -> None"""
+		self._lock.acquire()
+		try:
+			self._values.clear()
+			self._checked.clear()
+		finally:
+			self._lock.release()
+
+	def getStats(self):
+		"""c.getStats() -> dict
+
+		Returns the number of hits, misses, last write time checks and
+		evictions so far, the hit rate and the current size."""
+		reads = self.hits + self.misses
+		return {'hits': self.hits, 'misses': self.misses, 'checks': self.checks,
+			'evictions': self.evictions, 'size': len(self._values),
+			'hitrate': reads and float(self.hits) / reads or 0.0}
+
+	def resetStats(self):
+		"""c.resetStats() -> None"""
+		self.hits = self.misses = self.checks = self.evictions = 0
+
+	def get(self, backend, handle, ident, name):
+		"""c.get(backend, handle, ident, name) -> object
+
+		Returns the value name of the key open as handle, from the cache if
+		it can. ident identifies the key (see Key._ident()). Raises KeyError
+		if there is no such value."""
+		lower = (name or u'').lower()
+		now = time.time()
+		self._lock.acquire()
+		try:
+			checked = self._checked.get(ident)
+		finally:
+			self._lock.release()
+		if checked is None or now - checked[1] >= self.ttl:
+			mtime = backend.QueryInfoKey(handle)[2]
+			self._lock.acquire()
+			try:
+				self.checks += 1
+				checked = (mtime, now)
+				self._checked.set(ident, checked)
+				while len(self._checked) > self.maxsize:
+					self._checked.popOldest()
+			finally:
+				self._lock.release()
+		self._lock.acquire()
+		try:
+			cached = self._values.get((ident, lower))
+			if cached is not None and cached[0] == checked[0]:
+				self.hits += 1
+				return cached[1]
+			self.misses += 1
+		finally:
+			self._lock.release()
+		try:
+			data, typ = backend.QueryValueEx(handle, name)
+		except EnvironmentError, e:
+			if _stale(e):
+				raise
+			raise KeyError(name)
+		value = _Registry2Object(typ, data)
+		self._lock.acquire()
+		try:
+			self._values.set((ident, lower), (checked[0], value))
+			while len(self._values) > self.maxsize:
+				self._values.popOldest()
+				self.evictions += 1
+		finally:
+			self._lock.release()
+		return value
+
+	def invalidate(self, ident, name=None):
+		"""c.invalidate(ident[, name]) -> None
+
+		Forgets what is known about the given key, and about the given value
+		of it, because they were changed."""
+		self._lock.acquire()
+		try:
+			self._checked.pop(ident)
+			if name is not None:
+				self._values.pop((ident, name.lower()))
+		finally:
+			self._lock.release()
+
+_cache = ValueCache()
+
+def getCache():
+	"""getCache() -> ValueCache
+
+	Returns the cache Key.values uses."""
+	return _cache
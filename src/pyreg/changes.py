@@ -0,0 +1,186 @@
+"""
+pyreg.changes - Finds what changed in a tree of keys since it was last looked at
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import cPickle, hashlib
+from .backend import KEY_READ, _packData
+from .key import _enumKeys, _held, _release, _releaseAll
+
+__all__ = ('ScanState', 'KEY_ADDED', 'KEY_REMOVED', 'KEY_MODIFIED',
+	'VALUE_ADDED', 'VALUE_REMOVED', 'VALUE_MODIFIED')
+
+KEY_ADDED = 'key added'
+KEY_REMOVED = 'key removed'
+KEY_MODIFIED = 'key modified'
+"""The key's last write time changed (eg, a subkey was added or removed)."""
+VALUE_ADDED = 'value added'
+VALUE_REMOVED = 'value removed'
+VALUE_MODIFIED = 'value modified'
+
+_VERSION = 1
+"""Changes whenever what save() writes does."""
+
+# What is remembered about each key, in a tuple
+_NAME, _MTIME, _SUBKEYS, _VALUES = 0, 1, 2, 3
+
+def _digest(typ, data):
+	"""Returns a short fingerprint of a value, as EnumValue() gives it."""
+	return hashlib.md5('%i:%s' % (typ, _packData(typ, data))).digest()
+
+class ScanState(object):
+	"""
+	Remembers the last write time, subkeys and values (as fingerprints, not
+	the values themselves) of every key in a tree, so that rescan() can tell
+	what has changed since the last time.
+
+	Keys whose last write time is the same as it was are not read again:
+	rescan() only asks for their last write times, and uses what it
+	remembers for the rest. Changes deeper down don't change a key's last
+	write time, so every key is still opened, but most of the work (reading
+	subkeys and values) is only done for the keys that changed.
+
+	The state can be kept between runs with save() and load().
+	"""
+	def __init__(self):
+		"""Initializer. Starts out knowing nothing, so the first rescan()
+		reports everything as added."""
+		# Keyed by lowercased path, relative to the key scanned
+		self._keys = {}
+		self.visited = self.reread = 0
+
+	def __len__(self):
+		"""x.__len__() <==> len(x)
+
+		Returns the number of keys remembered."""
+		return len(self._keys)
+
+	def rescan(self, key, onerror=None):
+		"""s.rescan(key[, onerror]) -> list
+
+		Looks through key and every key under it, and returns what has
+		changed since the last time, as a list of (event, path, name)
+		tuples. event is one of the KEY_* or VALUE_* constants, path is the
+		path of the key relative to key, and name is the value's name (None
+		for the KEY_* events). Keys that can't be read are left out (and
+		reported as removed if they were there before); their errors are
+		passed to onerror, if given.
+
+		Afterwards, s.visited is the number of keys looked at, and s.reread
+		the number that had changed and were read again."""
+		backend = key._backend
+		old = self._keys
+		new = {}
+		changes = []
+		self.visited = self.reread = 0
+		# Each entry is (path, parent, name), parent being the record of the
+		# key above (see pyreg.key._held()), which is closed once its last
+		# subkey is opened
+		stack = [(u'', None, None)]
+		live = []
+		try:
+			while stack:
+				path, parent, name = stack.pop()
+				lower = path.lower()
+				handle = None
+				try:
+					if parent is None:
+						handle = key._checked()
+					else:
+						try:
+							handle = backend.OpenKey(parent[2], name, 0, KEY_READ)
+						finally:
+							_release(live, parent)
+					mtime = backend.QueryInfoKey(handle)[2]
+					self.visited += 1
+					entry = old.get(lower)
+					if entry is None or entry[_MTIME] != mtime:
+						entry = self._read(backend, handle, path, mtime, entry, changes)
+				except EnvironmentError, e:
+					if handle is not None and parent is not None:
+						backend.CloseKey(handle)
+					if onerror is not None:
+						onerror(e)
+					continue
+				new[lower] = entry
+				subkeys = entry[_SUBKEYS]
+				if subkeys:
+					record = _held(live, len(subkeys), backend, handle, parent is not None)
+					for name in reversed(subkeys):
+						stack.append((path and path + u'\\' + name or name, record, name))
+				elif parent is not None:
+					backend.CloseKey(handle)
+		finally:
+			_releaseAll(live)
+		removed = [old[lower][_NAME] for lower in old if lower not in new]
+		removed.sort()
+		for path in removed:
+			changes.append((KEY_REMOVED, path, None))
+		self._keys = new
+		return changes
+
+	def _read(self, backend, handle, path, mtime, entry, changes):
+		"""Reads a key that is new or has changed, noting what changed, and
+		returns what is to be remembered about it."""
+		self.reread += 1
+		subkeys = tuple(_enumKeys(backend, handle))
+		values = {}
+		n = 0
+		while True:
+			try:
+				name, data, typ = backend.EnumValue(handle, n)
+			except EnvironmentError:
+				break
+			values[name.lower()] = (name, _digest(typ, data))
+			n += 1
+		if entry is None:
+			changes.append((KEY_ADDED, path, None))
+			for name, digest in values.itervalues():
+				changes.append((VALUE_ADDED, path, name))
+		else:
+			changes.append((KEY_MODIFIED, path, None))
+			before = entry[_VALUES]
+			for lower, (name, digest) in values.iteritems():
+				if lower not in before:
+					changes.append((VALUE_ADDED, path, name))
+				elif before[lower][1] != digest:
+					changes.append((VALUE_MODIFIED, path, name))
+			for lower, (name, digest) in before.iteritems():
+				if lower not in values:
+					changes.append((VALUE_REMOVED, path, name))
+		return (path, mtime, subkeys, values)
+
+	def save(self, file):
+		"""s.save(file) -> None
+
+		Writes the state to file (a file name, or a file opened for writing
+		in binary mode), for load() to read back later."""
+		if isinstance(file, basestring):
+			f = open(file, 'wb')
+			try:
+				self.save(f)
+			finally:
+				f.close()
+			return
+		cPickle.dump((_VERSION, self._keys), file, 2)
+
+	def load(cls, file):
+		"""ScanState.load(file) -> ScanState
+
+		Reads a state written by save(). Raises ValueError if it was written
+		by an incompatible version of pyreg."""
+		if isinstance(file, basestring):
+			f = open(file, 'rb')
+			try:
+				return cls.load(f)
+			finally:
+				f.close()
+		version, keys = cPickle.load(file)
+		if version != _VERSION:
+			raise ValueError("Scan state is version %r, not %r" % (version, _VERSION))
+		state = cls()
+		state._keys = keys
+		return state
+	load = classmethod(load)
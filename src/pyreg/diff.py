@@ -0,0 +1,225 @@
+"""
+pyreg.diff - Finds the differences between two trees of keys, and applies them
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+from .backend import KEY_READ, _packData
+from .changes import KEY_ADDED, KEY_REMOVED, VALUE_ADDED, VALUE_REMOVED, VALUE_MODIFIED
+from .key import _enumKeys, _held, _release, _releaseAll
+from .regfile import _deleteTree
+
+__all__ = ('diff', 'Patch', 'KEY_ADDED', 'KEY_REMOVED',
+	'VALUE_ADDED', 'VALUE_REMOVED', 'VALUE_MODIFIED')
+
+def _values(backend, handle):
+	"""Returns the values of a key, as {lowercased name: (name, type, data)}."""
+	values = {}
+	n = 0
+	while True:
+		try:
+			name, data, typ = backend.EnumValue(handle, n)
+		except EnvironmentError:
+			return values
+		values[name.lower()] = (name, typ, data)
+		n += 1
+
+def _byName(names):
+	return dict([(name.lower(), name) for name in names])
+
+def _join(path, name):
+	return path and path + u'\\' + name or name
+
+def _added(backend, handle, path):
+	"""Yields the changes for a key that is only in the new tree, and
+	everything under it. Closes handle, and the handles it opens, once it
+	is done with them."""
+	stack = [(path, None, None)]
+	live = [[1, backend, handle, True]]
+	try:
+		while stack:
+			path, parent, name = stack.pop()
+			if parent is not None:
+				try:
+					handle = backend.OpenKey(parent[2], name, 0, KEY_READ)
+				finally:
+					_release(live, parent)
+				record = _held(live, 1, backend, handle)
+			else:
+				record = live[0]
+			yield KEY_ADDED, path, None, None, None
+			values = _values(backend, handle)
+			for lower in sorted(values):
+				name, typ, data = values[lower]
+				yield VALUE_ADDED, path, name, None, (typ, data)
+			for name in sorted(_enumKeys(backend, handle), key=lambda n: n.lower(), reverse=True):
+				record[0] += 1
+				stack.append((_join(path, name), record, name))
+			_release(live, record)
+	finally:
+		_releaseAll(live)
+
+def diff(old, new, trustMTimes=True, onerror=None):
+	"""diff(old, new[, trustMTimes[, onerror]]) -> generator
+
+	Compares the keys old and new, and everything under them, and yields
+	what it would take to turn old into new, as it finds it, as (event,
+	path, name, before, after) tuples:
+	* (KEY_ADDED, path, None, None, None)
+	* (KEY_REMOVED, path, None, None, None) - everything under it too
+	* (VALUE_ADDED, path, name, None, (type, data))
+	* (VALUE_REMOVED, path, name, (type, data), None)
+	* (VALUE_MODIFIED, path, name, (type, data), (type, data))
+	path is relative to old and new, and data is as EnumValue() gives it.
+	A key that was added is followed by its values and subkeys.
+
+	old and new can be Keys on any backend: the registry, a MemoryRegistry
+	(eg, a copy made with Patch), or a saved hive (see pyreg.hive).
+
+	If trustMTimes is True, a key whose last write time and numbers of
+	subkeys and values are the same on both sides is taken to have the same
+	values and subkey names, so only its subkeys are looked at. That is
+	what makes comparing a tree against an earlier copy of itself (eg, a
+	hive saved before an installer ran) fast, but it is only right if the
+	copy kept the last write times. Keys that can't be read are skipped,
+	and their errors passed to onerror, if given."""
+	obackend, nbackend = old._backend, new._backend
+	# Each entry is (path, old parent, new parent, names), the parents being
+	# the records of the keys above (see pyreg.key._held()), which are closed
+	# once their last subkeys are opened
+	stack = [(u'', None, None, None)]
+	live = []
+	try:
+		while stack:
+			path, oparent, nparent, name = stack.pop()
+			ohandle = nhandle = None
+			try:
+				if oparent is None:
+					ohandle, nhandle = old._checked(), new._checked()
+				else:
+					try:
+						ohandle = obackend.OpenKey(oparent[2], name[0], 0, KEY_READ)
+						nhandle = nbackend.OpenKey(nparent[2], name[1], 0, KEY_READ)
+					finally:
+						_release(live, oparent)
+						_release(live, nparent)
+				oinfo = obackend.QueryInfoKey(ohandle)
+				same = trustMTimes and oinfo == nbackend.QueryInfoKey(nhandle)
+				osubkeys = _byName(_enumKeys(obackend, ohandle))
+				if same:
+					nsubkeys = osubkeys
+				else:
+					nsubkeys = _byName(_enumKeys(nbackend, nhandle))
+					ovalues = _values(obackend, ohandle)
+					nvalues = _values(nbackend, nhandle)
+			except EnvironmentError, e:
+				if oparent is not None:
+					if ohandle is not None:
+						obackend.CloseKey(ohandle)
+					if nhandle is not None:
+						nbackend.CloseKey(nhandle)
+				if onerror is not None:
+					onerror(e)
+				continue
+			orecord = _held(live, 1, obackend, ohandle, oparent is not None)
+			nrecord = _held(live, 1, nbackend, nhandle, oparent is not None)
+			if not same:
+				for lower in sorted(set(ovalues) | set(nvalues)):
+					if lower not in nvalues:
+						oname, otyp, odata = ovalues[lower]
+						yield VALUE_REMOVED, path, oname, (otyp, odata), None
+					elif lower not in ovalues:
+						nname, ntyp, ndata = nvalues[lower]
+						yield VALUE_ADDED, path, nname, None, (ntyp, ndata)
+					else:
+						oname, otyp, odata = ovalues[lower]
+						nname, ntyp, ndata = nvalues[lower]
+						if otyp != ntyp or _packData(otyp, odata) != _packData(ntyp, ndata):
+							yield VALUE_MODIFIED, path, nname, (otyp, odata), (ntyp, ndata)
+			children = []
+			for lower in sorted(set(osubkeys) | set(nsubkeys)):
+				if lower not in nsubkeys:
+					yield KEY_REMOVED, _join(path, osubkeys[lower]), None, None, None
+				elif lower not in osubkeys:
+					subpath = _join(path, nsubkeys[lower])
+					try:
+						handle = nbackend.OpenKey(nhandle, nsubkeys[lower], 0, KEY_READ)
+						for change in _added(nbackend, handle, subpath):
+							yield change
+					except EnvironmentError, e:
+						if onerror is not None:
+							onerror(e)
+				else:
+					children.append((_join(path, nsubkeys[lower]), orecord, nrecord,
+						(osubkeys[lower], nsubkeys[lower])))
+			children.reverse()
+			stack.extend(children)
+			for record in (orecord, nrecord):
+				record[0] += len(children)
+				_release(live, record)
+	finally:
+		_releaseAll(live)
+
+class Patch(object):
+	"""
+	A list of changes from diff(), that can be made to another tree of keys
+	all at once with apply().
+
+	  >>> before = Hive('before.hiv').root
+	  >>> patch = Patch(diff(before, HKEY_LOCAL_MACHINE / 'SOFTWARE'))
+	  >>> patch.apply(otherMachine / 'SOFTWARE')
+	"""
+	def __init__(self, changes=()):
+		"""Initializer. changes is what diff() yields."""
+		self.changes = list(changes)
+
+	def __len__(self):
+		"""x.__len__() <==> len(x)"""
+		return len(self.changes)
+
+	def __iter__(self):
+		"""x.__iter__() <==> iter(x)"""
+		return iter(self.changes)
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "<Patch of %i changes>" % len(self.changes)
+
+	def reversed(self):
+		"""p.reversed() -> Patch
+
+		Returns the Patch that undoes this one. Keys that this one removes
+		can't be put back (their contents weren't recorded), so they are
+		left out."""
+		undo = {KEY_ADDED: KEY_REMOVED, VALUE_ADDED: VALUE_REMOVED,
+			VALUE_REMOVED: VALUE_ADDED, VALUE_MODIFIED: VALUE_MODIFIED}
+		changes = []
+		for event, path, name, before, after in self.changes:
+			if event in undo:
+				changes.append((undo[event], path, name, after, before))
+		return Patch(changes)
+
+	def apply(self, target, flush=True, rollback=False):
+		"""p.apply(target[, flush[, rollback]]) -> None
+
+		Makes the changes to target and the keys under it. Keys are created
+		first, then the values are written in one Batch (see pyreg.batch;
+		flush and rollback are passed on to it), then keys are removed."""
+		def sub(path):
+			return path and target / path or target
+		removed = []
+		for event, path, name, before, after in self.changes:
+			if event == KEY_ADDED:
+				sub(path).create()
+			elif event == KEY_REMOVED:
+				removed.append(path)
+		batch = target.batch(flush, rollback)
+		for event, path, name, before, after in self.changes:
+			if event == VALUE_REMOVED:
+				batch.delete(sub(path), name)
+			elif event in (VALUE_ADDED, VALUE_MODIFIED):
+				batch.setData(sub(path), name, after[1], after[0])
+		batch.apply()
+		for path in reversed(removed):
+			_deleteTree(sub(path))
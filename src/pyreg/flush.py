@@ -0,0 +1,234 @@
+"""
+pyreg.flush - Flushes keys in the background, a few at a time
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import threading, time
+
+__all__ = ('FlushScheduler', 'getScheduler', 'setScheduler')
+
+class _Pending(object):
+	"""A flush of one root that has been asked for but not done yet."""
+	__slots__ = ('backend', 'root', 'first', 'last', 'firstSeq', 'lastSeq', 'count', 'urgent')
+	def __init__(self, backend, root, now, seq):
+		self.backend = backend
+		self.root = root
+		self.first = self.last = now
+		self.firstSeq = self.lastSeq = seq
+		self.count = 1
+		self.urgent = False
+
+class FlushScheduler(object):
+	"""
+	Flushes keys on a background thread instead of right away. FlushKey()
+	is slow, and flushes a whole hive no matter which key it is given, so
+	request() just notes that the key's root needs flushing; all of the
+	requests for a root are merged, and it is flushed once things have been
+	quiet for quiet seconds, or maxdelay seconds after the first request at
+	the latest.
+
+	Call waitDurable() when the changes really do have to be on disk before
+	going on.
+	"""
+	def __init__(self, quiet=2.0, maxdelay=10.0):
+		"""Initializer. The thread is started by the first request."""
+		self.quiet = quiet
+		self.maxdelay = maxdelay
+		self._cond = threading.Condition(threading.Lock())
+		# (backend, root) -> _Pending, waiting to be flushed and being flushed
+		self._pending = {}
+		self._flushing = {}
+		# (backend, root) -> the error the last flush raised, if it failed
+		self._failed = {}
+		self._seq = 0
+		self._thread = None
+		self._stopping = False
+		self.resetStats()
+
+	def getStats(self):
+		"""s.getStats() -> dict
+
+		Returns the number of requests, flushes done, requests that were
+		merged into another one's flush, flushes that failed, and the number
+		of roots waiting to be flushed."""
+		return {'requests': self.requests, 'flushes': self.flushes,
+			'coalesced': self.coalesced, 'errors': self.errors,
+			'pending': len(self._pending)}
+
+	def resetStats(self):
+		"""s.resetStats() -> None"""
+		self.requests = self.flushes = self.coalesced = self.errors = 0
+
+	def request(self, key):
+		"""s.request(key) -> None
+
+		Notes that key has changes that should be flushed."""
+		ident = (key._backend, key._root)
+		cond = self._cond
+		cond.acquire()
+		try:
+			if self._stopping:
+				raise RuntimeError("The flush scheduler has been shut down")
+			self._seq += 1
+			self.requests += 1
+			now = time.time()
+			entry = self._pending.get(ident)
+			if entry is None:
+				self._pending[ident] = _Pending(key._backend, key._root, now, self._seq)
+			else:
+				entry.last = now
+				entry.lastSeq = self._seq
+				entry.count += 1
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._work, name='pyreg.flush')
+				self._thread.setDaemon(True)
+				self._thread.start()
+			cond.notifyAll()
+		finally:
+			cond.release()
+
+	def _waiting(self, idents, seq):
+		"""Whether any of idents (or any root at all, if None) still has
+		requests up to seq that haven't been flushed."""
+		for entries in (self._pending, self._flushing):
+			for ident, entry in entries.iteritems():
+				if (idents is None or ident in idents) and entry.firstSeq <= seq:
+					return True
+		return False
+
+	def waitDurable(self, key=None, timeout=None):
+		"""s.waitDurable([key[, timeout]]) -> bool
+
+		Flushes everything requested so far for key's root (or for every
+		root, if key is None) right away, and waits for that to be done.
+		Returns False if timeout seconds pass first. Raises the error from
+		the flush if it failed."""
+		if key is None:
+			idents = None
+		else:
+			idents = set([(key._backend, key._root)])
+		cond = self._cond
+		cond.acquire()
+		try:
+			seq = self._seq
+			for ident, entry in self._pending.iteritems():
+				if idents is None or ident in idents:
+					entry.urgent = True
+			cond.notifyAll()
+			if timeout is not None:
+				end = time.time() + timeout
+			while self._waiting(idents, seq):
+				if timeout is None:
+					cond.wait()
+				else:
+					left = end - time.time()
+					if left <= 0:
+						return False
+					cond.wait(left)
+			for ident, error in self._failed.iteritems():
+				if idents is None or ident in idents:
+					raise error
+			return True
+		finally:
+			cond.release()
+	wait_durable = waitDurable
+
+	def shutdown(self, wait=True):
+		"""s.shutdown([wait]) -> None
+
+		Flushes whatever is waiting and stops the thread. If wait, waits for
+		that."""
+		self._cond.acquire()
+		try:
+			self._stopping = True
+			self._cond.notifyAll()
+			thread = self._thread
+		finally:
+			self._cond.release()
+		if wait and thread is not None:
+			thread.join()
+
+	def _next(self):
+		"""Waits for a root to be due, and returns its ident and _Pending,
+		or None when the scheduler is shut down with nothing waiting."""
+		cond = self._cond
+		cond.acquire()
+		try:
+			while True:
+				if not self._pending:
+					if self._stopping:
+						return None
+					cond.wait()
+					continue
+				now = time.time()
+				due = None
+				for ident, entry in self._pending.iteritems():
+					if entry.urgent or self._stopping:
+						when = now
+					else:
+						when = min(entry.last + self.quiet, entry.first + self.maxdelay)
+					if due is None or when < due[0]:
+						due = (when, ident)
+				if due[0] <= now:
+					ident = due[1]
+					entry = self._flushing[ident] = self._pending.pop(ident)
+					return ident, entry
+				cond.wait(due[0] - now)
+		finally:
+			cond.release()
+
+	def _work(self):
+		while True:
+			task = self._next()
+			if task is None:
+				break
+			ident, entry = task
+			try:
+				entry.backend.FlushKey(entry.root)
+			except EnvironmentError, e:
+				error = e
+			else:
+				error = None
+			self._cond.acquire()
+			try:
+				del self._flushing[ident]
+				self.flushes += 1
+				self.coalesced += entry.count - 1
+				if error is None:
+					self._failed.pop(ident, None)
+				else:
+					self.errors += 1
+					self._failed[ident] = error
+				self._cond.notifyAll()
+			finally:
+				self._cond.release()
+
+_scheduler = None
+_schedulerLock = threading.Lock()
+
+def getScheduler():
+	"""getScheduler() -> FlushScheduler
+
+	Returns the FlushScheduler Key.flush(later=True) uses."""
+	global _scheduler
+	_schedulerLock.acquire()
+	try:
+		if _scheduler is None:
+			_scheduler = FlushScheduler()
+		return _scheduler
+	finally:
+		_schedulerLock.release()
+
+def setScheduler(scheduler):
+	"""setScheduler(scheduler) -> None
+
+	Changes the FlushScheduler Key.flush(later=True) uses. Passing None goes
+	back to a new one with the default settings."""
+	global _scheduler
+	_schedulerLock.acquire()
+	try:
+		_scheduler = scheduler
+	finally:
+		_schedulerLock.release()
@@ -0,0 +1,297 @@
+"""
+pyreg.hive - Reads saved registry hives (regf files) without the registry
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import mmap, os, struct
+from .backend import Backend, RegistryError, _unpackData, KEY_READ, \
+	ERROR_FILE_NOT_FOUND, ERROR_ACCESS_DENIED, ERROR_NO_MORE_ITEMS, ERROR_BADDB
+from .key import Key
+
+__all__ = 'Hive',
+
+# Layout of a hive file. See "Windows registry file format specification"
+# by Maxim Suhanov for the gory details.
+_HBIN_START = 0x1000
+"""Cell offsets are relative to the first hive bin, which follows the base block."""
+_BIG_DATA_MAX = 16344
+"""Largest data segment a single cell holds; bigger values use a "db" record."""
+
+_baseblock = struct.Struct('<4sIIQIIIII')
+_cellsize = struct.Struct('<i')
+_listhdr = struct.Struct('<2sH')
+_nk = struct.Struct('<2sHQIIIIIIIIIIIIIIIHH')
+_vk = struct.Struct('<2sHIIIHH')
+_db = struct.Struct('<2sHI')
+_u32 = struct.Struct('<I')
+
+_NK_HEADER = _nk.size
+# Indices into an unpacked _nk
+_NK_FLAGS = 1
+_NK_MTIME = 2
+_NK_SUBKEYS = 5
+_NK_SUBLIST = 7
+_NK_VALUES = 9
+_NK_VALLIST = 10
+_NK_NAMELEN = 18
+_VK_HEADER = _vk.size
+_KEY_COMP_NAME = 0x0020
+_VALUE_COMP_NAME = 0x0001
+_DATA_IN_OFFSET = 0x80000000
+
+def _decodeName(raw, compressed):
+	"""Names are either "compressed" (one byte per character) or UTF-16LE."""
+	if compressed:
+		return raw.decode('latin-1')
+	else:
+		return raw.decode('utf-16-le')
+
+def _nameHash(name):
+	"""The hash stored in "lh" subkey lists."""
+	h = 0
+	for c in name.upper():
+		h = (h * 37 + ord(c)) & 0xFFFFFFFF
+	return h
+
+def _nameHint(name):
+	"""The hint stored in "lf" subkey lists: the first 4 characters. None if
+	the hint can't be trusted for this name."""
+	try:
+		return name[:4].upper().encode('ascii').ljust(4, '\0')
+	except UnicodeError:
+		return None
+
+class Hive(Backend):
+	"""A saved registry hive, opened read-only.
+
+	The file is mapped into memory and cells are decoded only when they are
+	asked for, so opening even a huge hive is cheap and only the parts that
+	are used get paged in. Use the root attribute to get at the keys; it
+	works just like the roots in pyreg.roots, except that nothing can be
+	written to it."""
+
+	def __init__(self, filename):
+		"""Initializer. Opens and maps the given hive file."""
+		self.filename = filename
+		f = open(filename, 'rb')
+		try:
+			self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		finally:
+			f.close()
+		sig, seq1, seq2, mtime, major, minor, typ, fmt, root = _baseblock.unpack_from(self._map, 0)
+		if sig != 'regf':
+			self._map.close()
+			raise RegistryError(ERROR_BADDB, "Not a registry hive file", filename)
+		self.version = (major, minor)
+		self._rootcell = root
+		self.root = _HiveRoot(self)
+
+	def close(self):
+		"""h.close() -> None
+
+		Unmaps the hive. Keys from it are unusable afterwards."""
+		self._map.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	## Cell access
+	def _cell(self, offset):
+		"""h._cell(offset) -> (start, size)
+
+		Returns the absolute position and usable size of the cell at the given
+		hive bin offset."""
+		start = _HBIN_START + offset
+		size = _cellsize.unpack_from(self._map, start)[0]
+		return start + 4, abs(size) - 4
+
+	def _nk(self, offset):
+		"""Returns the fields of the key node at offset."""
+		start, size = self._cell(offset)
+		fields = _nk.unpack_from(self._map, start)
+		if fields[0] != 'nk':
+			raise RegistryError(ERROR_BADDB, "Corrupt key node at 0x%x" % offset)
+		return start, fields
+
+	def _keyName(self, offset):
+		start, nk = self._nk(offset)
+		end = start + _NK_HEADER + nk[_NK_NAMELEN]
+		return _decodeName(self._map[start + _NK_HEADER:end], nk[_NK_FLAGS] & _KEY_COMP_NAME)
+
+	def _iterSubkeys(self, listoff):
+		"""Yields (hint, offset) for each entry of a subkey list, following
+		"ri" index roots. The hint is None, a 4-char prefix or a hash."""
+		start, size = self._cell(listoff)
+		sig, count = _listhdr.unpack_from(self._map, start)
+		pos = start + 4
+		if sig == 'ri':
+			for i in xrange(count):
+				for item in self._iterSubkeys(_u32.unpack_from(self._map, pos + i*4)[0]):
+					yield item
+		elif sig == 'li':
+			for i in xrange(count):
+				yield None, _u32.unpack_from(self._map, pos + i*4)[0]
+		elif sig == 'lf':
+			for i in xrange(count):
+				off = pos + i*8
+				yield self._map[off+4:off+8], _u32.unpack_from(self._map, off)[0]
+		elif sig == 'lh':
+			for i in xrange(count):
+				off = pos + i*8
+				yield _u32.unpack_from(self._map, off+4)[0], _u32.unpack_from(self._map, off)[0]
+		else:
+			raise RegistryError(ERROR_BADDB, "Corrupt subkey list at 0x%x" % listoff)
+
+	def _subkeyAt(self, offset, index):
+		"""Returns the offset of the index'th subkey of the key node at offset."""
+		start, nk = self._nk(offset)
+		if index < 0 or index >= nk[_NK_SUBKEYS]:
+			raise RegistryError(ERROR_NO_MORE_ITEMS, "No more data is available")
+		start, size = self._cell(nk[_NK_SUBLIST])
+		sig, count = _listhdr.unpack_from(self._map, start)
+		if sig == 'ri':
+			# Skip whole leaves instead of walking every entry
+			for i in xrange(count):
+				leaf = _u32.unpack_from(self._map, start + 4 + i*4)[0]
+				lstart, lsize = self._cell(leaf)
+				lsig, lcount = _listhdr.unpack_from(self._map, lstart)
+				if index < lcount:
+					start, sig = lstart, lsig
+					break
+				index -= lcount
+			else:
+				raise RegistryError(ERROR_NO_MORE_ITEMS, "No more data is available")
+		if sig == 'li':
+			return _u32.unpack_from(self._map, start + 4 + index*4)[0]
+		else:
+			return _u32.unpack_from(self._map, start + 4 + index*8)[0]
+
+	def _findSubkey(self, offset, name):
+		"""Returns the offset of the subkey name of the key node at offset, or
+		None."""
+		start, nk = self._nk(offset)
+		if not nk[_NK_SUBKEYS]:
+			return None
+		upper = name.upper()
+		hsh = _nameHash(name)
+		hint = _nameHint(name)
+		for h, sub in self._iterSubkeys(nk[_NK_SUBLIST]):
+			# Use the hints in the list to skip decoding most names
+			if h.__class__ is str:
+				if hint is not None and h.upper() != hint: continue
+			elif h is not None and h != hsh:
+				continue
+			if self._keyName(sub).upper() == upper:
+				return sub
+		return None
+
+	def _resolve(self, offset, path):
+		for part in path.replace(u'/', u'\\').split(u'\\'):
+			if not part: continue
+			sub = self._findSubkey(offset, part)
+			if sub is None:
+				raise RegistryError(ERROR_FILE_NOT_FOUND, "The system cannot find the file specified")
+			offset = sub
+		return offset
+
+	def _valueList(self, offset):
+		"""Returns the position and length of the value list of the key node
+		at offset."""
+		start, nk = self._nk(offset)
+		if not nk[_NK_VALUES]:
+			return start, 0
+		lstart, lsize = self._cell(nk[_NK_VALLIST])
+		return lstart, nk[_NK_VALUES]
+
+	def _vkName(self, offset):
+		start, size = self._cell(offset)
+		vk = _vk.unpack_from(self._map, start)
+		if vk[0] != 'vk':
+			raise RegistryError(ERROR_BADDB, "Corrupt value at 0x%x" % offset)
+		raw = self._map[start + _VK_HEADER:start + _VK_HEADER + vk[1]]
+		return vk, _decodeName(raw, vk[5] & _VALUE_COMP_NAME)
+
+	def _vkData(self, vk):
+		size, dataoff = vk[2], vk[3]
+		if size & _DATA_IN_OFFSET:
+			size &= ~_DATA_IN_OFFSET
+			return _u32.pack(dataoff)[:size]
+		if not size:
+			return ''
+		start, csize = self._cell(dataoff)
+		if size > _BIG_DATA_MAX and self.version >= (1, 4) and self._map[start:start+2] == 'db':
+			sig, count, segs = _db.unpack_from(self._map, start)
+			sstart, ssize = self._cell(segs)
+			chunks = []
+			left = size
+			for i in xrange(count):
+				cstart, clen = self._cell(_u32.unpack_from(self._map, sstart + i*4)[0])
+				n = min(left, _BIG_DATA_MAX)
+				chunks.append(self._map[cstart:cstart+n])
+				left -= n
+			return ''.join(chunks)
+		return self._map[start:start+size]
+
+	def _findValue(self, offset, name):
+		if name is None: name = u''
+		upper = name.upper()
+		lstart, count = self._valueList(offset)
+		for i in xrange(count):
+			voff = _u32.unpack_from(self._map, lstart + i*4)[0]
+			vstart, vsize = self._cell(voff)
+			vk = _vk.unpack_from(self._map, vstart)
+			namelen, flags = vk[1], vk[5]
+			# Cheap length test before decoding anything
+			if flags & _VALUE_COMP_NAME:
+				if namelen != len(name): continue
+			elif namelen != len(name) * 2:
+				continue
+			vk, vname = self._vkName(voff)
+			if vname.upper() == upper:
+				return vk
+		raise RegistryError(ERROR_FILE_NOT_FOUND, "The system cannot find the file specified")
+
+	## The _winreg functions Key uses. Handles are key node offsets.
+	def OpenKey(self, key, sub_key, reserved=0, sam=KEY_READ):
+		return self._resolve(key, sub_key or u'')
+
+	def CreateKey(self, key, sub_key):
+		try:
+			return self._resolve(key, sub_key or u'')
+		except RegistryError:
+			raise RegistryError(ERROR_ACCESS_DENIED, "Hives are opened read-only")
+
+	def EnumKey(self, key, index):
+		return self._keyName(self._subkeyAt(key, index))
+
+	def EnumValue(self, key, index):
+		lstart, count = self._valueList(key)
+		if index < 0 or index >= count:
+			raise RegistryError(ERROR_NO_MORE_ITEMS, "No more data is available")
+		vk, name = self._vkName(_u32.unpack_from(self._map, lstart + index*4)[0])
+		return name, _unpackData(vk[4], self._vkData(vk)), vk[4]
+
+	def QueryValueEx(self, key, value_name):
+		vk = self._findValue(key, value_name)
+		return _unpackData(vk[4], self._vkData(vk)), vk[4]
+
+	def QueryInfoKey(self, key):
+		start, nk = self._nk(key)
+		return nk[_NK_SUBKEYS], nk[_NK_VALUES], nk[_NK_MTIME]
+
+class _HiveRoot(Key):
+	"""A subclass of Key to encapsulate the root key of a Hive."""
+	def __init__(self, hive):
+		super(_HiveRoot, self).__init__(hkey=hive._rootcell, backend=hive)
+	def __repr__(self):
+		return self.getPath(False)
+	def getPath(self, abbrev=True):
+		if abbrev:
+			return unicode(os.path.basename(self._backend.filename))
+		else:
+			return unicode(self._backend.filename)
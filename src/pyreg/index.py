@@ -0,0 +1,190 @@
+"""
+pyreg.index - Sorted indexes of the subkey names of very wide keys
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import bisect, fnmatch, threading
+from ._lru import LRU
+from .key import _enumKeys
+
+__all__ = ('NameIndex', 'getIndex', 'getMaxSize', 'setMaxSize')
+
+_WILDCARDS = '*?['
+
+class NameIndex(object):
+	"""
+	The names of a key's subkeys, enumerated once and kept sorted
+	(case-insensitively), so that looking for some of them doesn't mean
+	enumerating all of them, one EnumKey() at a time, every time; eg, the
+	file extensions in HKEY_CLASSES_ROOT:
+
+	  >>> index = getIndex(HKEY_CLASSES_ROOT)
+	  >>> list(index.prefix(u'.py'))
+	  [u'.py', u'.pyc', u'.pyo', u'.pyw']
+
+	Each query checks the key's last write time and number of subkeys (one
+	QueryInfoKey()) first, and enumerates the names again if either has
+	changed. Names are given back as the registry has them.
+	"""
+	def __init__(self, key):
+		"""Initializer. Nothing is read until the index is used."""
+		self.key = key
+		# (subkeys, mtime, folded names, names), replaced all at once
+		self._state = None
+		self.builds = self.checks = 0
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "<NameIndex of %r>" % (self.key,)
+
+	def refresh(self):
+		"""i.refresh() -> None
+
+		Checks whether the key has changed, and enumerates its subkeys again
+		if it has. The queries do this themselves."""
+		self._current()
+
+	def _current(self):
+		"""Returns the state, enumerating the subkeys if it is out of date."""
+		return self.key._read(self._update)
+
+	def _update(self, handle):
+		"""Does _current() with handle."""
+		backend = self.key._backend
+		count, mtime = backend.QueryInfoKey(handle)[0::2]
+		self.checks += 1
+		state = self._state
+		if state is None or state[:2] != (count, mtime):
+			pairs = []
+			for name in _enumKeys(backend, handle):
+				folded = name.lower()
+				if folded == name:
+					# Keep the one string, not two equal ones
+					folded = name
+				pairs.append((folded, name))
+			pairs.sort()
+			state = self._state = (count, mtime, tuple([p[0] for p in pairs]), tuple([p[1] for p in pairs]))
+			self.builds += 1
+		return state
+
+	def __len__(self):
+		"""x.__len__() <==> len(x)"""
+		return len(self._current()[3])
+
+	def __iter__(self):
+		"""x.__iter__() <==> iter(x)
+
+		Iterates over the names, in order."""
+		return iter(self._current()[3])
+
+	def __contains__(self, name):
+		"""x.__contains__(y) <==> y in x"""
+		folded = self._current()[2]
+		lower = name.lower()
+		i = bisect.bisect_left(folded, lower)
+		return i < len(folded) and folded[i] == lower
+
+	def members(self, names):
+		"""i.members(names) -> list
+
+		Returns those of names (any iterable) that are subkeys, in the order
+		given. They are looked up in sorted order, each search starting where
+		the last one ended."""
+		names = list(names)
+		folded = self._current()[2]
+		found = set()
+		lo = 0
+		for lower in sorted(set([name.lower() for name in names])):
+			lo = bisect.bisect_left(folded, lower, lo)
+			if lo == len(folded):
+				break
+			if folded[lo] == lower:
+				found.add(lower)
+		return [name for name in names if name.lower() in found]
+
+	def range(self, start=None, stop=None):
+		"""i.range([start[, stop]]) -> generator
+
+		Yields the names from start (inclusive) up to stop (exclusive), in
+		order, case-insensitively; either can be None for no limit."""
+		state = self._current()
+		folded, names = state[2], state[3]
+		lo = 0
+		if start is not None:
+			lo = bisect.bisect_left(folded, start.lower())
+		hi = len(folded)
+		if stop is not None:
+			hi = bisect.bisect_left(folded, stop.lower(), lo)
+		for i in xrange(lo, hi):
+			yield names[i]
+
+	def prefix(self, prefix):
+		"""i.prefix(prefix) -> generator
+
+		Yields the names that start with prefix (case-insensitively), in
+		order."""
+		state = self._current()
+		folded, names = state[2], state[3]
+		prefix = prefix.lower()
+		i = bisect.bisect_left(folded, prefix)
+		while i < len(folded) and folded[i].startswith(prefix):
+			yield names[i]
+			i += 1
+
+	def glob(self, pattern):
+		"""i.glob(pattern) -> generator
+
+		Yields the names that match pattern (as fnmatch does it, but always
+		case-insensitively), in order. Only the names starting with the part
+		of pattern before its first wildcard are looked at."""
+		pattern = pattern.lower()
+		literal = len(pattern)
+		for c in _WILDCARDS:
+			at = pattern.find(c)
+			if at != -1:
+				literal = min(literal, at)
+		for name in self.prefix(pattern[:literal]):
+			if fnmatch.fnmatchcase(name.lower(), pattern):
+				yield name
+
+_lock = threading.Lock()
+_indexes = LRU()
+_maxsize = 32
+
+def getIndex(key):
+	"""getIndex(key) -> NameIndex
+
+	Returns the NameIndex of key, shared with anything else that asks for
+	one. The indexes of the _maxsize keys asked about most recently are
+	kept (see setMaxSize()); they are only worth having for wide keys."""
+	ident = key._ident()
+	_lock.acquire()
+	try:
+		index = _indexes.get(ident)
+		if index is None:
+			index = NameIndex(key)
+			_indexes.set(ident, index)
+			while len(_indexes) > _maxsize:
+				_indexes.popOldest()
+		return index
+	finally:
+		_lock.release()
+
+def getMaxSize():
+	"""getMaxSize() -> int"""
+	return _maxsize
+
+def setMaxSize(maxsize):
+	"""setMaxSize(maxsize) -> None
+
+	Changes how many keys getIndex() keeps indexes of."""
+	global _maxsize
+	_lock.acquire()
+	try:
+		_maxsize = maxsize
+		while len(_indexes) > _maxsize:
+			_indexes.popOldest()
+	finally:
+		_lock.release()
@@ -0,0 +1,350 @@
+"""
+pyreg.instrument - Counts and times the registry calls Keys make
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import bisect, sys, threading
+from timeit import default_timer as _clock
+from . import backend as _backends
+from .backend import _packData
+from .key import Key, _RegValues, _RegKeys
+
+__all__ = ('InstrumentedBackend', 'Recorder', 'measure', 'enable', 'disable', 'BUCKETS')
+
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+	0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+"""The upper bounds (in seconds) of the latency histograms' buckets."""
+
+_CALLS = ('OpenKey', 'OpenKeyEx', 'CreateKey', 'CloseKey', 'EnumKey', 'EnumValue',
+	'QueryValueEx', 'QueryInfoKey', 'SetValueEx', 'DeleteValue', 'DeleteKey',
+	'FlushKey', 'LoadKey', 'SaveKey')
+"""The backend functions that are counted."""
+
+_recorders = []
+"""The Recorders that are recording. Calls aren't measured at all while it
+is empty."""
+_recordersLock = threading.Lock()
+
+_OTHER = u'(other)'
+"""The path that calls are counted under once a Recorder has maxpaths."""
+
+_aliases = {'_RegValues': 'Key.values', '_RegKeys': 'Key.keys'}
+_apis = {}
+"""The API names of the pyreg functions calls have been made from, by code
+object."""
+
+def _apiName(frame):
+	"""Returns the name of the pyreg function or method running in frame, eg
+	'key.Key.values.__getitem__'."""
+	code = frame.f_code
+	name = _apis.get(code)
+	if name is None:
+		name = code.co_name
+		if code.co_varnames[:1] == ('self',) and code.co_argcount:
+			for cls in type(frame.f_locals.get('self')).__mro__:
+				if getattr(cls.__dict__.get(name), '__code__', None) is code:
+					name = _aliases.get(cls.__name__, cls.__name__) + '.' + name
+					break
+		module = frame.f_globals.get('__name__', '')
+		name = _apis[code] = module.partition('.')[2] + '.' + name
+	return name
+
+def _keyPath(frame):
+	"""Returns the path of the Key the pyreg function running in frame is
+	working on, if it can be found."""
+	local = frame.f_locals
+	for name in ('self', 'key', 'parent'):
+		key = local.get(name)
+		if isinstance(key, (_RegValues, _RegKeys)):
+			key = key.parent
+		if isinstance(key, Key):
+			return key.getPath(False)
+	return None
+
+def _caller():
+	"""Returns the API (the outermost pyreg function) a backend call was made
+	from, and the path of the key it was working on."""
+	frame = sys._getframe(3)
+	api = None
+	while frame is not None and frame.f_globals.get('__name__', '').startswith('pyreg.'):
+		api = frame
+		frame = frame.f_back
+	if api is None:
+		return None, None
+	return _apiName(api), _keyPath(api)
+
+def _text(name):
+	"""The size of a name, as the registry has it (UTF-16)."""
+	if isinstance(name, basestring): #Py3k
+		return 2 * len(name)
+	return 0
+
+def _data(typ, data):
+	try:
+		return len(_packData(typ, data))
+	except Exception:
+		return 0
+
+def _size(op, args, result):
+	"""Returns the number of bytes of names and data passed to and from the
+	backend by a call."""
+	if op in ('OpenKey', 'OpenKeyEx', 'CreateKey', 'DeleteKey', 'DeleteValue'):
+		return _text(args[1])
+	if op == 'QueryValueEx':
+		return _text(args[1]) + (result is not None and _data(result[1], result[0]) or 0)
+	if op == 'SetValueEx':
+		return _text(args[1]) + _data(args[3], args[4])
+	if result is None:
+		return 0
+	if op == 'EnumKey':
+		return _text(result)
+	if op == 'EnumValue':
+		return _text(result[0]) + _data(result[2], result[1])
+	return 0
+
+def _measured(op, call, args):
+	"""Makes a backend call, and records it with the Recorders."""
+	result = None
+	failed = True
+	start = _clock()
+	try:
+		result = call(*args)
+		failed = False
+		return result
+	finally:
+		elapsed = _clock() - start
+		api, path = _caller()
+		nbytes = _size(op, args, result)
+		for recorder in list(_recorders):
+			recorder.record(op, api, path, elapsed, nbytes, failed)
+
+def _wrap(op, call):
+	def measured(*args):
+		if not _recorders:
+			return call(*args)
+		return _measured(op, call, args)
+	measured.__name__ = op
+	measured.__doc__ = call.__doc__
+	return measured
+
+class InstrumentedBackend(object):
+	"""
+	Wraps a backend, so that the calls made through it are measured by the
+	Recorders that are recording. While none are, calls just go through
+	(with one check).
+
+	Keys keep the backend they were made with, so only Keys made from the
+	roots after enable(), or made with an InstrumentedBackend, are measured.
+	"""
+	def __init__(self, backend):
+		"""Initializer."""
+		self.backend = backend
+		for op in _CALLS:
+			call = getattr(backend, op, None)
+			if call is not None:
+				setattr(self, op, _wrap(op, call))
+
+	def __getattr__(self, name):
+		"""x.__getattr__(y) <==> x.y"""
+		return getattr(self.backend, name)
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "<InstrumentedBackend of %r>" % (self.backend,)
+
+class _Stat(object):
+	"""What a Recorder knows about one backend function called from one API."""
+	__slots__ = ('count', 'errors', 'bytes', 'seconds', 'buckets', 'paths')
+	def __init__(self, nbuckets):
+		self.count = self.errors = self.bytes = 0
+		self.seconds = 0.0
+		self.buckets = [0] * (nbuckets + 1)
+		self.paths = {}
+
+class Recorder(object):
+	"""
+	Records the backend calls made while it is recording, by backend
+	function (eg, QueryValueEx) and by the API they were made from (the
+	outermost pyreg function, eg 'key.Key.values.__getitem__' for
+	akey['name']): how many, how many failed, the bytes of names and data
+	passed, a histogram of how long they took, and which keys they were on
+	(up to maxpaths different paths for each function and API, after which
+	they are counted under u'(other)').
+
+	  >>> with measure() as recorder:
+	  ...     'Software' in HKEY_CURRENT_USER.keys
+	  >>> recorder.getStats()['OpenKey'].keys()
+	  ['key.Key.keys.__contains__']
+	"""
+	def __init__(self, buckets=BUCKETS, maxpaths=1000):
+		"""Initializer. buckets are the histograms' buckets' upper bounds."""
+		self.buckets = tuple(buckets)
+		self.maxpaths = maxpaths
+		self._lock = threading.Lock()
+		self._stats = {}
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, *exc):
+		self.stop()
+
+	def start(self):
+		"""r.start() -> None
+
+		Starts recording calls, from every thread."""
+		_recordersLock.acquire()
+		try:
+			if self not in _recorders:
+				_recorders.append(self)
+		finally:
+			_recordersLock.release()
+
+	def stop(self):
+		"""r.stop() -> None"""
+		_recordersLock.acquire()
+		try:
+			if self in _recorders:
+				_recorders.remove(self)
+		finally:
+			_recordersLock.release()
+
+	def isRecording(self):
+		"""r.isRecording() -> bool"""
+		return self in _recorders
+
+	def reset(self):
+		"""r.reset() -> None
+
+		Forgets the calls recorded so far."""
+		self._lock.acquire()
+		try:
+			self._stats.clear()
+		finally:
+			self._lock.release()
+
+	def record(self, op, api, path, seconds, nbytes=0, failed=False):
+		"""r.record(op, api, path, seconds[, nbytes[, failed]]) -> None
+
+		Records one call. Backends call this; it is only public so that
+		other things can be recorded too."""
+		bucket = bisect.bisect_left(self.buckets, seconds)
+		self._lock.acquire()
+		try:
+			stat = self._stats.get((op, api))
+			if stat is None:
+				stat = self._stats[op, api] = _Stat(len(self.buckets))
+			stat.count += 1
+			stat.errors += failed
+			stat.bytes += nbytes
+			stat.seconds += seconds
+			stat.buckets[bucket] += 1
+			if path not in stat.paths and len(stat.paths) >= self.maxpaths:
+				path = _OTHER
+			stat.paths[path] = stat.paths.get(path, 0) + 1
+		finally:
+			self._lock.release()
+
+	def getStats(self):
+		"""r.getStats() -> dict
+
+		Returns what has been recorded, as {op: {api: stats}}, stats being a
+		dict of count, errors, bytes, seconds (in all), buckets (a list of
+		(upper bound, calls that took at most that long)) and paths ({path:
+		count})."""
+		stats = {}
+		self._lock.acquire()
+		try:
+			for (op, api), stat in self._stats.iteritems():
+				buckets = []
+				total = 0
+				for bound, count in zip(self.buckets + (float('inf'),), stat.buckets):
+					total += count
+					buckets.append((bound, total))
+				stats.setdefault(op, {})[api] = {'count': stat.count, 'errors': stat.errors,
+					'bytes': stat.bytes, 'seconds': stat.seconds, 'buckets': buckets,
+					'paths': dict(stat.paths)}
+		finally:
+			self._lock.release()
+		return stats
+
+	def toPrometheus(self, prefix='pyreg'):
+		"""r.toPrometheus([prefix]) -> str
+
+		Returns what has been recorded in the Prometheus text format: the
+		counters <prefix>_calls_total, _errors_total and _bytes_total and
+		the histogram <prefix>_call_seconds, labelled by op and api, and
+		<prefix>_path_calls_total, labelled by op, api and path."""
+		stats = self.getStats()
+		rows = []
+		for op in sorted(stats):
+			for api in sorted(stats[op]):
+				rows.append((u'op="%s",api="%s"' % (_label(op), _label(api)), op, api, stats[op][api]))
+		lines = []
+		for name, field, kind, help in (
+				('calls_total', 'count', 'counter', 'Registry calls made.'),
+				('errors_total', 'errors', 'counter', 'Registry calls that raised an error.'),
+				('bytes_total', 'bytes', 'counter', 'Bytes of names and data passed to and from the registry.')):
+			lines.append(u'# HELP %s_%s %s' % (prefix, name, help))
+			lines.append(u'# TYPE %s_%s %s' % (prefix, name, kind))
+			for labels, op, api, stat in rows:
+				lines.append(u'%s_%s{%s} %s' % (prefix, name, labels, stat[field]))
+		lines.append(u'# HELP %s_call_seconds How long registry calls took.' % prefix)
+		lines.append(u'# TYPE %s_call_seconds histogram' % prefix)
+		for labels, op, api, stat in rows:
+			for bound, count in stat['buckets']:
+				le = bound == float('inf') and u'+Inf' or u'%r' % bound
+				lines.append(u'%s_call_seconds_bucket{%s,le="%s"} %i' % (prefix, labels, le, count))
+			lines.append(u'%s_call_seconds_sum{%s} %r' % (prefix, labels, stat['seconds']))
+			lines.append(u'%s_call_seconds_count{%s} %i' % (prefix, labels, stat['count']))
+		lines.append(u'# HELP %s_path_calls_total Registry calls made, by key.' % prefix)
+		lines.append(u'# TYPE %s_path_calls_total counter' % prefix)
+		for labels, op, api, stat in rows:
+			for path in sorted(stat['paths']):
+				lines.append(u'%s_path_calls_total{%s,path="%s"} %i' % (prefix, labels,
+					_label(path), stat['paths'][path]))
+		return (u'\n'.join(lines) + u'\n').encode('utf-8')
+
+def _label(value):
+	"""Escapes a label value for the Prometheus text format."""
+	if value is None:
+		return u''
+	return unicode(value).replace(u'\\', u'\\\\').replace(u'"', u'\\"').replace(u'\n', u'\\n') #Py3k
+
+def enable():
+	"""enable() -> InstrumentedBackend
+
+	Wraps the default backend (see pyreg.backend.setDefault()) in an
+	InstrumentedBackend, if it isn't already, so that Keys made from the
+	roots from now on can be measured. Returns it."""
+	default = _backends.getDefault()
+	if not isinstance(default, InstrumentedBackend):
+		default = InstrumentedBackend(default)
+		_backends.setDefault(default)
+	return default
+
+def disable():
+	"""disable() -> None
+
+	Goes back to the default backend enable() wrapped. Keys made since keep
+	the InstrumentedBackend, but it doesn't measure anything while no
+	Recorder is recording."""
+	default = _backends.getDefault()
+	if isinstance(default, InstrumentedBackend):
+		_backends.setDefault(default.backend)
+
+def measure(buckets=BUCKETS, maxpaths=1000):
+	"""measure([buckets[, maxpaths]]) -> Recorder
+
+	Calls enable(), and returns a new Recorder, to be used in a with
+	statement:
+
+	  >>> with measure() as recorder:
+	  ...     do_something()
+	  >>> print recorder.toPrometheus()
+	"""
+	enable()
+	return Recorder(buckets, maxpaths)
@@ -5,7 +5,14 @@ Last modified $Date$
 """
 # Search for #Py3k in the source to find areas that need work when Python3 comes out
 from __future__ import absolute_import
-import _winreg, datetime, sys, UserDict
+import itertools, sys, threading, UserDict, weakref
+from ._lru import LRU
+from .backend import KEY_READ, _setData
+from .pool import getPool, _stale
+from .cache import getCache
+from .batch import Batch, _current as _currentBatch
+from .flush import getScheduler
+from .keypath import canonical, fold
 from .types import Binary, DWORD, DWORD_BigEndian, DWORD_LittleEndian, ExpandingString, Link, MultiString, ResourceList, String, rNone, _Registry2Object, _Object2Registry
 
 __all__= 'Key',
@@ -32,20 +39,163 @@ __all__= 'Key',
 #		"""Get the actual value that this references."""
 #		return self.parent.values[self.value]
 
-class _RegValues(UserDict.DictMixin):
+def _mtime2datetime(nsec):
+	"""Converts a last write time from QueryInfoKey() to a datetime."""
+	# Not imported until it's needed, because it's slow to import
+	import datetime
+	delta = datetime.timedelta(microseconds=nsec/10.0)
+	epoch = datetime.datetime(1600, 1, 1)
+	return epoch + delta
+
+def _enumKeys(backend, handle):
+	"""Returns a list of the names of the subkeys of the given handle."""
+	names = []
+	n = 0
+	while True:
+		try:
+			names.append(backend.EnumKey(handle, n))
+		except EnvironmentError, e:
+			if not n and _stale(e):
+				raise
+			return names
+		n += 1
+
+def _check(handle, backend):
+	"""Returns handle, once a QueryInfoKey() has shown that it works."""
+	backend.QueryInfoKey(handle)
+	return handle
+
+def _enumFirst(handle, enum):
+	"""Returns handle and a list of enum(handle, 0), or an empty one if
+	there is nothing to enumerate."""
+	try:
+		return handle, [enum(handle, 0)]
+	except EnvironmentError, e:
+		if _stale(e):
+			raise
+		return handle, []
+
+def _enum(key, enum):
+	"""Yields enum(handle, 0), enum(handle, 1), ... for a handle that can
+	read key, until enum raises an error (as EnumKey() and EnumValue() do
+	after the last one)."""
+	handle, first = key._read(_enumFirst, enum)
+	if not first:
+		return
+	yield first[0]
+	n = 1
+	while True:
+		try:
+			item = enum(handle, n)
+		except EnvironmentError:
+			return
+		yield item
+		n += 1
+
+def _held(live, count, backend, handle, owned=True):
+	"""Returns the record of a handle that count subkeys are going to be
+	opened relative to while walking a tree, and adds it to live (the
+	records still held). If owned, the handle is closed by _release() once
+	they all have been."""
+	record = [count, backend, handle, owned]
+	live.append(record)
+	return record
+
+def _release(live, record):
+	"""Counts one more subkey of record's handle as opened (or given up on),
+	closing the handle if that was the last one."""
+	record[0] -= 1
+	if not record[0]:
+		# Usually the last one held; by identity, since records can be equal
+		for i in xrange(len(live) - 1, -1, -1):
+			if live[i] is record:
+				del live[i]
+				break
+		if record[3]:
+			record[1].CloseKey(record[2])
+
+def _releaseAll(live):
+	"""Closes the handles still held by a walk that has ended early."""
+	while live:
+		count, backend, handle, owned = live.pop()
+		if owned:
+			try:
+				backend.CloseKey(handle)
+			except EnvironmentError:
+				pass
+
+def _snapshot(backend, handle):
+	"""Reads all of the values of the given handle into a Snapshot."""
+	count, mtime = backend.QueryInfoKey(handle)[1:]
+	names = [None] * count
+	values = [None] * count
+	for n in xrange(count):
+		try:
+			name, data, typ = backend.EnumValue(handle, n)
+		except EnvironmentError:
+			# Values were deleted while we were looking
+			del names[n:], values[n:]
+			break
+		names[n] = name
+		values[n] = _Registry2Object(typ, data)
+	return Snapshot(tuple(names), tuple(values), mtime)
+
+class Snapshot(UserDict.DictMixin, object):
+	"""The values of a key as they were at one time, from Key.snapshot().
+	Works like a read-only dictionary of the values, looked up
+	case-insensitively like the registry does. mtime is the key's last write
+	time (as QueryInfoKey() gives it) when the snapshot was taken."""
+	__slots__ = ('_names', '_values', '_index', 'mtime')
+	def __init__(self, names, values, mtime):
+		"""Initializer. Use Key.snapshot() instead."""
+		self._names = names
+		self._values = values
+		self._index = dict([(n.lower(), i) for i, n in enumerate(names)])
+		self.mtime = mtime
+	def __len__(self):
+		"""x.__len__() <==> len(x)"""
+		return len(self._names)
+	def __getitem__(self, key):
+		"""x.__getitem__(y) <==> x[y]"""
+		try:
+			return self._values[self._index[(key or u'').lower()]]
+		except KeyError:
+			raise KeyError(key)
+	def __setitem__(self, key, value):
+		raise TypeError("Snapshots are read-only")
+	def __delitem__(self, key):
+		raise TypeError("Snapshots are read-only")
+	def __contains__(self, item):
+		"""s.__contains__(y) <==> y in s"""
+		return (item or u'').lower() in self._index
+	def __iter__(self):
+		"""x.__iter__() <==> iter(x)"""
+		return iter(self._names)
+	def keys(self): #Py3k
+		"""s.keys() -> list of the value names"""
+		return list(self._names)
+	def iteritems(self): #Py3k
+		"""s.iteritems() -> iterator of (name, value)"""
+		return itertools.izip(self._names, self._values)
+	def getMTime(self):
+		"""s.getMTime() -> datetime.datetime
+
+		Returns the time the key was last modified as of the snapshot."""
+		return _mtime2datetime(self.mtime)
+
+class _RegValues(UserDict.DictMixin, object):
 	"""A dictionary wrapping the values of the key that created it. Don't
 	instantiate yourself, use akey.values. Note that while it is a full
-	dictionary, many of the methods don't make sense (eg, push() and pop())."""
+	dictionary, many of the methods don't make sense (eg, push() and pop()).
+	Made each time akey.values is used, so the key doesn't keep one."""
 	__slots__='parent',
 	def __init__(self, parent):
 		self.parent=parent
-	def __del__(self):
-		self.parent = None
 	def __len__(self):
 		"""x.__len__() <==> len(x)
 		
 		Returns the number of values in this key."""
-		info = _winreg.QueryInfoKey(self.parent._handle)
+		info = self.parent._read(self.parent._backend.QueryInfoKey)
 		return info[1]
 #	def ref(self, key):
 #		"""Returns a reference to the value; see ValueReference."""
@@ -54,25 +204,46 @@ class _RegValues(UserDict.DictMixin):
 		"""x.__getitem__(y) <==> x[y]
 		
 		Returns the contents of the given value, or creates a new one."""
+		parent = self.parent
+		batch = _currentBatch(parent)
+		if batch is not None:
+			found, value = batch.get(parent, key)
+			if found:
+				return value
+		if _cache.enabled:
+			try:
+				return parent._read(lambda handle: _cache.get(parent._backend, handle, parent._ident(), key))
+			except EnvironmentError:
+				raise KeyError(key)
 		try:
-			val = _winreg.QueryValueEx(self.parent._handle, key)
-		except WindowsError:
+			val = parent._read(parent._backend.QueryValueEx, key)
+		except EnvironmentError:
 			raise KeyError
 		return _Registry2Object(val[1],val[0]);
 	def __setitem__(self, key, value):
 		"""x.__setitem__(i, y) <==> x[i]=y
 		
 		Sets the contents of the given value."""
+		batch = _currentBatch(self.parent)
+		if batch is not None:
+			batch.set(self.parent, key, value)
+			return
 		t = _Object2Registry(value)
-		try: _winreg.SetValueEx(self.parent._handle, key, 0, t[1], t[0])
-		except:
-			print (self.parent._handle, key, 0, t[1], t[0])
-			raise
+		data = _setData(self.parent._backend, t[1], t[0])
+		self.parent._write(self.parent._backend.SetValueEx, key, 0, t[1], data)
+		if _cache.enabled:
+			_cache.invalidate(self.parent._ident(), key or u'')
 	def __delitem__(self, key):
 		"""x.__delitem__(y) <==> del x[y]
 		
 		Deletes the given value."""
-		_winreg.DeleteValue(self.parent._handle, key)
+		batch = _currentBatch(self.parent)
+		if batch is not None:
+			batch.delete(self.parent, key)
+			return
+		self.parent._write(self.parent._backend.DeleteValue, key)
+		if _cache.enabled:
+			_cache.invalidate(self.parent._ident(), key or u'')
 	def keys(self): #Py3k
 		"""k.keys() -> list
 		
@@ -83,45 +254,28 @@ class _RegValues(UserDict.DictMixin):
 		"""x.__iter__() <==> iter(x)
 		
 		Returns a generator that enumerates the names of the values."""
-		n = 0
-		key = ""
-		while True:
-			try:
-				key = _winreg.EnumValue(self.parent._handle, n)
-				n += 1
-			except EnvironmentError:
-				break
-			else:
-				yield key[0]
+		for key in _enum(self.parent, self.parent._backend.EnumValue):
+			yield key[0]
 	def iteritems(self): #Py3k
 		"""x.iteritems() -> generator
 		
 		Returns a generator that enumerates the names & contents of the values."""
-		n = 0
-		while True:
-			try:
-				name, data, typ = _winreg.EnumValue(self.parent._handle, n)
-				n += 1
-			except EnvironmentError:
-				break
-			else:
-				yield name, _Registry2Object(typ,data)
+		for name, data, typ in _enum(self.parent, self.parent._backend.EnumValue):
+			yield name, _Registry2Object(typ,data)
 	def __contains__(self, item):
 		"""v.__contains__(s) <==> s in v
 		
 		True if the given value exists."""
 		try:
-			_winreg.QueryValueEx(self.parent._handle, item)
-		except WindowsError:
+			self.parent._read(self.parent._backend.QueryValueEx, item)
+		except EnvironmentError:
 			return False
 		else:
 			return True
 	
 	def copy(self):
 		"""D.copy() -> a shallow copy of D"""
-		value = {}
-		for i in self.iteritems(): value[i[0]] = i[1] #Py3k
-		return value
+		return dict(self.parent.snapshot().iteritems()) #Py3k
 	def update(self, dict, **kwargs):
 		"""D.update(E, **F) -> None.  Upadte D from E and F: for k in E: D[k] = E[k]
 		(if E has keys else: for (k, v) in E: D[k] = v) then: for k in F: D[k] = F[k]"""
@@ -133,31 +287,35 @@ class _RegValues(UserDict.DictMixin):
 			except: pass
 		for k in kwargs: self[k] = kwargs[k]
 
-class _RegKeys(UserDict.DictMixin):
+class _RegKeys(UserDict.DictMixin, object):
 	"""A dictionary wrapping the subkeys of the key that created it. Don't
 	instantiate yourself, use akey.keys. Note that while it is a full
-	dictionary, many of the methods don't make sense (eg, push() and pop())."""
-	__slots__=('parent')
+	dictionary, many of the methods don't make sense (eg, push() and pop()).
+	Made each time akey.keys is used, so the key doesn't keep one."""
+	__slots__='parent',
 	def __init__(self,parent):
 		self.parent=parent
-	def __del__(self):
-		self.parent = None
 	def __len__(self):
 		"""x.__len__() <==> len(x)
 		
 		Returns the number of subkeys in this key."""
-		info = _winreg.QueryInfoKey(self.parent._handle)
+		info = self.parent._read(self.parent._backend.QueryInfoKey)
 		return info[0]
 	def __getitem__(self,key):
 		"""x.__getitem__(y) <==> x[y]
 		
 		Returns the Key of the given subkey, or creates a new one."""
-		return Key(self.parent,key)
+		return _child(self.parent, key)
 	def __delitem__(self, key):
 		"""x.__delitem__(y) <==> del x[y]
 		
 		Deletes the given subkey."""
-		_winreg.DeleteKey(self.parent._handle, key)
+		parent = self.parent
+		parent._read(parent._backend.DeleteKey, key)
+		path = parent._subpath(key)
+		_pool.discard(parent._backend, parent._root, path)
+		if _cache.enabled:
+			_cache.invalidate((parent._backend, parent._root, fold(path)))
 	def keys(self): #Py3k
 		"""k.keys() -> list
 		
@@ -168,34 +326,95 @@ class _RegKeys(UserDict.DictMixin):
 		"""x.__iter__() <==> iter(x)
 		
 		Returns a generator that enumerates the names of the subkeys."""
-		n = 0
-		while True:
-			try:
-				key = _winreg.EnumKey(self.parent._handle, n)
-				n += 1
-			except EnvironmentError:
-				break
-			else:
-				yield key
+		for key in _enum(self.parent, self.parent._backend.EnumKey):
+			yield key
 	def __contains__(self, item):
 		"""k.__contains__(s) <==> s in k
 		
 		True if the given subkey exists."""
+		parent = self.parent
 		try:
-			hkey = _winreg.OpenKey(self.parent._handle, item)
-		except WindowsError:
+			hkey = parent._backend.OpenKey(parent._root, parent._subpath(item))
+		except EnvironmentError:
 			return False
 		else:
+			parent._backend.CloseKey(hkey)
 			return True
 
+_pool = getPool()
+_cache = getCache()
+
+_children = LRU()
+"""Keys already made by akey.keys[name] (and akey / name), by what they
+are (see Key._ident()), so that going to the same key again, however it is
+spelled or reached, doesn't make a new Key (and its parents). At most
+_maxChildren are kept, least recently used ones going first."""
+_maxChildren = 4096
+_childrenLock = threading.Lock()
+
+def _child(parent, name):
+	"""Returns the Key for subkey name of parent, from _children if it can."""
+	name = canonical(name)
+	ident = (parent._backend, parent._root, fold(parent._subpath(name)))
+	_childrenLock.acquire()
+	try:
+		key = _children.get(ident)
+	finally:
+		_childrenLock.release()
+	if key is None:
+		key = Key(parent, name)
+		_childrenLock.acquire()
+		try:
+			_children.set(ident, key)
+			while len(_children) > _maxChildren:
+				_children.popOldest()
+		finally:
+			_childrenLock.release()
+	return key
+
+_fixed = {}
+"""The handles of keys opened by someone else (see _FIXED), by a weak
+reference to the Key, so that they are closed when the Key goes away
+without the Key needing a __del__()."""
+
+def _closeFixed(ref):
+	"""Closes the handle of a Key that has gone away."""
+	entry = _fixed.pop(ref, None)
+	if entry is not None:
+		try:
+			entry[0].CloseKey(entry[1])
+		except EnvironmentError:
+			pass
+
+# Where a Key gets its handle
+_POOLED = 0
+"""From the handle pool, as needed."""
+_FIXED = 1
+"""Its own, opened by someone else (eg, openKey())."""
+_ROOT = 2
+"""A predefined key; never closed."""
+
 class Key(object):
-	"""Wraps a registry key in a convenient way."""
-	__slots__=('_handle','parent','myname','values','keys')
-	def __init__(self, curkey=None, subkey='', hkey=None):
-		"""Initializer. Don't pass anything to hkey, it is used internally."""
-		subkey = unicode(subkey)
-		subkey = subkey.replace('/', '\\')
-		
+	"""Wraps a registry key in a convenient way.
+
+	A Key only remembers its path until something actually needs the key;
+	then it opens it (the whole path at once, from the root) for reading, or
+	creates it if something is being written. The handles are kept in the
+	pool (see pyreg.pool) rather than in the Key, so they are shared with
+	other Keys for the same path."""
+	__slots__=('_handle','_mode','_backend','_root','_path','_paths','parent','myname','__weakref__')
+	def __init__(self, curkey=None, subkey='', hkey=None, backend=None):
+		"""Initializer. Don't pass anything to hkey or backend, they are used
+		internally."""
+		subkey = canonical(subkey)
+
+		## The thing that provides the _winreg functions for this key (see
+		## pyreg.backend). Roots provide their own.
+		if backend is None and curkey is not None:
+			backend = curkey._backend
+		if backend is not None:
+			self._backend = backend
+
 		## If they're grabbing more than one at a time, sort out parents.
 		sep = subkey.rfind('\\')
 		if sep != -1:
@@ -204,23 +423,121 @@ class Key(object):
 		else:
 			self.parent = curkey
 			self.myname = subkey
-		
-		if hkey is not None:
-			self._handle=hkey
+
+		## Keys are opened relative to their root, so that opening one doesn't
+		## open its parents.
+		if curkey is None:
+			self._root = hkey
+			self._path = u''
 		else:
-			self._handle = _winreg.CreateKey(curkey._handle, subkey)
-		
-		self.values = _RegValues(self)
-		self.keys = _RegKeys(self)
-		
-	def __del__(self):
-		try: del self.values
-		except: pass
-		try: del self.keys
-		except: pass
+			self._root = curkey._root
+			self._path = canonical(curkey._subpath(subkey))
+		self._paths = None
+
+		self._handle = hkey
+		if hkey is None:
+			self._mode = _POOLED
+		elif curkey is None:
+			self._mode = _ROOT
+		else:
+			self._mode = _FIXED
+			_fixed[weakref.ref(self, _closeFixed)] = (self._backend, hkey)
+
+	@property
+	def values(self):
+		"""The values of this key, as a dictionary."""
+		return _RegValues(self)
+
+	@property
+	def keys(self):
+		"""The subkeys of this key, as a dictionary of Keys."""
+		return _RegKeys(self)
+
+	def close(self):
+		"""k.close() -> None
+
+		Lets go of this key's handles. The key can still be used; it will just
+		be opened again."""
+		if self._mode == _POOLED:
+			_pool.discard(self._backend, self._root, self._path)
+		elif self._mode == _FIXED:
+			handle, self._handle = self._handle, None
+			self._mode = _POOLED
+			_fixed.pop(weakref.ref(self), None)
+			self._backend.CloseKey(handle)
+	def __enter__(self):
+		return self
+	def __exit__(self, *exc):
+		self.close()
+
+	def _ident(self):
+		"""Returns something that identifies the key this is, rather than
+		the Key object."""
+		return (self._backend, self._root, fold(self._path))
+
+	def _subpath(self, subkey):
+		"""Returns the path of subkey from this key's root."""
+		if self._path and subkey:
+			return self._path + u'\\' + subkey
+		else:
+			return self._path or subkey
+
+	def _reader(self):
+		"""k._reader() -> handle
+
+		Returns a handle that can be used to read this key, opening it if
+		needed. Raises an error if the key doesn't exist."""
+		if self._mode == _POOLED:
+			return _pool.reader(self._backend, self._root, self._path)
+		return self._handle
+
+	def _writer(self):
+		"""k._writer() -> handle
+
+		Returns a handle that can be used to change this key, creating it if
+		needed."""
+		if self._mode == _POOLED:
+			return _pool.writer(self._backend, self._root, self._path)
+		return self._handle
+
+	def _read(self, func, *args):
+		"""k._read(func, *args) -> object
+
+		Returns func(handle, *args), for a handle that can read this key. If
+		the key was deleted (and perhaps made again) behind the pool's back,
+		the handle is stale; then the key is opened again, and func called
+		once more."""
+		handle = self._reader()
 		try:
-			_winreg.CloseKey(self._handle)
-		except: pass
+			return func(handle, *args)
+		except EnvironmentError, e:
+			if self._mode != _POOLED or not _stale(e):
+				raise
+		return func(_pool.reopen(self._backend, self._root, self._path), *args)
+
+	def _write(self, func, *args):
+		"""k._write(func, *args) -> object
+
+		Like _read(), but with a handle that can change this key, creating
+		it if needed."""
+		handle = self._writer()
+		try:
+			return func(handle, *args)
+		except EnvironmentError, e:
+			if self._mode != _POOLED or not _stale(e):
+				raise
+		return func(_pool.reopen(self._backend, self._root, self._path, True), *args)
+
+	def _checked(self, write=False):
+		"""k._checked([write]) -> handle
+
+		Returns a handle (from _writer() if write is True, otherwise from
+		_reader()) that is known not to be stale, for when a lot of calls are
+		going to be made with it."""
+		if write:
+			return self._write(_check, self._backend)
+		return self._read(_check, self._backend)
+
 	def __repr__(self):
 		"""x.__repr__() <==> repr(x)"""
 		return "%r/%r" % (self.parent, self.myname)
@@ -237,12 +554,12 @@ class Key(object):
 		
 		Not actually division,. Gets the subkey other (string or Key).
 		Equivelent to self.keys[other]"""
-		return self.keys[other]
+		return _child(self, other)
 	def __truediv__(self, other):
 		"""x.__truediv__(y) <==> x/y
 		
 		See Key.__div__()"""
-		return self.keys[other]
+		return _child(self, other)
 	def __getitem__(self, key):
 		"""x.__getitem__(y) <==> x[y]
 		
@@ -282,14 +599,33 @@ class Key(object):
 		Returns the path (eg, "HKCU\Software\Python 2.4") of the key
 		wrapped by this key. If abbrev is False, the full root (eg, HKEY_CURRENT_USER)
 		is used."""
-		return unicode(u"%s\\%s" % (self.parent.getPath(abbrev), self.myname))
-	def flush(self):
-		"""k.flush() -> None
-		
-		Ensures that this key is written to disk. Calls _winreg.FlushKey(). See
-		<http://msdn.microsoft.com/library/en-us/sysinfo/base/regflushkey.asp>"""
+		paths = self._paths
+		if paths is None:
+			paths = self._paths = [None, None]
+		path = paths[bool(abbrev)]
+		if path is None:
+			# The path from the root is already known, so just find the root
+			top = self.parent
+			while top.parent is not None:
+				top = top.parent
+			path = paths[bool(abbrev)] = unicode(u"%s\\%s" % (top.getPath(abbrev), self._path))
+		return path
+	def flush(self, later=False):
+		"""k.flush([later]) -> None
+
+		Ensures that this key is written to disk. Calls FlushKey(). See
+		<http://msdn.microsoft.com/library/en-us/sysinfo/base/regflushkey.asp>
+		If later is True, the flush is left to the background FlushScheduler
+		(see pyreg.flush.getScheduler()) instead."""
+		if later:
+			getScheduler().request(self)
+			return
 		# Thanks to Shane Geiger for finding this bug.
-		_winreg.FlushKey(self._handle)
+		batch = _currentBatch(self)
+		if batch is not None:
+			batch.flushKey(self)
+			return
+		self._read(self._backend.FlushKey)
 	def loadKey(self, key, file):
 		"""k.loadKey(key, file) -> Key
 		
@@ -297,14 +633,14 @@ class Key(object):
 		Creates and returns a subkey, loading information from the given file.
 		Loads subkey key from file file. Only valid on HKEY_LOCAL_MACHINE and
 		HKEY_USERS."""
-		hkey = _winreg.RegLoadKey(self._handle, key, file)
-		return Key(self, key, hkey)
+		self._read(self._backend.LoadKey, key, file)
+		return Key(self, key)
 	def saveKey(self, filename):
 		"""k.saveKey(filename) -> None
 		
 		Opposite of loadKey(). Saves the currrent key to file filename."""
-		_winreg.saveKey(self._handle, filename)
-	def openKey(self, key, sam=_winreg.KEY_READ):
+		self._read(self._backend.SaveKey, filename)
+	def openKey(self, key, sam=KEY_READ):
 		"""k.openKey(key[, sam]) -> Key
 		
 		Identical to akey.keys[key], except an error is generated if the
@@ -312,17 +648,112 @@ class Key(object):
 		Use the KEY_* constants for sam. See
 		<http://msdn.microsoft.com/library/en-us/sysinfo/base/registry_key_security_and_access_rights.asp>
 		for details."""
-		hkey = _winreg.OpenKey(self._handle, key, 0, sam)
+		hkey = self._backend.OpenKey(self._root, self._subpath(key), 0, sam)
 		return Key(self, key, hkey)
+	def create(self):
+		"""k.create() -> Key
+
+		Creates this key (and any missing parents) if it doesn't exist yet.
+		Returns the key itself. Writing to a key creates it too."""
+		self._checked(True)
+		return self
+	def snapshot(self):
+		"""k.snapshot() -> Snapshot
+
+		Returns all of the values of this key at once, in a read-only
+		dictionary-like object. This reads the key in one pass, instead of
+		one call to list the values and one more per value."""
+		backend = self._backend
+		return self._read(lambda handle: _snapshot(backend, handle))
+	def batch(self, flush=True, rollback=False):
+		"""k.batch([flush[, rollback]]) -> Batch
+
+		Returns a Batch, for use in a with statement: values set and deleted
+		in this key and the keys under it (in this thread) are held on to
+		until the end, and then written in one go, flushing each key that
+		was changed once if flush is True. If rollback is True and writing
+		them fails, the values written are put back. See pyreg.batch.Batch.
+
+		  >>> with akey.batch():
+		  ...     akey['Spam'] = 1
+		  ...     (akey / 'Eggs')['Ham'] = u'green'
+		"""
+		return Batch(self, flush, rollback)
+	def walk(self, topdown=True, maxdepth=None, prune=None, onerror=None):
+		"""k.walk([topdown[, maxdepth[, prune[, onerror]]]]) -> generator
+
+		Like os.walk(), goes through this key and every key under it, yielding
+		(path, subkeys, values) for each. path is relative to this key (u''
+		for this key itself, so self / path is the Key), subkeys is a list of
+		the names of its subkeys and values is a Snapshot of its values.
+
+		Keys are only read, never created. Each one is opened once (relative
+		to its parent, for reading), and closed as soon as the last of its
+		subkeys has been opened, so only keys on the way down to the current
+		one are kept open; walking huge trees (eg, HKCR\\CLSID) takes memory
+		and handles in proportion to how deep and wide they are, not to how
+		many keys there are in all.
+
+		If topdown is True, a key is yielded before its subkeys, and the
+		subkeys list can be changed in place to choose which of them are
+		visited; otherwise it is yielded after them. maxdepth limits how far
+		down to go: 0 is just this key, 1 its subkeys, and so on. prune, if
+		given, is called with the path of each subkey before it is opened;
+		if it returns true, the subkey and everything under it is skipped.
+		Errors opening or reading a key are passed to onerror, if given, and
+		the key is skipped; by default they are ignored."""
+		backend = self._backend
+		# Each entry is (path, depth, parent, name) for a key still to be
+		# opened, where parent is the record (see _held()) of the key above
+		# it, or (path, subkeys, values) for one that has been read and is
+		# waiting for its subkeys to be done (only when not topdown).
+		stack = [(u'', 0, None, None)]
+		live = []
+		try:
+			while stack:
+				entry = stack.pop()
+				if len(entry) == 3:
+					yield entry
+					continue
+				path, depth, parent, name = entry
+				handle = None
+				try:
+					if parent is None:
+						handle = self._checked()
+					else:
+						try:
+							handle = backend.OpenKey(parent[2], name, 0, KEY_READ)
+						finally:
+							_release(live, parent)
+					subkeys = _enumKeys(backend, handle)
+					values = _snapshot(backend, handle)
+				except EnvironmentError, e:
+					if handle is not None and parent is not None:
+						backend.CloseKey(handle)
+					if onerror is not None:
+						onerror(e)
+					continue
+				record = _held(live, 1, backend, handle, parent is not None)
+				if topdown:
+					yield path, subkeys, values
+				else:
+					stack.append((path, subkeys, values))
+				if maxdepth is None or depth < maxdepth:
+					for name in reversed(subkeys):
+						subpath = path and path + u'\\' + name or name
+						if prune is not None and prune(subpath):
+							continue
+						record[0] += 1
+						stack.append((subpath, depth + 1, record, name))
+				_release(live, record)
+		finally:
+			_releaseAll(live)
 	def getMTime(self):
 		"""k.getMTime() -> datetime.datetime
 		
 		Returns a datetime.datetime containing the time this key was last modified."""
-		info = _winreg.QueryInfoKey(self._handle)
-		nsec = info[2]
-		delta = datetime.timedelta(microseconds=nsec/10.0)
-		epoch = datetime.datetime(1600, 1, 1)
-		return epoch + delta
+		info = self._read(self._backend.QueryInfoKey)
+		return _mtime2datetime(info[2])
 	def getParent(self):
 		"""k.getParent() -> Key
 		
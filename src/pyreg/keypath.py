@@ -0,0 +1,68 @@
+"""
+pyreg.keypath - Canonical, shared key paths
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+
+__all__ = ('canonical', 'fold', 'getMaxSize', 'setMaxSize')
+
+_interned = {}
+"""Path -> (canonical path, its lowercase form)."""
+_folds = {}
+"""Lowercase form -> itself, so that each is shared too."""
+_maxsize = 65536
+
+def _intern(path):
+	"""Returns (canonical path, lowercase form) for path, from _interned if it
+	can."""
+	try:
+		return _interned[path]
+	except KeyError:
+		pass
+	except TypeError:
+		path = unicode(path)
+	text = unicode(path).replace(u'/', u'\\')
+	entry = _interned.get(text)
+	if len(_interned) >= _maxsize:
+		# Simpler (and cheaper, for the usual case of a working set that
+		# fits) than keeping track of what was used last.
+		_interned.clear()
+		_folds.clear()
+	if entry is None:
+		lower = text.lower()
+		entry = (text, _folds.setdefault(lower, lower))
+	_interned[path] = _interned[text] = entry
+	return entry
+
+def canonical(path):
+	"""canonical(path) -> unicode
+
+	Returns path as unicode (with / changed to \\), the same string each
+	time, so that equal paths share the same object."""
+	return _intern(path)[0]
+
+def fold(path):
+	"""fold(path) -> unicode
+
+	Returns the lowercase form of canonical(path), the same string each
+	time. Paths to the same key have the same fold, since the registry
+	doesn't care about case."""
+	return _intern(path)[1]
+
+def getMaxSize():
+	"""getMaxSize() -> int
+
+	Returns how many paths canonical() remembers."""
+	return _maxsize
+
+def setMaxSize(maxsize):
+	"""setMaxSize(maxsize) -> None
+
+	Changes how many paths canonical() remembers."""
+	global _maxsize
+	_maxsize = maxsize
+	if len(_interned) > maxsize:
+		_interned.clear()
+		_folds.clear()
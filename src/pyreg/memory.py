@@ -0,0 +1,229 @@
+"""
+pyreg.memory - A registry that lives in memory
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import threading, time
+from .backend import Backend, RegistryError, _packData, _unpackData, \
+	KEY_READ, KEY_ALL_ACCESS, KEY_QUERY_VALUE, KEY_SET_VALUE, KEY_CREATE_SUB_KEY, \
+	KEY_ENUMERATE_SUB_KEYS, ERROR_FILE_NOT_FOUND, ERROR_ACCESS_DENIED, ERROR_INVALID_HANDLE, \
+	ERROR_NO_MORE_ITEMS, ERROR_KEY_DELETED
+
+__all__ = 'MemoryRegistry',
+
+_EPOCH_DELTA = 11644473600
+"""Seconds between 1601-01-01 (FILETIME's epoch) and 1970-01-01."""
+
+def _filetime():
+	"""Returns the current time as a FILETIME."""
+	return long((time.time() + _EPOCH_DELTA) * 10000000)
+
+class _Node(object):
+	"""A key. Subkeys and values are dicts keyed by the lowercased name; the
+	sorted subkey list and the value order list are for the Enum* functions."""
+	__slots__ = ('name', 'parent', 'subkeys', 'sorted', 'values', 'order', 'mtime')
+	def __init__(self, name, parent, mtime):
+		self.name = name
+		self.parent = parent
+		self.subkeys = {}
+		self.sorted = None
+		self.values = {}
+		self.order = []
+		self.mtime = mtime
+
+class _Handle(object):
+	"""An open key, like _winreg's PyHKEY."""
+	__slots__ = ('node', 'sam', 'closed')
+	def __init__(self, node, sam):
+		self.node = node
+		self.sam = sam
+		self.closed = False
+	def Close(self):
+		"""Closes the handle. Using it afterwards is an error."""
+		self.closed = True
+	def __enter__(self):
+		return self
+	def __exit__(self, *exc):
+		self.Close()
+
+def _notFound():
+	return RegistryError(ERROR_FILE_NOT_FOUND, "The system cannot find the file specified")
+
+class MemoryRegistry(Backend):
+	"""
+	A complete registry kept in dicts, for running pyreg (and the code using
+	it) where there is no registry, and for testing and benchmarking without
+	touching the real one. It is safe to use from several threads at once.
+
+	Last write times are kept like the registry does: setting or deleting a
+	value updates the key's, adding or deleting a subkey updates the parent's.
+	They always go forward, even if two writes come within the clock's
+	resolution.
+	"""
+	def __init__(self):
+		"""Initializer. Starts out with every root empty."""
+		self._lock = threading.RLock()
+		self._roots = {}
+		self._lastTime = 0
+
+	def _now(self):
+		now = _filetime()
+		if now <= self._lastTime:
+			now = self._lastTime + 1
+		self._lastTime = now
+		return now
+
+	def _node(self, key, access=0):
+		"""Returns the _Node the given handle refers to, checking that the
+		handle was opened with the given access."""
+		if isinstance(key, _Handle):
+			if key.closed:
+				raise RegistryError(ERROR_INVALID_HANDLE, "The handle is invalid")
+			if key.sam & access != access:
+				raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+			node = key.node
+			if node.parent is None and node not in self._roots.itervalues():
+				raise RegistryError(ERROR_KEY_DELETED, "Illegal operation attempted on a registry key that has been marked for deletion")
+			return node
+		try:
+			return self._roots[key]
+		except KeyError:
+			if not isinstance(key, (int, long)):
+				raise RegistryError(ERROR_INVALID_HANDLE, "The handle is invalid")
+			node = self._roots[key] = _Node(u'', None, self._now())
+			return node
+
+	def _walk(self, node, sub_key, create):
+		if not sub_key:
+			return node
+		for part in unicode(sub_key).split(u'\\'):
+			if not part: continue
+			lower = part.lower()
+			try:
+				node = node.subkeys[lower]
+			except KeyError:
+				if not create:
+					raise _notFound()
+				child = _Node(part, node, self._now())
+				node.subkeys[lower] = child
+				node.sorted = None
+				node.mtime = child.mtime
+				node = child
+		return node
+
+	def _sorted(self, node):
+		if node.sorted is None:
+			node.sorted = sorted(node.subkeys.itervalues(), key=lambda n: n.name.lower())
+		return node.sorted
+
+	def OpenKey(self, key, sub_key, reserved=0, sam=KEY_READ):
+		self._lock.acquire()
+		try:
+			return _Handle(self._walk(self._node(key), sub_key, False), sam)
+		finally:
+			self._lock.release()
+	OpenKeyEx = OpenKey
+
+	def CreateKey(self, key, sub_key):
+		self._lock.acquire()
+		try:
+			return _Handle(self._walk(self._node(key, KEY_CREATE_SUB_KEY), sub_key, True), KEY_ALL_ACCESS)
+		finally:
+			self._lock.release()
+
+	def CloseKey(self, key):
+		if isinstance(key, _Handle):
+			key.Close()
+
+	def EnumKey(self, key, index):
+		self._lock.acquire()
+		try:
+			subkeys = self._sorted(self._node(key, KEY_ENUMERATE_SUB_KEYS))
+			if index < 0 or index >= len(subkeys):
+				raise RegistryError(ERROR_NO_MORE_ITEMS, "No more data is available")
+			return subkeys[index].name
+		finally:
+			self._lock.release()
+
+	def EnumValue(self, key, index):
+		self._lock.acquire()
+		try:
+			node = self._node(key, KEY_QUERY_VALUE)
+			if index < 0 or index >= len(node.order):
+				raise RegistryError(ERROR_NO_MORE_ITEMS, "No more data is available")
+			name, typ, raw = node.values[node.order[index]]
+		finally:
+			self._lock.release()
+		return name, _unpackData(typ, raw), typ
+
+	def QueryValueEx(self, key, value_name):
+		self._lock.acquire()
+		try:
+			try:
+				name, typ, raw = self._node(key, KEY_QUERY_VALUE).values[(value_name or u'').lower()]
+			except KeyError:
+				raise _notFound()
+		finally:
+			self._lock.release()
+		return _unpackData(typ, raw), typ
+
+	def QueryInfoKey(self, key):
+		self._lock.acquire()
+		try:
+			node = self._node(key)
+			return len(node.subkeys), len(node.values), node.mtime
+		finally:
+			self._lock.release()
+
+	def SetValueEx(self, key, value_name, reserved, type, value):
+		raw = _packData(type, value)
+		name = unicode(value_name or u'')
+		lower = name.lower()
+		self._lock.acquire()
+		try:
+			node = self._node(key, KEY_SET_VALUE)
+			if lower in node.values:
+				# Overwriting keeps the name as it was
+				name = node.values[lower][0]
+			else:
+				node.order.append(lower)
+			node.values[lower] = (name, type, raw)
+			node.mtime = self._now()
+		finally:
+			self._lock.release()
+
+	def DeleteValue(self, key, value):
+		lower = (value or u'').lower()
+		self._lock.acquire()
+		try:
+			node = self._node(key, KEY_SET_VALUE)
+			if lower not in node.values:
+				raise _notFound()
+			del node.values[lower]
+			node.order.remove(lower)
+			node.mtime = self._now()
+		finally:
+			self._lock.release()
+
+	def DeleteKey(self, key, sub_key):
+		self._lock.acquire()
+		try:
+			node = self._walk(self._node(key), sub_key, False)
+			parent = node.parent
+			if parent is None or node.subkeys:
+				raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+			del parent.subkeys[node.name.lower()]
+			parent.sorted = None
+			parent.mtime = self._now()
+			node.parent = None
+		finally:
+			self._lock.release()
+
+	def FlushKey(self, key):
+		self._lock.acquire()
+		try:
+			self._node(key)
+		finally:
+			self._lock.release()
@@ -0,0 +1,414 @@
+"""
+pyreg.perf - Reads the performance counters in HKEY_PERFORMANCE_DATA
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import struct, threading
+from .roots import HKEY_PERFORMANCE_DATA, HKEY_PERFORMANCE_TEXT
+
+__all__ = ('PerfData', 'PerfObject', 'PerfCounter', 'PerfInstance', 'Sampler',
+	'read', 'getCounterNames', 'resetCounterNames')
+
+# The structures in winperf.h. The pointers in them are only ever 32 bits
+# in the data (they're DWORDs on 64-bit Windows).
+_DATA_BLOCK = struct.Struct('<8sIIIIIIi16s4xqqqII')
+"""PERF_DATA_BLOCK: Signature, LittleEndian, Version, Revision,
+TotalByteLength, HeaderLength, NumObjectTypes, DefaultObject, SystemTime,
+PerfTime, PerfFreq, PerfTime100nSec, SystemNameLength, SystemNameOffset."""
+_OBJECT_TYPE = struct.Struct('<IIIIIIIIIiiIqq')
+"""PERF_OBJECT_TYPE: TotalByteLength, DefinitionLength, HeaderLength,
+ObjectNameTitleIndex, ObjectNameTitle, ObjectHelpTitleIndex,
+ObjectHelpTitle, DetailLevel, NumCounters, DefaultCounter, NumInstances,
+CodePage, PerfTime, PerfFreq."""
+_COUNTER_DEFINITION = struct.Struct('<IIIIIiIIII')
+"""PERF_COUNTER_DEFINITION: ByteLength, CounterNameTitleIndex,
+CounterNameTitle, CounterHelpTitleIndex, CounterHelpTitle, DefaultScale,
+DetailLevel, CounterType, CounterSize, CounterOffset."""
+_INSTANCE_DEFINITION = struct.Struct('<IIIiII')
+"""PERF_INSTANCE_DEFINITION: ByteLength, ParentObjectTitleIndex,
+ParentObjectInstance, UniqueID, NameOffset, NameLength."""
+_COUNTER_BLOCK = struct.Struct('<I')
+"""PERF_COUNTER_BLOCK: ByteLength."""
+_SYSTEMTIME = struct.Struct('<8H')
+_SIZES = {4: struct.Struct('<I'), 8: struct.Struct('<Q')}
+
+PERF_NO_INSTANCES = -1
+
+# Parts of CounterType
+PERF_SIZE_DWORD = 0x00000000
+PERF_SIZE_LARGE = 0x00000100
+PERF_SIZE_ZERO = 0x00000200
+PERF_SIZE_VARIABLE_LEN = 0x00000300
+PERF_TYPE_NUMBER = 0x00000000
+PERF_TYPE_COUNTER = 0x00000400
+PERF_TYPE_TEXT = 0x00000800
+PERF_TYPE_ZERO = 0x00000C00
+PERF_COUNTER_VALUE = 0x00000000
+PERF_COUNTER_RATE = 0x00010000
+PERF_COUNTER_FRACTION = 0x00020000
+PERF_COUNTER_BASE = 0x00030000
+PERF_COUNTER_ELAPSED = 0x00040000
+PERF_COUNTER_QUEUELEN = 0x00050000
+PERF_COUNTER_HISTOGRAM = 0x00060000
+PERF_COUNTER_PRECISION = 0x00070000
+PERF_TIMER_TICK = 0x00000000
+PERF_TIMER_100NS = 0x00100000
+PERF_OBJECT_TIMER = 0x00200000
+PERF_DELTA_COUNTER = 0x00400000
+PERF_DELTA_BASE = 0x00800000
+PERF_INVERSE_COUNTER = 0x01000000
+PERF_MULTI_COUNTER = 0x02000000
+
+_SUBTYPE = 0x000F0000
+_TYPE = 0x00000C00
+_TIMEBASE = 0x00300000
+
+# The counter types that are worked out specially (the rest are their value,
+# or how much their value changed for PERF_DELTA_COUNTER types)
+PERF_COUNTER_COUNTER = 0x10410400
+PERF_COUNTER_BULK_COUNT = 0x10410500
+PERF_COUNTER_TIMER = 0x20410500
+PERF_COUNTER_TIMER_INV = 0x21410500
+PERF_100NSEC_TIMER = 0x20510500
+PERF_100NSEC_TIMER_INV = 0x21510500
+PERF_RAW_FRACTION = 0x20020400
+PERF_LARGE_RAW_FRACTION = 0x20020500
+PERF_AVERAGE_TIMER = 0x30020400
+PERF_AVERAGE_BULK = 0x40020500
+PERF_ELAPSED_TIME = 0x30240500
+
+def _text(data, offset, length):
+	"""Decodes a NUL-terminated UTF-16 string from data, without slicing it."""
+	if not length:
+		return u''
+	return unicode(buffer(data, offset, length), 'utf-16-le').split(u'\0', 1)[0]
+
+class PerfCounter(object):
+	"""
+	The definition of a counter of a PerfObject: what it is called, what
+	type it is, and where its value is in each instance's counter block.
+	base is the counter after it, if that is its base (eg, the denominator
+	of a fraction).
+	"""
+	__slots__ = ('index', 'name', 'helpIndex', 'scale', 'detailLevel', 'type',
+		'size', 'offset', 'base', '_unpack')
+	def __init__(self, fields, names):
+		(length, self.index, title, self.helpIndex, help, self.scale,
+			self.detailLevel, self.type, self.size, self.offset) = fields
+		self.name = names.get(self.index, self.index)
+		self.base = None
+		self._unpack = _SIZES.get(self.size)
+		if self._unpack is not None:
+			self._unpack = self._unpack.unpack_from
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "<PerfCounter %r type=0x%08x>" % (self.name, self.type)
+
+	def isBase(self):
+		"""c.isBase() -> bool"""
+		return self.type & _SUBTYPE == PERF_COUNTER_BASE
+
+class PerfInstance(object):
+	"""
+	One instance of a PerfObject (eg, one processor), or the only one for
+	objects that don't have instances (whose name is None). Counter values
+	are read from the data as they are asked for; inst[counter] takes the
+	counter's name, index or PerfCounter.
+	"""
+	__slots__ = ('object', 'name', 'uniqueId', 'parentObject', 'parentInstance', '_block')
+	def __init__(self, object, name, uniqueId, parentObject, parentInstance, block):
+		self.object = object
+		self.name = name
+		self.uniqueId = uniqueId
+		self.parentObject = parentObject
+		self.parentInstance = parentInstance
+		self._block = block
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "<PerfInstance %r of %r>" % (self.name, self.object.name)
+
+	def __getitem__(self, counter):
+		"""x.__getitem__(y) <==> x[y]
+
+		Returns the raw value of a counter: an int for DWORD and LARGE
+		counters, or a memoryview of its bytes for anything else."""
+		if not isinstance(counter, PerfCounter):
+			counter = self.object.counter(counter)
+		offset = self._block + counter.offset
+		if counter._unpack is not None:
+			return counter._unpack(self.object._data.view, offset)[0]
+		return self.object._data.view[offset:offset + counter.size]
+
+	def values(self):
+		"""i.values() -> dict
+
+		Returns the raw values of all of the counters, by name."""
+		return dict([(c.name, self[c]) for c in self.object.counters])
+
+class PerfObject(object):
+	"""
+	One of the objects (eg, Processor) in a PerfData, with its counter
+	definitions and instances.
+	"""
+	__slots__ = ('_data', 'index', 'name', 'helpIndex', 'detailLevel', 'counters',
+		'defaultCounter', 'codePage', 'perfTime', 'perfFreq', 'instances', '_byName')
+	def __init__(self, data, offset, names):
+		self._data = data
+		raw = data.view
+		(total, definition, header, self.index, title, self.helpIndex, help,
+			self.detailLevel, ncounters, self.defaultCounter, ninstances,
+			self.codePage, self.perfTime, self.perfFreq) = _OBJECT_TYPE.unpack_from(raw, offset)
+		self.name = names.get(self.index, self.index)
+		self.counters = []
+		self._byName = {}
+		pos = offset + header
+		for n in xrange(ncounters):
+			fields = _COUNTER_DEFINITION.unpack_from(raw, pos)
+			counter = PerfCounter(fields, names)
+			if counter.isBase() and self.counters:
+				self.counters[-1].base = counter
+			self.counters.append(counter)
+			self._byName.setdefault(counter.name, counter)
+			self._byName.setdefault(counter.index, counter)
+			pos += fields[0]
+		self.instances = []
+		pos = offset + definition
+		if ninstances == PERF_NO_INSTANCES:
+			self.instances.append(PerfInstance(self, None, -1, 0, 0, pos))
+		else:
+			for n in xrange(ninstances):
+				length, pobject, pinstance, unique, nameoff, namelen = \
+					_INSTANCE_DEFINITION.unpack_from(raw, pos)
+				name = _text(data.raw, pos + nameoff, namelen)
+				block = pos + length
+				self.instances.append(PerfInstance(self, name, unique, pobject, pinstance, block))
+				pos = block + _COUNTER_BLOCK.unpack_from(raw, block)[0]
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "<PerfObject %r, %i counters, %i instances>" % (self.name,
+			len(self.counters), len(self.instances))
+
+	def counter(self, name):
+		"""o.counter(name) -> PerfCounter
+
+		Returns the counter with the given name (or title index)."""
+		return self._byName[name]
+
+	def instance(self, name=None):
+		"""o.instance([name]) -> PerfInstance
+
+		Returns the instance with the given name (the first, if there are
+		several), or the only one of an object without instances."""
+		for instance in self.instances:
+			if instance.name == name:
+				return instance
+		raise KeyError(name)
+
+class PerfData(object):
+	"""
+	Performance data, as read from HKEY_PERFORMANCE_DATA: a PERF_DATA_BLOCK
+	with its objects, their counters and instances. The structures are read
+	straight out of the data (through a memoryview, with precompiled struct
+	layouts), which is kept, not copied; counter values are only read when
+	they are asked for.
+
+	Names are looked up by title index in names (see getCounterNames());
+	anything without a name is left as its index.
+	"""
+	def __init__(self, data, names=None):
+		"""Initializer. data is the bytes of the value (eg, 'Global')."""
+		if names is None:
+			names = {}
+		self.raw = data
+		self.view = memoryview(data)
+		(signature, self.littleEndian, self.version, self.revision, total, header,
+			nobjects, self.defaultObject, systime, self.perfTime, self.perfFreq,
+			self.perfTime100nSec, namelen, nameoff) = _DATA_BLOCK.unpack_from(self.view, 0)
+		if signature != 'P\0E\0R\0F\0':
+			raise ValueError("Not performance data")
+		self.systemTime = _SYSTEMTIME.unpack(systime)
+		self.systemName = _text(data, nameoff, namelen)
+		self.objects = []
+		pos = header
+		for n in xrange(nobjects):
+			obj = PerfObject(self, pos, names)
+			self.objects.append(obj)
+			pos += _OBJECT_TYPE.unpack_from(self.view, pos)[0]
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "<PerfData from %r, %i objects>" % (self.systemName, len(self.objects))
+
+	def __getitem__(self, name):
+		"""x.__getitem__(y) <==> x[y]
+
+		Returns the object with the given name (or title index)."""
+		for obj in self.objects:
+			if obj.name == name or obj.index == name:
+				return obj
+		raise KeyError(name)
+
+_names = {}
+_namesLock = threading.Lock()
+
+def getCounterNames(key=HKEY_PERFORMANCE_TEXT):
+	"""getCounterNames([key]) -> dict
+
+	Returns the names of the counters and objects, by title index, from the
+	Counter value of key (a list of alternating indexes and names). They
+	are read once for each backend, and remembered."""
+	ident = key._ident()
+	_namesLock.acquire()
+	try:
+		names = _names.get(ident)
+	finally:
+		_namesLock.release()
+	if names is None:
+		try:
+			strings = key.values['Counter']
+		except KeyError:
+			strings = []
+		names = {}
+		for n in xrange(0, len(strings) - 1, 2):
+			try:
+				names[int(strings[n])] = strings[n + 1]
+			except ValueError:
+				pass
+		_namesLock.acquire()
+		try:
+			_names[ident] = names
+		finally:
+			_namesLock.release()
+	return names
+
+def resetCounterNames():
+	"""resetCounterNames() -> None
+
+	Forgets the names getCounterNames() read, so they are read again."""
+	_namesLock.acquire()
+	try:
+		_names.clear()
+	finally:
+		_namesLock.release()
+
+def read(query=u'Global', key=HKEY_PERFORMANCE_DATA, names=None):
+	"""read([query[, key[, names]]]) -> PerfData
+
+	Reads performance data (query is u'Global', u'Costly', or a list of
+	object indexes, like u'238 230'). names defaults to getCounterNames()."""
+	if names is None:
+		names = getCounterNames()
+	# Straight from the backend, so that the bytes aren't copied into a Binary
+	data = key._read(key._backend.QueryValueEx, query)[0]
+	return PerfData(data, names)
+
+def _calculate(counter, old, new, oldobj, newobj, oldinst, newinst):
+	"""Works out a counter's value from two samples, the way perfmon does,
+	or returns None if it can't be."""
+	typ = counter.type
+	n1 = newinst[counter]
+	if not isinstance(n1, (int, long)):
+		return None
+	if typ == PERF_RAW_FRACTION or typ == PERF_LARGE_RAW_FRACTION:
+		b1 = counter.base and newinst[counter.base]
+		return b1 and 100.0 * n1 / b1 or 0.0
+	if typ == PERF_ELAPSED_TIME:
+		return newobj.perfFreq and float(newobj.perfTime - n1) / newobj.perfFreq or 0.0
+	if oldinst is None:
+		# Averages are of what changed between samples too, though their
+		# types don't say so
+		if typ & (PERF_DELTA_COUNTER | PERF_DELTA_BASE) or \
+				typ in (PERF_AVERAGE_TIMER, PERF_AVERAGE_BULK):
+			return None
+		return n1
+	n0 = oldinst[counter]
+	delta = n1 - n0
+	if typ in (PERF_AVERAGE_TIMER, PERF_AVERAGE_BULK):
+		if counter.base is None:
+			return None
+		bases = newinst[counter.base] - oldinst[counter.base]
+		if not bases:
+			return 0.0
+		if typ == PERF_AVERAGE_TIMER:
+			return float(delta) / new.perfFreq / bases
+		return float(delta) / bases
+	if typ & _TIMEBASE == PERF_TIMER_100NS:
+		elapsed = new.perfTime100nSec - old.perfTime100nSec
+	elif typ & _TIMEBASE == PERF_OBJECT_TIMER:
+		elapsed = newobj.perfTime - oldobj.perfTime
+	else:
+		elapsed = new.perfTime - old.perfTime
+	if typ in (PERF_COUNTER_TIMER, PERF_100NSEC_TIMER, PERF_COUNTER_TIMER_INV, PERF_100NSEC_TIMER_INV):
+		if not elapsed:
+			return 0.0
+		fraction = float(delta) / elapsed
+		if typ & PERF_INVERSE_COUNTER:
+			fraction = 1.0 - fraction
+		return 100.0 * fraction
+	if typ in (PERF_COUNTER_COUNTER, PERF_COUNTER_BULK_COUNT):
+		if typ & _TIMEBASE == PERF_OBJECT_TIMER:
+			freq = newobj.perfFreq
+		else:
+			freq = new.perfFreq
+		if not elapsed or not freq:
+			return 0.0
+		return float(delta) * freq / elapsed
+	if typ & PERF_DELTA_COUNTER:
+		return delta
+	return n1
+
+class Sampler(object):
+	"""
+	Reads performance data over and over, and works out what the counters
+	mean from each sample and the one before: rates per second, percentages
+	of time, averages, and so on, as perfmon would show them.
+
+	  >>> sampler = Sampler(u'238') # Processor
+	  >>> first = sampler.sample()
+	  >>> time.sleep(1)
+	  >>> sampler.sample()[u'Processor', u'_Total', u'% Processor Time']
+	  12.5
+	"""
+	def __init__(self, query=u'Global', key=HKEY_PERFORMANCE_DATA, names=None):
+		"""Initializer. The arguments are as for read()."""
+		self.query = query
+		self.key = key
+		self.names = names
+		self.last = None
+
+	def sample(self, data=None):
+		"""s.sample([data]) -> dict
+
+		Reads a new sample (or uses data, a PerfData) and returns the
+		counters' values, by (object, instance, counter) names; the instance
+		is None for objects without instances. Counters that need two
+		samples (eg, rates) are left out the first time, and base counters
+		always are."""
+		if data is None:
+			data = read(self.query, self.key, self.names)
+		old, self.last = self.last, data
+		results = {}
+		oldobjs = {}
+		if old is not None:
+			for obj in old.objects:
+				oldobjs[obj.index] = obj
+		for obj in data.objects:
+			oldobj = oldobjs.get(obj.index)
+			oldinsts = {}
+			if oldobj is not None:
+				for inst in oldobj.instances:
+					oldinsts.setdefault((inst.name, inst.uniqueId), inst)
+			for inst in obj.instances:
+				oldinst = oldinsts.get((inst.name, inst.uniqueId))
+				for counter in obj.counters:
+					if counter.isBase():
+						continue
+					value = _calculate(counter, old, data, oldobj, obj, oldinst, inst)
+					if value is not None:
+						results[obj.name, inst.name, counter.name] = value
+		return results
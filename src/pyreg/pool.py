@@ -0,0 +1,168 @@
+"""
+pyreg.pool - Shares open key handles between Keys
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import threading
+from ._lru import LRU
+from .backend import KEY_READ, KEY_ALL_ACCESS, ERROR_INVALID_HANDLE, ERROR_KEY_DELETED
+
+__all__ = ('HandlePool', 'getPool')
+
+def _stale(e):
+	"""True if the error e means the handle used is to a key that has been
+	deleted (even if it was made again since), or is no handle at all."""
+	return getattr(e, 'winerror', e.errno) in (ERROR_KEY_DELETED, ERROR_INVALID_HANDLE)
+
+class HandlePool(object):
+	"""
+	Keeps the most recently used key handles open, keyed by backend, root,
+	path (case-insensitively) and access. Keys get their handles from here
+	instead of keeping their own, so any number of Keys for the same path
+	share one handle, and the number of open handles stays bounded however
+	many Keys there are.
+
+	Handles are never closed out from under something using them: the pool
+	only lets go of them, and _winreg closes a handle when the last reference
+	to it is gone.
+
+	A key can be deleted (and made again) by something other than pyreg
+	while the pool has a handle to it, which then fails with
+	ERROR_KEY_DELETED. Whatever gets such an error should call reopen() for
+	a new handle, and try again once.
+	"""
+	def __init__(self, maxsize=128):
+		"""Initializer. maxsize is the most handles to keep open."""
+		self._lock = threading.Lock()
+		self._handles = LRU()
+		self._maxsize = maxsize
+		self.hits = self.misses = self.evictions = self.stale = 0
+
+	def getMaxSize(self):
+		"""p.getMaxSize() -> int"""
+		return self._maxsize
+
+	def setMaxSize(self, maxsize):
+		"""p.setMaxSize(maxsize) -> None
+
+		Changes how many handles the pool keeps, letting go of the oldest ones
+		if there are too many now."""
+		self._lock.acquire()
+		try:
+			self._maxsize = maxsize
+			self._shrink()
+		finally:
+			self._lock.release()
+
+	def getStats(self):
+		"""p.getStats() -> dict
+
+		Returns the number of hits, misses, evictions and stale handles so far,
+		and the current and maximum size."""
+		return {'hits': self.hits, 'misses': self.misses,
+			'evictions': self.evictions, 'stale': self.stale, 'size': len(self._handles),
+			'maxsize': self._maxsize}
+
+	def resetStats(self):
+		"""p.resetStats() -> None"""
+		self.hits = self.misses = self.evictions = self.stale = 0
+
+	def reader(self, backend, root, path):
+		"""p.reader(backend, root, path) -> handle
+
+		Returns a handle that can read the key path under root, opening it if
+		needed. A handle opened for writing will do."""
+		lower = path.lower()
+		self._lock.acquire()
+		try:
+			handle = self._handles.get((backend, root, lower, KEY_READ))
+			if handle is None:
+				handle = self._handles.get((backend, root, lower, KEY_ALL_ACCESS))
+			if handle is not None:
+				self.hits += 1
+				return handle
+			self.misses += 1
+		finally:
+			self._lock.release()
+		return self._add((backend, root, lower, KEY_READ),
+			backend.OpenKey(root, path, 0, KEY_READ))
+
+	def writer(self, backend, root, path):
+		"""p.writer(backend, root, path) -> handle
+
+		Returns a handle that can change the key path under root, creating
+		the key if needed."""
+		ident = (backend, root, path.lower(), KEY_ALL_ACCESS)
+		self._lock.acquire()
+		try:
+			handle = self._handles.get(ident)
+			if handle is not None:
+				self.hits += 1
+				return handle
+			self.misses += 1
+		finally:
+			self._lock.release()
+		return self._add(ident, backend.CreateKey(root, path))
+
+	def discard(self, backend, root, path):
+		"""p.discard(backend, root, path) -> None
+
+		Lets go of any handles to the given key, eg because it was deleted."""
+		lower = path.lower()
+		self._lock.acquire()
+		try:
+			self._handles.pop((backend, root, lower, KEY_READ))
+			self._handles.pop((backend, root, lower, KEY_ALL_ACCESS))
+		finally:
+			self._lock.release()
+
+	def reopen(self, backend, root, path, write=False):
+		"""p.reopen(backend, root, path[, write]) -> handle
+
+		Lets go of the handles to the given key, because one turned out to be
+		stale, and returns a new one (from writer() if write is True,
+		otherwise from reader())."""
+		self.discard(backend, root, path)
+		self.stale += 1
+		if write:
+			return self.writer(backend, root, path)
+		return self.reader(backend, root, path)
+
+	def clear(self):
+		"""p.clear() -> None
+
+		Lets go of every handle."""
+		self._lock.acquire()
+		try:
+			self._handles.clear()
+		finally:
+			self._lock.release()
+
+	def _add(self, ident, handle):
+		# The key was opened without the lock held; someone else may have
+		# beaten us to it.
+		self._lock.acquire()
+		try:
+			other = self._handles.get(ident)
+			if other is not None:
+				return other
+			self._handles.set(ident, handle)
+			self._shrink()
+			return handle
+		finally:
+			self._lock.release()
+
+	def _shrink(self):
+		while len(self._handles) > self._maxsize:
+			self._handles.popOldest()
+			self.evictions += 1
+
+_pool = HandlePool()
+
+def getPool():
+	"""getPool() -> HandlePool
+
+	Returns the pool all Keys share."""
+	return _pool
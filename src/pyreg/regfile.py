@@ -0,0 +1,378 @@
+"""
+pyreg.regfile - Reads and writes .reg files, like regedit's import and export
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import binascii, codecs, struct
+from . import roots
+from .backend import KEY_READ, REG_BINARY, REG_DWORD, REG_EXPAND_SZ, REG_MULTI_SZ, REG_SZ, \
+	_packData, _unpackData
+from .batch import Batch
+from .key import Key, _enumKeys, _held, _release, _releaseAll
+
+__all__ = ('exportReg', 'exportLines', 'importReg', 'parseReg',
+	'KEY', 'DELETE_KEY', 'VALUE', 'DELETE_VALUE')
+
+HEADER = u'Windows Registry Editor Version 5.00'
+"""The first line of a REGEDIT5 file."""
+HEADER4 = u'REGEDIT4'
+"""The first line of an older, REGEDIT4 (ANSI), file."""
+
+KEY = 'key'
+DELETE_KEY = 'delete key'
+VALUE = 'value'
+DELETE_VALUE = 'delete value'
+
+_WIDTH = 80
+"""How long regedit lets lines of hex get (including the \\ at the end)."""
+_CHUNK = 65536
+"""How much of a file is read at a time."""
+
+def _roots():
+	"""Returns the roots, by their full and abbreviated names."""
+	found = {}
+	for name in dir(roots):
+		root = getattr(roots, name)
+		if name.startswith('HKEY_') and isinstance(root, Key):
+			found[name] = root
+			found.setdefault(root.getPath(True).upper(), root)
+	return found
+
+# Writing
+
+def _quote(text):
+	return u'"%s"' % text.replace(u'\\', u'\\\\').replace(u'"', u'\\"')
+
+def _valueLine(name, typ, data):
+	"""Returns the line (with any continuations) for a value, as EnumValue()
+	gives it."""
+	if name:
+		start = _quote(name) + u'='
+	else:
+		start = u'@='
+	if typ == REG_SZ and not (set(data) & set(u'\0\r\n')):
+		return start + _quote(data)
+	raw = _packData(typ, data)
+	if typ == REG_DWORD and len(raw) == 4:
+		return start + u'dword:%08x' % struct.unpack('<I', raw)[0]
+	if typ == REG_BINARY:
+		start += u'hex:'
+	else:
+		start += u'hex(%x):' % typ
+	digits = binascii.hexlify(raw)
+	if not digits:
+		return start
+	# Break it like regedit does: no line longer than _WIDTH, counting the
+	# comma and backslash at the end
+	lines = []
+	line = start
+	for i in xrange(0, len(digits), 2):
+		if len(line) + 4 > _WIDTH:
+			lines.append(line + u'\\')
+			line = u'  '
+		line += digits[i:i+2]
+		if i + 2 < len(digits):
+			line += u','
+	lines.append(line)
+	return u'\r\n'.join(lines)
+
+def exportLines(key):
+	"""exportLines(key) -> generator
+
+	Yields the lines (as unicode, without line endings) of a REGEDIT5 file
+	holding key and everything under it. Keys are read one at a time, as the
+	lines are asked for, and each is closed once the last of its subkeys has
+	been opened, so only the keys on the way down to the current one are
+	held on to, however big the tree is."""
+	backend = key._backend
+	top = key.getPath(False)
+	yield HEADER
+	yield u''
+	# Each entry is (path, parent, name), parent being the record of the key
+	# above (see pyreg.key._held())
+	stack = [(top, None, None)]
+	live = []
+	try:
+		while stack:
+			path, parent, name = stack.pop()
+			if parent is None:
+				handle = key._checked()
+			else:
+				try:
+					handle = backend.OpenKey(parent[2], name, 0, KEY_READ)
+				finally:
+					_release(live, parent)
+			record = _held(live, 1, backend, handle, parent is not None)
+			yield u'[%s]' % path
+			n = 0
+			while True:
+				try:
+					vname, data, typ = backend.EnumValue(handle, n)
+				except EnvironmentError:
+					break
+				yield _valueLine(vname, typ, data)
+				n += 1
+			yield u''
+			for name in reversed(_enumKeys(backend, handle)):
+				record[0] += 1
+				stack.append((path + u'\\' + name, record, name))
+			_release(live, record)
+	finally:
+		_releaseAll(live)
+
+def exportReg(key, file):
+	"""exportReg(key, file) -> None
+
+	Writes key and everything under it to file (a file name, or a file
+	opened for writing in binary mode) as a REGEDIT5 .reg file: UTF-16 with
+	a byte order mark and CRLF line endings, like regedit writes."""
+	if isinstance(file, basestring):
+		f = open(file, 'wb')
+		try:
+			exportReg(key, f)
+		finally:
+			f.close()
+		return
+	file.write(codecs.BOM_UTF16_LE)
+	for line in exportLines(key):
+		file.write((line + u'\r\n').encode('utf-16-le'))
+
+# Reading
+
+def _lines(file, encoding):
+	"""Yields the lines of file (without line endings), decoding it a chunk
+	at a time."""
+	data = file.read(_CHUNK)
+	if data.startswith(codecs.BOM_UTF16_LE):
+		encoding, data = 'utf-16-le', data[2:]
+	elif data.startswith(codecs.BOM_UTF8):
+		encoding, data = 'utf-8', data[3:]
+	decoder = codecs.getincrementaldecoder(encoding or 'latin-1')()
+	rest = u''
+	while data:
+		text = rest + decoder.decode(data)
+		lines = text.split(u'\n')
+		rest = lines.pop()
+		for line in lines:
+			yield line.rstrip(u'\r')
+		data = file.read(_CHUNK)
+	rest += decoder.decode('', True)
+	if rest:
+		yield rest.rstrip(u'\r')
+
+def _unquote(line, start, lineno):
+	"""Reads the quoted string starting at line[start], returning it and the
+	index after the closing quote."""
+	parts = []
+	i = start + 1
+	while True:
+		end = line.find(u'"', i)
+		slash = line.find(u'\\', i)
+		if end == -1:
+			raise ValueError("Line %i: No closing quote" % lineno)
+		if slash != -1 and slash < end:
+			parts.append(line[i:slash])
+			parts.append(line[slash+1:slash+2])
+			i = slash + 2
+		else:
+			parts.append(line[i:end])
+			return u''.join(parts), end + 1
+
+def _parseValue(text, lineno, ansi=None):
+	"""Parses what comes after the = of a value line, returning (type, data),
+	or None for a deletion. If ansi is given (for REGEDIT4 files), the hex of
+	strings is in that single-byte encoding rather than UTF-16."""
+	if text == u'-':
+		return None
+	if text.startswith(u'"'):
+		data, end = _unquote(text, 0, lineno)
+		return REG_SZ, data
+	lower = text.lower()
+	try:
+		if lower.startswith(u'dword:'):
+			typ, raw = REG_DWORD, struct.pack('<I', long(text[6:].strip(), 16))
+		elif lower.startswith(u'hex:'):
+			typ, digits = REG_BINARY, text[4:]
+		elif lower.startswith(u'hex('):
+			end = text.index(u'):')
+			typ, digits = int(text[4:end], 16), text[end+2:]
+		else:
+			raise ValueError
+		if typ != REG_DWORD:
+			raw = binascii.unhexlify(digits.replace(u',', u'').replace(u' ', u'').replace(u'\t', u''))
+			if ansi and typ in (REG_SZ, REG_EXPAND_SZ, REG_MULTI_SZ):
+				raw = raw.decode(ansi, 'replace').encode('utf-16-le')
+	except (ValueError, TypeError, struct.error):
+		raise ValueError("Line %i: Can't read value %r" % (lineno, text[:40]))
+	return typ, _unpackData(typ, raw)
+
+def parseReg(file, encoding=None):
+	"""parseReg(file[, encoding]) -> generator
+
+	Reads a .reg file (a file name, or a file opened for reading in binary
+	mode) a line at a time, and yields what it says to do, in order:
+	* (KEY, path) - create the key
+	* (DELETE_KEY, path) - delete the key and everything under it
+	* (VALUE, path, name, type, data) - set the value; data is as
+	  SetValueEx() takes it
+	* (DELETE_VALUE, path, name) - delete the value
+	path is the key's full path (eg, u'HKEY_CURRENT_USER\\\\Software'), and
+	name is u'' for the default value. Files with a byte order mark are read
+	in that encoding; others in encoding (default Latin-1, which is close to
+	what REGEDIT4 files are in). The hex of strings (hex(1), hex(2) and
+	hex(7)) is UTF-16 in REGEDIT5 files, and in encoding (default Latin-1)
+	in REGEDIT4 ones. Raises ValueError if the file is not a .reg
+	file, or can't be read."""
+	if isinstance(file, basestring):
+		f = open(file, 'rb')
+		try:
+			for entry in parseReg(f, encoding):
+				yield entry
+		finally:
+			f.close()
+		return
+	lines = _lines(file, encoding)
+	lineno = 0
+	path = None
+	ansi = None
+	for line in lines:
+		lineno += 1
+		if lineno == 1:
+			if line.strip() not in (HEADER, HEADER4):
+				raise ValueError("Not a .reg file")
+			if line.strip() == HEADER4:
+				ansi = encoding or 'latin-1'
+			continue
+		# Long lines are continued with a \ at the end
+		first = lineno
+		while line.endswith(u'\\'):
+			more = next(lines, None)
+			if more is None:
+				break
+			lineno += 1
+			line = line[:-1] + more.lstrip()
+		line = line.strip()
+		if not line or line.startswith(u';'):
+			continue
+		if line.startswith(u'['):
+			if not line.endswith(u']'):
+				raise ValueError("Line %i: No closing ]" % first)
+			if line.startswith(u'[-'):
+				path = None
+				yield DELETE_KEY, line[2:-1]
+			else:
+				path = line[1:-1]
+				yield KEY, path
+			continue
+		if line.startswith(u'@'):
+			name, end = u'', 1
+		elif line.startswith(u'"'):
+			name, end = _unquote(line, 0, first)
+		else:
+			raise ValueError("Line %i: Can't read %r" % (first, line[:40]))
+		if line[end:end+1] != u'=':
+			raise ValueError("Line %i: No = after the name" % first)
+		if path is None:
+			raise ValueError("Line %i: Value outside of a key" % first)
+		value = _parseValue(line[end+1:].strip(), first, ansi)
+		if value is None:
+			yield DELETE_VALUE, path, name
+		else:
+			yield VALUE, path, name, value[0], value[1]
+
+def _deleteTree(key):
+	"""Deletes key and everything under it, if it exists. Raises ValueError
+	for a root, without deleting anything."""
+	if key.parent is None:
+		raise ValueError("Can't delete %s, it is a root" % key.getPath(False))
+	for path, subkeys, values in key.walk(topdown=False):
+		if path:
+			sep = path.rfind(u'\\')
+			del (key / path[:sep+1]).keys[path[sep+1:]]
+	try:
+		del key.parent.keys[key.myname]
+	except EnvironmentError:
+		pass
+
+class _Importer(object):
+	"""Makes the changes parseReg() yields, batchsize values at a time."""
+	def __init__(self, batchsize, flush):
+		self.batchsize = batchsize
+		self.flush = flush
+		self.roots = _roots()
+		self.keys = {}
+		self.batch = None
+		self.pending = 0
+
+	def resolve(self, path, delete=False):
+		"""Returns the Key for a full path. Raises ValueError if the root isn't
+		known, or if delete is True and the path is a root (which can't be
+		deleted)."""
+		key = self.keys.get(path)
+		if key is None:
+			root, sep, rest = path.partition(u'\\')
+			try:
+				key = self.roots[root.upper()]
+			except KeyError:
+				raise ValueError("Unknown root %r" % root)
+			if rest:
+				key = key / rest
+			if len(self.keys) > self.batchsize:
+				self.keys.clear()
+			self.keys[path] = key
+		if delete and key.parent is None:
+			raise ValueError("Can't delete %s, it is a root" % path)
+		return key
+
+	def apply(self):
+		"""Writes the values waiting in the batch."""
+		batch, self.batch = self.batch, None
+		self.pending = 0
+		if batch is not None:
+			batch.apply()
+
+	def __call__(self, entry):
+		op, path = entry[:2]
+		key = self.resolve(path, op == DELETE_KEY)
+		if op == KEY:
+			key.create()
+		elif op == DELETE_KEY:
+			self.apply()
+			_deleteTree(key)
+			self.keys.clear()
+		else:
+			if self.batch is not None and not self.batch.covers(key):
+				self.apply()
+			if self.batch is None:
+				self.batch = Batch(self.roots[path.partition(u'\\')[0].upper()], self.flush)
+			if op == VALUE:
+				self.batch.setData(key, entry[2], entry[4], entry[3])
+			else:
+				self.batch.delete(key, entry[2])
+			self.pending += 1
+			if self.pending >= self.batchsize:
+				self.apply()
+
+def importReg(file, encoding=None, batchsize=1000, flush=False):
+	"""importReg(file[, encoding[, batchsize[, flush]]]) -> (int, int)
+
+	Makes the changes in a .reg file (see parseReg()), through Keys. The
+	file is read as it goes, so it can be any size. Values are written
+	batchsize at a time, through a Batch (see pyreg.batch), and the keys
+	are flushed after each batch if flush is True. If the file has an error
+	part of the way through, the changes before it are still made. Returns
+	the number of keys and of values changed."""
+	importer = _Importer(batchsize, flush)
+	nkeys = nvalues = 0
+	try:
+		for entry in parseReg(file, encoding):
+			importer(entry)
+			if entry[0] in (KEY, DELETE_KEY):
+				nkeys += 1
+			else:
+				nvalues += 1
+	finally:
+		importer.apply()
+	return nkeys, nvalues
@@ -5,15 +5,10 @@ Last modified $Date$
 """
 # Search for #Py3k in the source to find areas that need work when Python3 comes out
 from __future__ import absolute_import
-import _winreg
+import functools
+from . import backend, _lazy
 from .key import Key
 
-# _winreg doesn't define two roots:
-#define HKEY_PERFORMANCE_TEXT       (( HKEY ) (ULONG_PTR)((LONG)0x80000050) )
-_winreg.HKEY_PERFORMANCE_TEXT = -2147483568
-#define HKEY_PERFORMANCE_NLSTEXT    (( HKEY ) (ULONG_PTR)((LONG)0x80000060) )
-_winreg.HKEY_PERFORMANCE_NLSTEXT = -2147483552
-
 __all__ = ('HKEY_CLASSES_ROOT', 'HKEY_CURRENT_CONFIG', 'HKEY_CURRENT_USER', 
 	'HKEY_DYN_DATA', 'HKEY_LOCAL_MACHINE', 'HKEY_PERFORMANCE_DATA', 
 	'HKEY_USERS')
@@ -22,6 +17,10 @@ class _HKeyRoot(Key):
 	"""
 	A subclass of Key to encapsulate HKEY_*.
 	"""
+	@property
+	def _backend(self):
+		"""The roots always use the default backend; see pyreg.backend.setDefault()."""
+		return backend.getDefault()
 	def __repr__(self):
 		return self.getPath(False)
 
@@ -34,7 +33,6 @@ class _HKeyClassesRoot(_HKeyRoot):
 			return "HKCR"
 		else:
 			return "HKEY_CLASSES_ROOT"
-HKEY_CLASSES_ROOT = _HKeyClassesRoot(hkey=_winreg.HKEY_CLASSES_ROOT)
 
 class _HKeyCurrentConfig(_HKeyRoot):
 	"""
@@ -45,7 +43,6 @@ class _HKeyCurrentConfig(_HKeyRoot):
 			return "HKCC"
 		else:
 			return "HKEY_CURRENT_CONFIG"
-HKEY_CURRENT_CONFIG = _HKeyCurrentConfig(hkey=_winreg.HKEY_CURRENT_CONFIG)
 
 class _HKeyCurrentUser(_HKeyRoot):
 	"""
@@ -56,7 +53,6 @@ class _HKeyCurrentUser(_HKeyRoot):
 			return "HKCU"
 		else:
 			return "HKEY_CURRENT_USER"
-HKEY_CURRENT_USER = _HKeyCurrentUser(hkey=_winreg.HKEY_CURRENT_USER)
 
 class _HKeyDynData(_HKeyRoot):
 	"""
@@ -67,7 +63,6 @@ class _HKeyDynData(_HKeyRoot):
 			return "HKDD"
 		else:
 			return "HKEY_DYN_DATA"
-HKEY_DYN_DATA = _HKeyDynData(hkey=_winreg.HKEY_DYN_DATA)
 
 class _HKeyLocalMachine(_HKeyRoot):
 	"""A subclass of Key to encapsulate HKEY_LOCAL_MACHINE."""
@@ -76,7 +71,6 @@ class _HKeyLocalMachine(_HKeyRoot):
 			return "HKLM"
 		else:
 			return "HKEY_LOCAL_MACHINE"
-HKEY_LOCAL_MACHINE = _HKeyLocalMachine(hkey=_winreg.HKEY_LOCAL_MACHINE)
 
 class _HKeyPerformanceData(_HKeyRoot):
 	"""
@@ -87,7 +81,6 @@ class _HKeyPerformanceData(_HKeyRoot):
 			return "HKPD"
 		else:
 			return "HKEY_PERFORMANCE_DATA"
-HKEY_PERFORMANCE_DATA = _HKeyPerformanceData(hkey=_winreg.HKEY_PERFORMANCE_DATA)
 
 # HKEY_PERFORMANCE_NLSTEXT and HKEY_PERFORMANCE_TEXT would go
 # here (New to XP), but they aren't available from _winreg.
@@ -102,7 +95,6 @@ class _HKeyPerformanceNLSText(_HKeyRoot):
 			return "HKPN"
 		else:
 			return "HKEY_PERFORMANCE_NLSTEXT"
-HKEY_PERFORMANCE_NLSTEXT = _HKeyPerformanceNLSText(hkey=_winreg.HKEY_PERFORMANCE_NLSTEXT)
 
 class _HKeyPerformanceText(_HKeyRoot):
 	"""
@@ -113,7 +105,6 @@ class _HKeyPerformanceText(_HKeyRoot):
 			return "HKPT"
 		else:
 			return "HKEY_PERFORMANCE_TEXT"
-HKEY_PERFORMANCE_TEXT = _HKeyPerformanceNLSText(hkey=_winreg.HKEY_PERFORMANCE_TEXT)
 
 class _HKeyUsers(_HKeyRoot):
 	"""
@@ -124,4 +115,16 @@ class _HKeyUsers(_HKeyRoot):
 			return "HKU"
 		else:
 			return "HKEY_USERS"
-HKEY_USERS = _HKeyUsers(hkey=_winreg.HKEY_USERS)
+
+# The roots are made the first time they are used; see pyreg._lazy
+_lazy.lazy(__name__, makers={
+	'HKEY_CLASSES_ROOT': functools.partial(_HKeyClassesRoot, hkey=backend.HKEY_CLASSES_ROOT),
+	'HKEY_CURRENT_CONFIG': functools.partial(_HKeyCurrentConfig, hkey=backend.HKEY_CURRENT_CONFIG),
+	'HKEY_CURRENT_USER': functools.partial(_HKeyCurrentUser, hkey=backend.HKEY_CURRENT_USER),
+	'HKEY_DYN_DATA': functools.partial(_HKeyDynData, hkey=backend.HKEY_DYN_DATA),
+	'HKEY_LOCAL_MACHINE': functools.partial(_HKeyLocalMachine, hkey=backend.HKEY_LOCAL_MACHINE),
+	'HKEY_PERFORMANCE_DATA': functools.partial(_HKeyPerformanceData, hkey=backend.HKEY_PERFORMANCE_DATA),
+	'HKEY_PERFORMANCE_NLSTEXT': functools.partial(_HKeyPerformanceNLSText, hkey=backend.HKEY_PERFORMANCE_NLSTEXT),
+	'HKEY_PERFORMANCE_TEXT': functools.partial(_HKeyPerformanceNLSText, hkey=backend.HKEY_PERFORMANCE_TEXT),
+	'HKEY_USERS': functools.partial(_HKeyUsers, hkey=backend.HKEY_USERS),
+	})
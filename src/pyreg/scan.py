@@ -0,0 +1,256 @@
+"""
+pyreg.scan - Reads whole trees of keys with several threads at once
+By Jamie Bliss
+Last modified $Date$
+"""
+# Search for #Py3k in the source to find areas that need work when Python3 comes out
+from __future__ import absolute_import
+import heapq, sys, threading
+from collections import deque
+from ._lru import LRU
+from .backend import KEY_READ
+from .key import _enumKeys, _snapshot
+
+__all__ = ('Scan', 'scan')
+
+class Scan(object):
+	"""
+	A scan of a key and every key under it, like Key.walk(), but with the
+	keys read by a pool of worker threads. _winreg lets go of the GIL while
+	it waits on the registry, so the workers really do run at the same time.
+	Iterating over it yields (path, subkeys, values) as walk() does.
+
+	If ordered is True, keys are yielded in the same order as walk() yields
+	them; otherwise they are yielded as soon as they are read. Either way,
+	at most about maxqueue keys are read ahead of what has been yielded, so
+	memory use stays bounded however big the tree is.
+
+	Each worker keeps the last maxhandles keys it opened open, so that it can
+	open their subkeys relative to them; any other key is opened from the
+	root. maxdepth, prune and onerror are as for walk(), except that prune
+	is called from the worker threads and onerror from the one iterating.
+	Anything else that goes wrong reading a key (or in prune) stops the
+	scan, and is raised in the thread iterating.
+
+	Call cancel() (or stop iterating) to stop the workers early.
+	"""
+	def __init__(self, key, workers=4, ordered=False, maxqueue=256, maxhandles=16,
+			maxdepth=None, prune=None, onerror=None):
+		"""Initializer. The workers start right away."""
+		self.key = key
+		self.ordered = ordered
+		self.maxqueue = maxqueue
+		self.maxhandles = maxhandles
+		self.maxdepth = maxdepth
+		self.prune = prune
+		self.onerror = onerror
+		self._cond = threading.Condition(threading.Lock())
+		# Keys to read, as (order, path, depth, name, parent path). order is
+		# the key's place in walk()'s order: the indexes of the subkeys on
+		# the way down to it. Keys are read in that order.
+		self._todo = [((), u'', 0, None, None)]
+		# Keys that have been read but not yielded, as (path, subkeys,
+		# values) or (path, error). If ordered, it is keyed by order, and
+		# has the orders of the subkeys that are to be read, too.
+		if ordered:
+			self._done = {}
+		else:
+			self._done = deque()
+		self._busy = 0
+		self._wanted = ()
+		self._top = None
+		self._cancelled = False
+		self._failure = None
+		self._threads = []
+		for n in xrange(workers):
+			t = threading.Thread(target=self._work, name='pyreg.scan-%i' % n)
+			t.setDaemon(True)
+			t.start()
+			self._threads.append(t)
+
+	def cancel(self):
+		"""s.cancel() -> None
+
+		Stops the scan. Keys being read are finished, but no more are
+		started, and nothing more is yielded."""
+		self._cond.acquire()
+		try:
+			self._cancelled = True
+			self._cond.notifyAll()
+		finally:
+			self._cond.release()
+
+	def join(self, timeout=None):
+		"""s.join([timeout]) -> None
+
+		Waits for the workers to stop."""
+		for t in self._threads:
+			t.join(timeout)
+
+	def __iter__(self):
+		"""x.__iter__() <==> iter(x)
+
+		Returns a generator yielding (path, subkeys, values) for each key.
+		Can only be done once. When it is done (or closed), the workers are
+		stopped."""
+		try:
+			if self.ordered:
+				entries = self._iterOrdered()
+			else:
+				entries = self._iterUnordered()
+			for entry in entries:
+				if len(entry) == 2:
+					if self.onerror is not None:
+						self.onerror(entry[1])
+				else:
+					yield entry
+		finally:
+			self.cancel()
+			self.join()
+
+	def _iterUnordered(self):
+		cond = self._cond
+		while True:
+			cond.acquire()
+			try:
+				while not self._done or self._cancelled:
+					self._raise()
+					if self._cancelled or (not self._todo and not self._busy):
+						return
+					cond.wait()
+				entry = self._done.popleft()
+				cond.notifyAll()
+			finally:
+				cond.release()
+			yield entry
+
+	def _iterOrdered(self):
+		# Follows walk()'s order down the tree as the keys are read, waiting
+		# for each one in turn.
+		cond = self._cond
+		wanted = [()]
+		while wanted:
+			order = wanted.pop()
+			cond.acquire()
+			try:
+				self._wanted = order
+				cond.notifyAll()
+				while order not in self._done or self._cancelled:
+					self._raise()
+					if self._cancelled:
+						return
+					cond.wait()
+				entry, children = self._done.pop(order)
+				cond.notifyAll()
+			finally:
+				cond.release()
+			yield entry
+			wanted.extend(reversed(children))
+
+	def _raise(self):
+		"""Raises what stopped a worker, if anything did. Called with the lock
+		held."""
+		if self._failure is not None:
+			failure = self._failure
+			raise failure[0], failure[1], failure[2]
+
+	def _take(self):
+		"""Waits for a key to read, returning None when there are no more."""
+		cond = self._cond
+		cond.acquire()
+		try:
+			while True:
+				if self._cancelled:
+					return None
+				if self._todo:
+					# Don't get too far ahead of what has been yielded, but
+					# always read the key that is being waited for.
+					if self._busy + len(self._done) < self.maxqueue or \
+							self._todo[0][0] == self._wanted:
+						self._busy += 1
+						return heapq.heappop(self._todo)
+				elif not self._busy:
+					cond.notifyAll()
+					return None
+				cond.wait()
+		finally:
+			cond.release()
+
+	def _work(self):
+		backend = self.key._backend
+		handles = LRU()
+		try:
+			while True:
+				task = self._take()
+				if task is None:
+					break
+				order, path, depth, name, parentpath = task
+				entry = failure = None
+				children = []
+				try:
+					try:
+						if not path:
+							handle = self._top = self.key._checked()
+						else:
+							if parentpath:
+								parent = handles.get(parentpath.lower())
+							else:
+								parent = self._top
+							if parent is not None:
+								handle = backend.OpenKey(parent, name, 0, KEY_READ)
+							else:
+								handle = backend.OpenKey(self.key._root, self.key._subpath(path), 0, KEY_READ)
+							if self.maxhandles:
+								handles.set(path.lower(), handle)
+								while len(handles) > self.maxhandles:
+									backend.CloseKey(handles.popOldest()[1])
+						try:
+							subkeys = _enumKeys(backend, handle)
+							values = _snapshot(backend, handle)
+						finally:
+							if path and not self.maxhandles:
+								backend.CloseKey(handle)
+					except EnvironmentError, e:
+						entry = (path, e)
+						subkeys = ()
+					else:
+						entry = (path, subkeys, values)
+					if self.maxdepth is None or depth < self.maxdepth:
+						for n, child in enumerate(subkeys):
+							subpath = path and path + u'\\' + child or child
+							if self.prune is not None and self.prune(subpath):
+								continue
+							children.append((order + (n,), subpath, depth + 1, child, path))
+				except BaseException:
+					failure = sys.exc_info()
+				finally:
+					self._finish(order, entry, children, failure)
+		finally:
+			for ident in handles.keys():
+				backend.CloseKey(handles.pop(ident))
+
+	def _finish(self, order, entry, children, failure=None):
+		cond = self._cond
+		cond.acquire()
+		try:
+			self._busy -= 1
+			if failure is not None:
+				if self._failure is None:
+					self._failure = failure
+				self._cancelled = True
+			elif self.ordered:
+				self._done[order] = (entry, [child[0] for child in children])
+			else:
+				self._done.append(entry)
+			for child in children:
+				heapq.heappush(self._todo, child)
+			cond.notifyAll()
+		finally:
+			cond.release()
+
+def scan(key, workers=4, ordered=False, **kwargs):
+	"""scan(key[, workers[, ordered[, ...]]]) -> Scan
+
+	Starts scanning key and every key under it with workers threads. See
+	Scan for the other arguments."""
+	return Scan(key, workers, ordered, **kwargs)
@@ -5,11 +5,16 @@ Last modified $Date$
 """
 # This module tries to do the "right thing" in python 2 and 3
 from __future__ import absolute_import
-import _winreg, sys
+import io, struct, sys
+from .backend import REG_BINARY, REG_DWORD, REG_DWORD_LITTLE_ENDIAN, REG_DWORD_BIG_ENDIAN, \
+	REG_EXPAND_SZ, REG_LINK, REG_MULTI_SZ, REG_NONE, REG_QWORD, REG_QWORD_LITTLE_ENDIAN, \
+	REG_RESOURCE_LIST, REG_SZ
 from types import GeneratorType as _GeneratorType
-__all__ = ('Binary', 'DWORD', 'DWORD_BigEndian', 'DWORD_LittleEndian', 
-	'ExpandingString', 'Link', 'MultiString', 'ResourceList', 'String', 
-	'rNone')
+__all__ = ('Binary', 'BinaryView', 'DWORD', 'DWORD_BigEndian', 'DWORD_LittleEndian',
+	'ExpandingString', 'LazyMultiString', 'Link', 'MultiString', 'QWORD', 'QWORD_LittleEndian',
+	'ResourceList', 'ResourceListView', 'String', 'rNone', 'rNoneView',
+	'RegistryType', 'register',
+	'encodeNumbers', 'decodeNumbers')
 
 # Double check this in #Py3k
 if sys.hexversion >= 0x3000000: # 3.0
@@ -56,32 +61,43 @@ class Binary(binstr, RegistryType):
 	"""
 	#TODO: Override __str__ so it prints hex.
 
-class DWORD(long, RegistryType):
-	"""MSDN: "A 32-bit number."
-	
-	Encapsulates the REG_DWORD type.
-	Exactly like long, except it is limited to 0-0xFFFFFFFF.
+# The binary forms of the number types
+_DWORD_BE = struct.Struct('>I')
+_QWORD_LE = struct.Struct('<Q')
+
+class _Number(long, RegistryType):
 	"""
+	A long, limited to the unsigned numbers that fit in _mask. Numbers
+	outside of that are wrapped around, C-style.
+	"""
+	_mask = 0
 	def __new__(cls, x, base=False):
 		if hasattr(x, '__index__'):
 			x = x.__index__()
 		if base is False:
-			inst = super(DWORD, cls).__new__(cls, x)
+			inst = super(_Number, cls).__new__(cls, x)
 		else:
-			inst = super(DWORD, cls).__new__(cls, x, base)
-		if long(inst & 0xFFFFFFFF) != long(inst):
-			inst = cls(inst & 0xFFFFFFFF)
+			inst = super(_Number, cls).__new__(cls, x, base)
+		if long(inst & cls._mask) != long(inst):
+			inst = cls(inst & cls._mask)
 		return inst
 	
+	def __repr__(self):
+		return "%s(%i)" % (type(self).__name__, self)
+
+class DWORD(_Number):
+	"""MSDN: "A 32-bit number."
+
+	Encapsulates the REG_DWORD type.
+	Exactly like long, except it is limited to 0-0xFFFFFFFF.
+	"""
+	_mask = 0xFFFFFFFF
 	def __to_registry__(self):
 		# We have to convert to a signed 4-byte interger. _winreg is lame that way.
 		if (self >= 0x80000000):
 			return int(self - 0x100000000)
 		else:
 			return self
-	
-	def __repr__(self):
-		return "%s(%i)" % (type(self).__name__, self)
 	
 	@classmethod
 	def __from_registry__(cls, v):
@@ -104,16 +120,33 @@ class DWORD_BigEndian(DWORD):
 	"""
 	@classmethod
 	def __from_registry__(cls, v):
-		x = ord(v[3]) | ord(v[2])<<8 | ord(v[1])<<16 | ord(v[0])<<24
-		return cls(x)
+		return cls(_DWORD_BE.unpack(v)[0])
 	
 	def __to_registry__(self):
-		rtn = ''
-		rtn = chr( self        & 0xFF) + rtn
-		rtn = chr((self >>  8) & 0xFF) + rtn
-		rtn = chr((self >> 16) & 0xFF) + rtn
-		rtn = chr((self >> 24) & 0xFF) + rtn
-		return rtn
+		return _DWORD_BE.pack(self)
+
+class QWORD(_Number):
+	"""MSDN: "A 64-bit number."
+
+	Encapsulates the REG_QWORD type.
+	Exactly like long, except it is limited to 0-0xFFFFFFFFFFFFFFFF. _winreg
+	doesn't know this type, so it is passed as the 8 bytes the registry
+	stores.
+	"""
+	_mask = 0xFFFFFFFFFFFFFFFF
+	@classmethod
+	def __from_registry__(cls, v):
+		return cls(_QWORD_LE.unpack(v)[0])
+
+	def __to_registry__(self):
+		return _QWORD_LE.pack(self)
+
+class QWORD_LittleEndian(QWORD):
+	"""MSDN: "A 64-bit number in little-endian format."
+
+	Encapsulates REG_QWORD_LITTLE_ENDIAN; identical to QWORD.
+	"""
+	pass
 
 class ExpandingString(txtstr, RegistryType):
 	"""MDSN: "A null-terminated string that contains unexpanded references to environment variables (for example, "%PATH%"). It will be a Unicode or ANSI string depending on whether you use the Unicode or ANSI functions. To expand the environment variable references, use the ExpandEnvironmentStrings function."
@@ -166,6 +199,435 @@ class MultiString(list, RegistryType):
 		"""L.append(object) -- append object to end"""
 		v = unicode(x)
 		super(MultiString,self).append(v)
+	@classmethod
+	def __from_registry__(cls, v):
+		# What comes from the registry is already a list of unicode; don't
+		# convert every one of them again.
+		inst = cls()
+		if v:
+			list.extend(inst, v)
+		return inst
+
+def _findNul(raw, sub, start, end):
+	"""Finds sub in the UTF-16 raw, only at whole characters."""
+	i = raw.find(sub, start, end)
+	while i != -1 and i & 1:
+		i = raw.find(sub, i + 1, end)
+	return i
+
+class LazyMultiString(RegistryType):
+	"""
+	A REG_MULTI_SZ that doesn't decode its strings until they are used, for
+	values with a great many of them. It works like a list of unicode
+	strings (but isn't one), either over the raw UTF-16 the registry stores
+	or over the list _winreg gives; in operator checks and slicing of the
+	raw form work on the bytes, without decoding anything. Changing it
+	turns it into a list of strings first. Written back unchanged, the raw
+	form is copied without decoding it (except to _winreg itself, which
+	wants a list).
+
+	To get REG_MULTI_SZ values as these instead of MultiString, do
+	register(LazyMultiString, REG_MULTI_SZ, True).
+	"""
+	__slots__ = ('_raw', '_begin', '_end', '_starts', '_items')
+	def __init__(self, seq=None):
+		"""Initializer. seq is a sequence of strings, or the raw UTF-16 (a
+		str) of the value."""
+		self._raw = self._starts = self._items = None
+		if isinstance(seq, binstr):
+			self._raw = seq
+			self._begin = 0
+			self._end = self._trim(seq)
+		elif seq is not None:
+			self._items = map(unicode, seq)
+		else:
+			self._items = []
+
+	@staticmethod
+	def _trim(raw):
+		"""Returns where the strings in raw end, leaving off the NULs at the
+		end. (Unlike _winreg, empty strings in the middle don't end it; they
+		can't be stored anyway.)"""
+		end = len(raw) & ~1
+		while end and raw[end-2:end] == '\0\0':
+			end -= 2
+		return end
+
+	@classmethod
+	def __from_registry__(cls, v):
+		inst = cls.__new__(cls)
+		inst._raw = inst._starts = inst._items = None
+		if isinstance(v, binstr):
+			inst._raw = v
+			inst._begin = 0
+			inst._end = cls._trim(v)
+		else:
+			# Already unicode; keep the list as it is
+			inst._items = v or []
+		return inst
+
+	def __to_registry__(self):
+		# Passed on as it is, so that backends can write toUTF16() without
+		# decoding anything (see pyreg.backend._setData())
+		return self
+
+	def toUTF16(self):
+		"""x.toUTF16() -> str
+
+		Returns the value as the registry stores it, encoded in one go (or,
+		if the raw form hasn't been changed, just copied)."""
+		if self._items is None:
+			if self._begin == self._end:
+				return '\0\0'
+			return ''.join((self._raw[self._begin:self._end], '\0\0\0\0'))
+		if not self._items:
+			return '\0\0'
+		return (u'\0'.join(self._items) + u'\0\0').encode('utf-16-le')
+
+	def _offsets(self):
+		"""Returns where each string starts in _raw (and where the next
+		one would)."""
+		starts = self._starts
+		if starts is None:
+			raw, pos, end = self._raw, self._begin, self._end
+			starts = []
+			if pos < end:
+				starts.append(pos)
+				while True:
+					pos = _findNul(raw, '\0\0', pos, end)
+					if pos == -1:
+						break
+					pos += 2
+					starts.append(pos)
+			starts.append(end + 2)
+			self._starts = starts
+		return starts
+
+	def _decode(self, i):
+		starts = self._offsets()
+		return self._raw[starts[i]:starts[i+1]-2].decode('utf-16-le', 'replace')
+
+	def _list(self):
+		"""Turns this into a list of strings, for changing."""
+		if self._items is None:
+			if self._begin == self._end:
+				self._items = []
+			else:
+				self._items = self._raw[self._begin:self._end].decode('utf-16-le', 'replace').split(u'\0')
+			self._raw = self._starts = None
+		return self._items
+
+	def __len__(self):
+		"""x.__len__() <==> len(x)"""
+		if self._items is not None:
+			return len(self._items)
+		return len(self._offsets()) - 1
+
+	def __getitem__(self, index):
+		"""x.__getitem__(y) <==> x[y]
+
+		Slices (without steps) of the raw form share its bytes."""
+		if self._items is not None:
+			if isinstance(index, slice):
+				return LazyMultiString.__from_registry__(self._items[index])
+			return self._items[index]
+		count = len(self)
+		if isinstance(index, slice):
+			start, stop, step = index.indices(count)
+			if step != 1:
+				return LazyMultiString.__from_registry__([self._decode(i) for i in xrange(start, stop, step)])
+			inst = LazyMultiString.__new__(LazyMultiString)
+			inst._starts = inst._items = None
+			inst._raw = self._raw
+			if start >= stop:
+				inst._begin = inst._end = 0
+			else:
+				starts = self._offsets()
+				inst._begin = starts[start]
+				inst._end = starts[stop] - 2
+			return inst
+		if index < 0:
+			index += count
+		if not 0 <= index < count:
+			raise IndexError("list index out of range")
+		return self._decode(index)
+
+	def __iter__(self):
+		"""x.__iter__() <==> iter(x)"""
+		if self._items is not None:
+			return iter(self._items)
+		return (self._decode(i) for i in xrange(len(self)))
+
+	def __contains__(self, item):
+		"""x.__contains__(y) <==> y in x
+
+		For the raw form, searches the bytes for the encoded string."""
+		if self._items is not None:
+			return item in self._items
+		sub = unicode(item).encode('utf-16-le')
+		if not sub:
+			return False
+		raw, begin, end = self._raw, self._begin, self._end
+		pos = _findNul(raw, sub, begin, end)
+		while pos != -1:
+			after = pos + len(sub)
+			if (pos == begin or raw[pos-2:pos] == '\0\0') and \
+					(after == end or raw[after:after+2] == '\0\0'):
+				return True
+			pos = _findNul(raw, sub, pos + 2, end)
+		return False
+
+	def __eq__(self, other):
+		"""x.__eq__(y) <==> x==y"""
+		if isinstance(other, LazyMultiString) and self._items is None and other._items is None:
+			return self._raw[self._begin:self._end] == other._raw[other._begin:other._end]
+		try:
+			return list(self) == list(other)
+		except TypeError:
+			return NotImplemented
+
+	def __ne__(self, other):
+		"""x.__ne__(y) <==> x!=y"""
+		rv = self.__eq__(other)
+		if rv is NotImplemented:
+			return rv
+		return not rv
+
+	__hash__ = None
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		return "%s(%r)" % (type(self).__name__, list(self))
+
+	def count(self, item):
+		"""L.count(value) -> integer -- return number of occurrences of value"""
+		return list(self).count(item)
+
+	def index(self, item):
+		"""L.index(value) -> integer -- return first index of value"""
+		for i, v in enumerate(self):
+			if v == item:
+				return i
+		raise ValueError("%r is not in list" % (item,))
+
+	def __setitem__(self, index, value):
+		"""x.__setitem__(i, y) <==> x[i]=y"""
+		if isinstance(index, slice):
+			value = map(unicode, value)
+		else:
+			value = unicode(value)
+		self._list()[index] = value
+
+	def __delitem__(self, index):
+		"""x.__delitem__(y) <==> del x[y]"""
+		del self._list()[index]
+
+	def append(self, x):
+		"""L.append(object) -- append object to end"""
+		self._list().append(unicode(x))
+
+	def extend(self, seq):
+		"""L.extend(iterable) -- extend list by appending elements from the iterable"""
+		self._list().extend(map(unicode, seq))
+
+	def __iadd__(self, seq):
+		"""x.__iadd__(y) <==> x+=y"""
+		self.extend(seq)
+		return self
+
+	def insert(self, index, x):
+		"""L.insert(index, object) -- insert object before index"""
+		self._list().insert(index, unicode(x))
+
+	def pop(self, index=-1):
+		"""L.pop([index]) -> item -- remove and return item at index (default last)"""
+		return self._list().pop(index)
+
+	def remove(self, item):
+		"""L.remove(value) -- remove first occurrence of value"""
+		self._list().remove(item)
+
+	def reverse(self):
+		"""L.reverse() -- reverse *IN PLACE*"""
+		self._list().reverse()
+
+	def sort(self, *args, **kwargs):
+		"""L.sort(cmp=None, key=None, reverse=False) -- stable sort *IN PLACE*"""
+		self._list().sort(*args, **kwargs)
+
+class BinaryView(RegistryType):
+	"""
+	A REG_BINARY that doesn't copy its bytes, for big values. It wraps what
+	it was made from (what _winreg returned, or a str, buffer, bytearray or
+	memoryview), and slicing it gives another BinaryView of the same bytes.
+	view is a memoryview of it; tobytes() makes a copy. readinto(),
+	chunks() and reader() get at the bytes a piece at a time.
+
+	To get REG_BINARY values as these instead of Binary, do
+	register(BinaryView, REG_BINARY, True). (rNoneView and
+	ResourceListView are the same for REG_NONE and REG_RESOURCE_LIST.)
+	"""
+	__slots__ = ('_data', '_start', '_stop')
+	def __init__(self, data=''):
+		"""Initializer. data is a str, buffer, bytearray or memoryview."""
+		self._data = data
+		self._start = 0
+		self._stop = len(data)
+
+	@classmethod
+	def __from_registry__(cls, v):
+		return cls(v or '')
+
+	def __to_registry__(self):
+		data = self._data
+		if isinstance(data, memoryview): #Py3k
+			# _winreg can't read memoryviews
+			return data[self._start:self._stop].tobytes()
+		if self._start == 0 and self._stop == len(data):
+			return data
+		return buffer(data, self._start, self._stop - self._start)
+
+	@property
+	def view(self):
+		"""A memoryview of the bytes."""
+		data = self._data
+		if isinstance(data, buffer): #Py3k
+			# memoryview() doesn't take buffers
+			data = str(data)
+		return memoryview(data)[self._start:self._stop]
+
+	def tobytes(self):
+		"""x.tobytes() -> str
+
+		Returns a copy of the bytes."""
+		data = self._data
+		if isinstance(data, memoryview):
+			return data[self._start:self._stop].tobytes()
+		return str(data[self._start:self._stop])
+
+	def __len__(self):
+		"""x.__len__() <==> len(x)"""
+		return self._stop - self._start
+
+	def __getitem__(self, index):
+		"""x.__getitem__(y) <==> x[y]
+
+		Slices (without steps) are BinaryViews of the same bytes; single
+		bytes are strs of length 1, as they are for str."""
+		if isinstance(index, slice):
+			start, stop, step = index.indices(len(self))
+			if step != 1:
+				return type(self)(self.tobytes()[index])
+			inst = type(self).__new__(type(self))
+			inst._data = self._data
+			inst._start = self._start + start
+			inst._stop = self._start + max(start, stop)
+			return inst
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError("index out of range")
+		item = self._data[self._start + index]
+		if isinstance(item, (int, long)): #Py3k
+			# A bytearray gives numbers
+			return chr(item)
+		return str(item)
+
+	def __getslice__(self, i, j): #Py3k
+		"""x.__getslice__(i, j) <==> x[i:j]"""
+		return self.__getitem__(slice(max(i, 0), max(j, 0)))
+
+	def __iter__(self):
+		"""x.__iter__() <==> iter(x)"""
+		return iter(self.tobytes())
+
+	def __eq__(self, other):
+		"""x.__eq__(y) <==> x==y"""
+		if isinstance(other, BinaryView):
+			other = other.view
+		elif isinstance(other, bin2reg) or isinstance(other, binstr):
+			if isinstance(other, buffer): #Py3k
+				other = str(other)
+			other = memoryview(other)
+		else:
+			return NotImplemented
+		return self.view == other
+
+	def __ne__(self, other):
+		"""x.__ne__(y) <==> x!=y"""
+		rv = self.__eq__(other)
+		if rv is NotImplemented:
+			return rv
+		return not rv
+
+	__hash__ = None
+
+	def __repr__(self):
+		"""x.__repr__() <==> repr(x)"""
+		if len(self) > 64:
+			return "<%s of %i bytes>" % (type(self).__name__, len(self))
+		return "%s(%r)" % (type(self).__name__, self.tobytes())
+
+	def readinto(self, b, offset=0):
+		"""x.readinto(b[, offset]) -> int
+
+		Copies as many bytes as fit into b (eg, a bytearray) from offset
+		onwards, and returns how many that was."""
+		count = max(min(len(b), len(self) - offset), 0)
+		memoryview(b)[:count] = self.view[offset:offset+count]
+		return count
+
+	def chunks(self, size=65536):
+		"""x.chunks([size]) -> generator
+
+		Yields memoryviews of the bytes, size bytes at a time."""
+		view = self.view
+		for i in xrange(0, len(view), size):
+			yield view[i:i+size]
+
+	def reader(self):
+		"""x.reader() -> file-like object
+
+		Returns a read-only, seekable binary file of the bytes (eg, to hand
+		to something that reads files)."""
+		return _BinaryReader(self)
+
+class _BinaryReader(io.RawIOBase):
+	"""What BinaryView.reader() returns."""
+	def __init__(self, value):
+		io.RawIOBase.__init__(self)
+		self._value = value
+		self._pos = 0
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def readinto(self, b):
+		count = self._value.readinto(b, self._pos)
+		self._pos += count
+		return count
+
+	def seek(self, pos, whence=0):
+		if whence == 1:
+			pos += self._pos
+		elif whence == 2:
+			pos += len(self._value)
+		self._pos = max(pos, 0)
+		return self._pos
+
+	def tell(self):
+		return self._pos
+
+class rNoneView(BinaryView):
+	"""Like BinaryView, for REG_NONE."""
+	__slots__ = ()
+
+class ResourceListView(BinaryView):
+	"""Like BinaryView, for REG_RESOURCE_LIST."""
+	__slots__ = ()
 
 class rNone(Binary):
 	"""MSDN: "No defined value type."
@@ -188,37 +650,161 @@ class String(txtstr, RegistryType):
 	"""
 	pass
 
-class 
-
 _registryDataClasses = {
-	_winreg.REG_BINARY : Binary,
-	_winreg.REG_DWORD : DWORD,
-	_winreg.REG_DWORD_LITTLE_ENDIAN : DWORD_LittleEndian,
-	_winreg.REG_DWORD_BIG_ENDIAN : DWORD_BigEndian,
-	_winreg.REG_EXPAND_SZ : ExpandingString,
-	_winreg.REG_LINK : Link,
-	_winreg.REG_MULTI_SZ : MultiString,
-	_winreg.REG_NONE : rNone,
-	_winreg.REG_RESOURCE_LIST : ResourceList,
-	_winreg.REG_SZ : String,
+	REG_BINARY : Binary,
+	REG_DWORD : DWORD,
+	REG_DWORD_BIG_ENDIAN : DWORD_BigEndian,
+	REG_EXPAND_SZ : ExpandingString,
+	REG_LINK : Link,
+	REG_MULTI_SZ : MultiString,
+	REG_NONE : rNone,
+	REG_RESOURCE_LIST : ResourceList,
+	REG_SZ : String,
 }
-"""A dictionary linking the registry data type constants (keys) to the classes that handle them (values)."""
+"""A dictionary linking the registry data type constants (keys) to the classes
+that handle them (values), ie, what values of each type are read as.
+(REG_DWORD_LITTLE_ENDIAN is REG_DWORD, so those are read as DWORD.)"""
+
+_decoders = {}
+"""Registry data type -> the __from_registry__ of its class."""
+
+_encoders = {}
+"""Class -> function(object) -> (data, type), for the classes that have been
+registered."""
+
+_natives = {}
+"""Like _encoders, for the native types that can be stored. These are only
+used for classes that don't know how to convert themselves."""
+
+_resolved = {}
+"""Class -> encoder, for every class that has been converted so far (eg,
+subclasses of the classes in _encoders and _natives). Cleared whenever
+something is registered."""
+
+def _encoder(cls, typ):
+	"""Makes an encoder for a RegistryType subclass."""
+	to_registry = cls.__to_registry__
+	return lambda v: (to_registry(v), typ)
+
+def _native(cls, typ):
+	"""Makes an encoder for a native type, that converts to cls first."""
+	to_registry = cls.__to_registry__
+	return lambda v: (to_registry(cls(v)), typ)
+
+def _decoder(cls):
+	"""Returns cls.__from_registry__, or cls itself if that is all it does."""
+	if cls.__from_registry__.im_func is RegistryType.__from_registry__.im_func: #Py3k
+		return cls
+	return cls.__from_registry__
+
+def register(cls, typ, default=False):
+	"""register(cls, typ[, default]) -> None
 
-def _dict_index(d, val):
-	for k,v in d.items():
-		if v == val:
-			return k
+	Registers cls (a RegistryType subclass) as one that is stored as the
+	registry data type typ (one of the REG_* constants). If default is True,
+	values of type typ are read as cls too, instead of whatever class they
+	were read as before. Subclasses of registered classes are stored as
+	their base class is, unless they are registered themselves or have
+	their own __to_registry__()."""
+	_encoders[cls] = _encoder(cls, typ)
+	if default:
+		_registryDataClasses[typ] = cls
+		_decoders[typ] = _decoder(cls)
+	_resolved.clear()
+
+for _typ, _cls in _registryDataClasses.items():
+	register(_cls, _typ, True)
+register(DWORD_LittleEndian, REG_DWORD_LITTLE_ENDIAN)
+register(QWORD, REG_QWORD, True)
+register(QWORD_LittleEndian, REG_QWORD_LITTLE_ENDIAN)
+register(LazyMultiString, REG_MULTI_SZ)
+register(BinaryView, REG_BINARY)
+register(rNoneView, REG_NONE)
+register(ResourceListView, REG_RESOURCE_LIST)
+
+for _cls in (str, unicode): #Py3k
+	_natives[_cls] = _native(String, REG_SZ)
+for _cls in bin2reg:
+	# _winreg takes anything with a buffer, so pass them on without copying
+	_natives[_cls] = lambda v: (v, REG_BINARY)
+if sys.hexversion < 0x3000000: #Py3k
+	# ...except memoryviews
+	_natives[memoryview] = lambda v: (v.tobytes(), REG_BINARY)
+for _cls in (list, tuple, set, frozenset, enumerate, _GeneratorType):
+	_natives[_cls] = _native(MultiString, REG_MULTI_SZ)
+for _cls in (int, long, bool): #Py3k
+	_natives[_cls] = _native(DWORD, REG_DWORD)
+_natives[type(None)] = lambda v: ('', REG_NONE)
+del _typ, _cls
+
+def _getmro(cls):
+	"""Like inspect.getmro(), which isn't used because inspect is slow to
+	import."""
+	try:
+		return cls.__mro__
+	except AttributeError: #Py3k
+		# An old-style class
+		mro = []
+		stack = [cls]
+		while stack:
+			cls = stack.pop()
+			if cls not in mro:
+				mro.append(cls)
+				stack.extend(reversed(cls.__bases__))
+		return tuple(mro)
+
+def _resolve(cls):
+	"""Finds the encoder for a class that hasn't been seen before."""
+	mro = _getmro(cls)
+	encoder = None
+	for base in mro:
+		if base in _encoders:
+			# A subclass that converts itself differently isn't stored as
+			# its base is
+			if _func(cls.__to_registry__) is _func(base.__to_registry__):
+				encoder = _encoders[base]
+			break
+	if encoder is not None:
+		pass
+	elif hasattr(cls, '__to_registry__'):
+		# Something that knows how to convert itself to something else
+		def encoder(v):
+			v = v.__to_registry__()
+			if v.__class__ is cls:
+				raise TypeError("Can't convert to a type acceptable by _winreg")
+			return _Object2Registry(v)
+	else:
+		encoder = _first(mro, _natives)
+		if encoder is None:
+			if hasattr(cls, '__getitem__'):
+				encoder = _native(MultiString, REG_MULTI_SZ)
+			else:
+				raise TypeError("Can't convert to a type acceptable by _winreg")
+	_resolved[cls] = encoder
+	return encoder
+
+def _func(method):
+	"""Returns the function of a method."""
+	return getattr(method, 'im_func', method) #Py3k
+
+def _first(classes, table):
+	"""Returns table's entry for the first of classes in it, if any."""
+	for cls in classes:
+		if cls in table:
+			return table[cls]
 
 def _Registry2Object(t,v):
 	"""_Registry2Object(t,v) -> object
 	
 	Converts the given object and registry type to a registry type object.
+	Unknown types are read as rNone.
 	"""
-	if t in _registryDataClasses:
-		return _registryDataClasses[t].__from_registry__(v)
-	else:
-		# Assume REG_NONE
-		return rNone.__from_registry__(v)
+	try:
+		decoder = _decoders[t]
+	except KeyError:
+		decoder = _decoders[REG_NONE]
+	return decoder(v)
+
 def _Object2Registry(v):
 	"""_Object2Registry(v) -> (object, int)
 	
@@ -228,32 +814,53 @@ def _Object2Registry(v):
 	You can also pass some native types, as follows:
 	* basestring -> String
 	* list, tuple, set, enumerate, frozenset, generator -> MultiString
-	* buffer -> Binary
+	* buffer, memoryview, bytearray -> Binary
 	* long, int -> DWORD
 	* None -> null rNone
-	* bool -> DWORD (-1 or 0)
+	* bool -> DWORD (1 or 0)
 	"""
-	for _ in range(0, 2):
-		## A known type
-		if v.__class__ in _registryDataClasses.values():
-			t = _dict_index(_registryDataClasses, v.__class__)
-			return (v.__to_registry__(), t)
-		elif hasattr(v, '__to_registry__'):
-			v = v.__to_registry__()
-		## These are conversions from native types
-		## Must be last so that inheritance trees don't screw it up
-		elif isinstance(v, str2reg):
-			return _Object2Registry(String(v))
-		elif isinstance(v, bin2reg):
-			return _Object2Registry(Binary(v))
-		elif hasattr(v, '__getitem__'):
-			return _Object2Registry(MultiString(v))
-		elif isinstance(v, long) or isinstance(v, int):
-			return (DWORD(v).__to_registry__(), _winreg.REG_DWORD)
-		elif v is None:
-			return ('', _winreg.REG_NONE)
-		## These types don't cleanly convert to another type
-		elif isinstance(v, bool):
-			if v: return (0xFFFFFFFF, _winreg.REG_DWORD)
-			else: return (0, _winreg.REG_DWORD)
-	raise TypeError("Can't convert to a type acceptable by _winreg")
+	try:
+		encoder = _resolved[v.__class__]
+	except KeyError:
+		encoder = _resolve(v.__class__)
+	return encoder(v)
+
+_numberFormats = {
+	DWORD_BigEndian : ('>%iI', 4),
+	QWORD : ('<%iQ', 8),
+}
+"""The struct formats (for a number of numbers) of the byte string types."""
+
+def _numberBase(cls):
+	for base in _getmro(cls):
+		if base in _numberFormats:
+			return base
+	raise TypeError("%s is not a number type" % cls.__name__)
+
+def encodeNumbers(cls, numbers):
+	"""encodeNumbers(cls, numbers) -> list
+
+	Converts a sequence of numbers to what _winreg would be given for each
+	of them as cls (DWORD, DWORD_LittleEndian, DWORD_BigEndian, QWORD or
+	QWORD_LittleEndian), all in one go. Much faster than converting each one
+	when there are many. The numbers must be in range for the type; raises
+	struct.error if they aren't."""
+	count = len(numbers)
+	if issubclass(cls, DWORD) and not issubclass(cls, DWORD_BigEndian):
+		# _winreg wants signed numbers
+		return list(struct.unpack('<%ii' % count, struct.pack('<%iI' % count, *numbers)))
+	fmt, size = _numberFormats[_numberBase(cls)]
+	data = struct.pack(fmt % count, *numbers)
+	return [data[i:i+size] for i in xrange(0, len(data), size)]
+
+def decodeNumbers(cls, data):
+	"""decodeNumbers(cls, data) -> list
+
+	The opposite of encodeNumbers(): converts what _winreg gave for a
+	sequence of values of the type cls stores as to a list of numbers. The
+	numbers are plain ints and longs, not instances of cls."""
+	count = len(data)
+	if issubclass(cls, DWORD) and not issubclass(cls, DWORD_BigEndian):
+		return list(struct.unpack('<%iI' % count, struct.pack('<%ii' % count, *data)))
+	fmt, size = _numberFormats[_numberBase(cls)]
+	return list(struct.unpack(fmt % count, ''.join(data)))
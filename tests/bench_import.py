@@ -0,0 +1,92 @@
+"""
+Benchmarks how long importing pyreg takes, as a short-lived script starts
+up. Each import is timed in a new interpreter, module by module, the way
+python3 -X importtime does it (which Python 2 doesn't have): a meta path
+hook times each module's loading, and its self time leaves out the modules
+it imported. "before" imports what importing pyreg used to: pyreg.types,
+pyreg.key, pyreg.roots and pyreg.hive, and inspect and datetime, which
+they no longer import.
+
+Usage: python bench_import.py [runs]
+       python bench_import.py --run 'import pyreg'   (prints each module)
+"""
+import imp, os, subprocess, sys, time
+
+STATEMENTS = [
+    ('before', 'import inspect, datetime, pyreg.types, pyreg.key, pyreg.roots, pyreg.hive'),
+    ('import pyreg', 'import pyreg'),
+    ('first root', 'import pyreg; pyreg.HKEY_CURRENT_USER'),
+    ]
+
+class _Loader(object):
+    def __init__(self, timer, found):
+        self.timer = timer
+        self.found = found
+
+    def load_module(self, fullname):
+        timer = self.timer
+        start = time.time()
+        timer.stack.append(0.0)
+        try:
+            return imp.load_module(fullname, *self.found)
+        finally:
+            if self.found[0] is not None:
+                self.found[0].close()
+            elapsed = time.time() - start
+            children = timer.stack.pop()
+            if timer.stack:
+                timer.stack[-1] += elapsed
+            timer.times.append((len(timer.stack), elapsed - children, elapsed, fullname))
+
+class ImportTimer(object):
+    """A meta path hook that times each module as it is loaded."""
+    def __init__(self):
+        self.stack = []
+        self.times = [] # (depth, self, cumulative, name), as they finish
+
+    def find_module(self, fullname, path=None):
+        try:
+            found = imp.find_module(fullname.rpartition('.')[2], path)
+        except ImportError:
+            return None
+        return _Loader(self, found)
+
+def run(statement, verbose):
+    timer = ImportTimer()
+    sys.meta_path.insert(0, timer)
+    start = time.time()
+    exec statement in {}
+    total = time.time() - start
+    sys.meta_path.remove(timer)
+    if verbose:
+        print "import time: self [us] | cumulative | imported package"
+        for depth, own, cumulative, name in timer.times:
+            print "import time: %9i | %10i | %s%s" % (own * 1e6, cumulative * 1e6, '  ' * depth, name)
+    print '%f %i' % (total, len(timer.times))
+
+def measure(statement):
+    env = dict(os.environ)
+    # Time it as installed, with .pyc files, not compiling each module
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    out = subprocess.Popen([sys.executable, __file__, '--quiet', statement],
+        stdout=subprocess.PIPE, env=env).communicate()[0]
+    total, modules = out.split()
+    return float(total), int(modules)
+
+def main(number=20):
+    print "Best and median of %i runs, each in a new interpreter" % number
+    print "%-14s %10s %10s %8s" % ('', 'best', 'median', 'modules')
+    for name, statement in STATEMENTS:
+        measure(statement)
+        times = []
+        for n in xrange(number):
+            total, modules = measure(statement)
+            times.append(total)
+        times.sort()
+        print "%-14s %8.2fms %8.2fms %8i" % (name, times[0] * 1e3, times[len(times) // 2] * 1e3, modules)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] in (['--run'], ['--quiet']):
+        run(sys.argv[2], sys.argv[1] == '--run')
+    else:
+        main(*[int(a) for a in sys.argv[1:2]])
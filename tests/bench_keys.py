@@ -0,0 +1,78 @@
+"""
+Benchmarks making a lot of Keys at once, as a dump of a big subtree does:
+peak memory, how long a full garbage collection takes while they are alive,
+and what is left over once they are dropped. Compares Keys as they are now
+against Keys as they were, each with a _RegValues and a _RegKeys pointing
+back at it, and all three with a __del__(). Each kind is run in its own
+process, so that their peak memory can be told apart.
+
+Usage: python bench_keys.py [keys]
+"""
+import gc, resource, subprocess, sys, time, UserDict
+from pyreg import backend
+from pyreg.key import Key
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+
+class _OldView(UserDict.DictMixin):
+    """_RegValues and _RegKeys as they were."""
+    def __init__(self, parent):
+        self.parent = parent
+    def __del__(self):
+        self.parent = None
+
+class OldKey(Key):
+    """Key as it was, with views of its own that point back at it."""
+    __slots__ = ('_values', '_keys')
+    def __init__(self, *args, **kwargs):
+        Key.__init__(self, *args, **kwargs)
+        self._values = _OldView(self)
+        self._keys = _OldView(self)
+    def __del__(self):
+        try: del self._values
+        except: pass
+        try: del self._keys
+        except: pass
+
+def build(cls, count):
+    """Makes count keys, 1000 to a parent, like a walk of a wide tree."""
+    keys = []
+    parent = None
+    for n in xrange(count):
+        if n % 1000 == 0:
+            parent = cls(HKEY_CURRENT_USER, u'dump\\%i' % (n // 1000))
+            keys.append(parent)
+        keys.append(cls(parent, u'key%i' % n))
+    return keys
+
+def run(kind, count):
+    backend.setDefault(MemoryRegistry())
+    cls = kind == 'before' and OldKey or Key
+    gc.collect()
+    start = time.time()
+    keys = build(cls, count)
+    built = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    gc.collect()
+    pause = time.time() - start
+    tracked = len(gc.get_objects())
+    del keys
+    gc.collect()
+    print '%s %f %i %f %i %i' % (kind, built, peak, pause, tracked, len(gc.garbage))
+
+def main(count=1000000):
+    print "%i keys" % count
+    print "%-8s %10s %12s %10s %12s %10s" % ('', 'make', 'peak RSS', 'gc pause', 'gc tracked', 'leaked')
+    for kind in ('before', 'after'):
+        out = subprocess.Popen([sys.executable, __file__, '--run', kind, str(count)],
+            stdout=subprocess.PIPE).communicate()[0]
+        kind, built, peak, pause, tracked, leaked = out.split()
+        print "%-8s %9.2fs %9.1f MB %9.3fs %12s %10s" % (kind, float(built), int(peak) / 1024.0,
+            float(pause), tracked, leaked)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run']:
+        run(sys.argv[2], int(sys.argv[3]))
+    else:
+        main(*[int(a) for a in sys.argv[1:2]])
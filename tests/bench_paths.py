@@ -0,0 +1,50 @@
+"""
+Benchmarks going to the same deep key over and over, and getting its path,
+with the Keys made by akey / name remembered (as they are now) and made
+afresh each time (as they used to be).
+
+Usage: python bench_paths.py [iterations]
+"""
+import sys, timeit
+from pyreg import backend
+from pyreg.key import Key
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_LOCAL_MACHINE
+
+NAMES = ['SOFTWARE', 'Microsoft', 'Windows', 'CurrentVersion', 'Explorer', 'Shell Folders']
+
+def navigate():
+    k = HKEY_LOCAL_MACHINE
+    for name in NAMES:
+        k = k / name
+    return k
+
+def fresh():
+    """Navigation without the Keys being remembered."""
+    k = HKEY_LOCAL_MACHINE
+    for name in NAMES:
+        k = Key(k, name)
+    return k
+
+def oldGetPath(k, abbrev=True):
+    """Key.getPath() as it was."""
+    if k.parent is None:
+        return k.getPath(abbrev)
+    return unicode(u"%s\\%s" % (oldGetPath(k.parent, abbrev), k.myname))
+
+def main(number=100000):
+    backend.setDefault(MemoryRegistry())
+    print "%-16s %10s %10s %7s" % ('', 'before', 'after', '')
+    before = min(timeit.repeat(fresh, number=number, repeat=3))
+    after = min(timeit.repeat(navigate, number=number, repeat=3))
+    print "%-16s %9.3fs %9.3fs %6.1fx" % ('navigate', before, after, before / after)
+    k = navigate()
+    before = min(timeit.repeat(lambda: oldGetPath(k), number=number, repeat=3))
+    after = min(timeit.repeat(lambda: k.getPath(), number=number, repeat=3))
+    print "%-16s %9.3fs %9.3fs %6.1fx" % ('getPath', before, after, before / after)
+    before = min(timeit.repeat(lambda: oldGetPath(fresh()), number=number, repeat=3))
+    after = min(timeit.repeat(lambda: navigate().getPath(), number=number, repeat=3))
+    print "%-16s %9.3fs %9.3fs %6.1fx" % ('both', before, after, before / after)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
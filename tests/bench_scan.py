@@ -0,0 +1,60 @@
+"""
+Benchmarks pyreg.scan against Key.walk() on a registry that takes a while to
+answer, like a real one does, to show how scanning scales with the number of
+workers.
+
+Usage: python bench_scan.py [latency in ms [keys per level [levels]]]
+"""
+import sys, time
+from pyreg import backend
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+from pyreg.scan import scan
+
+class SlowRegistry(MemoryRegistry):
+    """A MemoryRegistry where every call sleeps first (letting go of the GIL,
+    as _winreg does while it waits)."""
+    def __init__(self, latency):
+        MemoryRegistry.__init__(self)
+        self.latency = latency
+
+def _slow(name):
+    inner = getattr(MemoryRegistry, name)
+    def call(self, *args):
+        time.sleep(self.latency)
+        return inner(self, *args)
+    call.__name__ = name
+    return call
+
+for _name in ('OpenKey', 'EnumKey', 'EnumValue', 'QueryValueEx', 'QueryInfoKey'):
+    setattr(SlowRegistry, _name, _slow(_name))
+
+def build(top, width, depth):
+    if depth == 0:
+        return
+    for n in range(width):
+        sub = top / ('key%i' % n)
+        sub['value'] = n
+        build(sub, width, depth - 1)
+
+def main(latency=0.5, width=8, depth=3):
+    reg = SlowRegistry(0)
+    backend.setDefault(reg)
+    top = HKEY_CURRENT_USER / 'bench'
+    build(top, width, depth)
+    reg.latency = latency / 1000.0
+
+    start = time.time()
+    count = sum(1 for entry in top.walk())
+    serial = time.time() - start
+    print "%i keys, %.1fms per call" % (count, latency)
+    print "walk():             %7.3fs" % serial
+    for workers in (1, 2, 4, 8, 16):
+        for ordered in (False, True):
+            start = time.time()
+            assert sum(1 for entry in scan(top, workers, ordered)) == count
+            took = time.time() - start
+            print "scan(%2i, %-7s): %7.3fs  %5.2fx" % (workers, ordered and 'ordered' or '', took, serial / took)
+
+if __name__ == '__main__':
+    main(*[float(a) for a in sys.argv[1:2]] + [int(a) for a in sys.argv[2:4]])
@@ -0,0 +1,210 @@
+"""
+The benchmark suite for pyreg's hot paths: opening and navigating keys,
+getting and setting a value of every type in pyreg.types, enumerating wide
+keys (and looking names up in a pyreg.index of one), resolving deep paths
+and walking whole trees. It runs against a MemoryRegistry (the in-memory
+stand-in for _winreg), optionally with latency added to every call, and
+needs no input.
+
+Results are printed, and can be written as JSON. Given a baseline (results
+saved earlier, eg tests/bench_baseline.json), it compares against it and
+exits with status 1 if anything got slower than the tolerance allows.
+Baselines are only comparable on the same machine and settings; make one
+with --save-baseline before a change, and check against it after.
+
+Usage: python bench_suite.py [--latency ms] [--scale entries] [--only text]
+           [--json file] [--baseline file] [--save-baseline file]
+           [--tolerance percent]
+"""
+import argparse, json, platform, sys, time, timeit
+from pyreg import backend
+from pyreg.index import NameIndex
+from pyreg.key import Key
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+from pyreg.types import Binary, DWORD, DWORD_BigEndian, DWORD_LittleEndian, ExpandingString, \
+    Link, MultiString, QWORD, QWORD_LittleEndian, ResourceList, String, rNone
+
+VALUES = [
+    String(u'spam and eggs'),
+    ExpandingString(u'%SystemRoot%\\system32'),
+    Link(u'\\Registry\\Machine\\Software'),
+    MultiString([u'spam', u'eggs', u'ham']),
+    Binary(''.join(map(chr, range(64)))),
+    rNone('\x01\x02'),
+    ResourceList('\x01\x02\x03'),
+    DWORD(0xDEADBEEF),
+    DWORD_BigEndian(42),
+    DWORD_LittleEndian(42),
+    QWORD(2**40 + 7),
+    QWORD_LittleEndian(2**40 + 7),
+    ]
+
+DEPTH = 32
+"""How many keys deep the deep path is."""
+TREE = (10, 4)
+"""The width and depth of the tree that is walked."""
+
+class LatencyRegistry(MemoryRegistry):
+    """A MemoryRegistry where every call sleeps for latency seconds first
+    (letting go of the GIL, as _winreg does while it waits)."""
+    latency = 0
+
+def _slow(name):
+    inner = getattr(MemoryRegistry, name)
+    def call(self, *args):
+        if self.latency:
+            time.sleep(self.latency)
+        return inner(self, *args)
+    call.__name__ = name
+    return call
+
+for _name in ('OpenKey', 'CreateKey', 'CloseKey', 'EnumKey', 'EnumValue', 'QueryValueEx',
+        'QueryInfoKey', 'SetValueEx', 'DeleteValue', 'DeleteKey', 'FlushKey'):
+    setattr(LatencyRegistry, _name, _slow(_name))
+
+def build(reg, scale):
+    """Fills in the registry the benchmarks use, without latency. Returns
+    the top key."""
+    top = HKEY_CURRENT_USER / 'Bench'
+    handle = reg.CreateKey(backend.HKEY_CURRENT_USER, u'Bench\\WideValues')
+    for n in xrange(scale):
+        reg.SetValueEx(handle, u'value%06i' % n, 0, 4, n)
+    handle = reg.CreateKey(backend.HKEY_CURRENT_USER, u'Bench\\WideKeys')
+    for n in xrange(scale):
+        reg.CreateKey(handle, u'key%06i' % n)
+    path = u'Bench\\' + u'\\'.join([u'level%i' % n for n in range(DEPTH)])
+    reg.CreateKey(backend.HKEY_CURRENT_USER, path)
+    width, depth = TREE
+    paths = [u'Bench\\Tree']
+    for level in range(depth):
+        paths = [p + u'\\k%i' % n for p in paths for n in range(width)]
+    for p in paths:
+        handle = reg.CreateKey(backend.HKEY_CURRENT_USER, p)
+        reg.SetValueEx(handle, u'a', 0, 1, u'x')
+        reg.SetValueEx(handle, u'b', 0, 4, 1)
+    for value in VALUES:
+        (top / 'Values')[value.__class__.__name__] = value
+    return top
+
+def benchmarks(top, scale):
+    """Returns the benchmarks, as (name, function, operations per call)."""
+    deep = u'\\'.join([u'level%i' % n for n in range(DEPTH)])
+    values = top / 'Values'
+    wideValues = top / 'WideValues'
+    wideKeys = top / 'WideKeys'
+    tree = top / 'Tree'
+    width, depth = TREE
+    nodes = sum([width ** n for n in range(depth + 1)])
+    index = NameIndex(wideKeys)
+    some = [u'key%06i' % n for n in xrange(0, scale, max(1, scale // 100))] + [u'missing']
+    cases = [
+        ('open.new', lambda: Key(top, u'Values')._reader(), 1),
+        ('open.contains', lambda: u'Values' in top.keys, 1),
+        ('open.missing', lambda: u'Missing' in top.keys, 1),
+        ('navigate.div', lambda: top / 'Tree' / 'k1' / 'k2', 3),
+        ('navigate.keys', lambda: top.keys['Tree\\k1\\k2'], 1),
+        ('deep.resolve', lambda: Key(top, deep)._reader(), 1),
+        ('deep.div', lambda: reduce(lambda k, n: k / n, deep.split(u'\\'), top), DEPTH),
+        ('deep.getPath', lambda: Key(top, deep).getPath(False), 1),
+        ('enum.values', lambda: list(wideValues.values), scale),
+        ('enum.items', lambda: list(wideValues.values.iteritems()), scale),
+        ('enum.keys', lambda: list(wideKeys.keys), scale),
+        ('enum.len', lambda: len(wideKeys.keys), 1),
+        ('index.prefix', lambda: list(index.prefix(u'key0001')), 1),
+        ('index.members', lambda: index.members(some), len(some)),
+        ('index.scan', lambda: [n for n in wideKeys.keys if n.startswith(u'key0001')], 1),
+        ('walk.topdown', lambda: list(tree.walk()), nodes),
+        ('walk.bottomup', lambda: list(tree.walk(topdown=False)), nodes),
+        ]
+    for value in VALUES:
+        name = value.__class__.__name__
+        cases.append(('value.get.' + name, lambda name=name: values[name], 1))
+        cases.append(('value.set.' + name, lambda name=name, value=value: values.__setitem__(name, value), 1))
+    return cases
+
+def measure(func, ops, mintime=0.05, repeat=5):
+    """Returns the best time per operation, calling func enough times that
+    each of the repeat runs takes at least mintime seconds."""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= mintime:
+            break
+        number *= max(2, min(10, int(mintime / max(elapsed, 1e-9))))
+    best = min([elapsed] + timeit.repeat(func, number=number, repeat=repeat - 1))
+    return best / number / ops, number
+
+def run(latency=0.0, scale=100000, only=None):
+    """Runs the benchmarks, returning the results as a dict."""
+    reg = LatencyRegistry()
+    backend.setDefault(reg)
+    try:
+        top = build(reg, scale)
+        reg.latency = latency
+        results = {}
+        for name, func, ops in benchmarks(top, scale):
+            if only and only not in name:
+                continue
+            seconds, calls = measure(func, ops)
+            results[name] = {'seconds': seconds, 'ops': ops, 'calls': calls}
+            print "%-32s %12.3f us" % (name, seconds * 1e6)
+    finally:
+        backend.setDefault(None)
+    return {'python': sys.version.split()[0], 'platform': platform.platform(),
+        'latency': latency, 'scale': scale, 'results': results}
+
+def compare(baseline, results, tolerance):
+    """Prints how results compare to baseline, and returns the names of the
+    benchmarks that got more than tolerance (a fraction) slower."""
+    slower = []
+    if (baseline.get('latency'), baseline.get('scale')) != (results['latency'], results['scale']):
+        print "The baseline was made with different settings (latency %r, scale %r)" % (
+            baseline.get('latency'), baseline.get('scale'))
+    print "%-32s %12s %12s %8s" % ('', 'baseline', 'now', '')
+    for name in sorted(results['results']):
+        now = results['results'][name]['seconds']
+        before = baseline['results'].get(name, {}).get('seconds')
+        if before is None:
+            print "%-32s %12s %9.3f us %8s" % (name, '-', now * 1e6, 'new')
+            continue
+        ratio = now / before
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = 'SLOWER'
+            slower.append(name)
+        print "%-32s %9.3f us %9.3f us %6.2fx %s" % (name, before * 1e6, now * 1e6, ratio, flag)
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks pyreg's hot paths.")
+    parser.add_argument('--latency', type=float, default=0.0, help="ms added to every registry call")
+    parser.add_argument('--scale', type=int, default=100000, help="values and subkeys in the wide keys")
+    parser.add_argument('--only', help="only run benchmarks with this in their name")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="compare against the results in this file")
+    parser.add_argument('--save-baseline', help="write the results to this file, as a baseline")
+    parser.add_argument('--tolerance', type=float, default=30.0, help="percent slower that counts as a regression")
+    args = parser.parse_args(argv)
+    results = run(args.latency / 1000.0, args.scale, args.only)
+    for filename in (args.json, args.save_baseline):
+        if filename:
+            f = open(filename, 'w')
+            try:
+                json.dump(results, f, indent=1, sort_keys=True, separators=(',', ': '))
+            finally:
+                f.close()
+    if args.baseline:
+        f = open(args.baseline)
+        try:
+            baseline = json.load(f)
+        finally:
+            f.close()
+        slower = compare(baseline, results, args.tolerance / 100.0)
+        if slower:
+            print "%i got slower: %s" % (len(slower), ', '.join(slower))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
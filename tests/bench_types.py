@@ -0,0 +1,80 @@
+"""
+Benchmarks converting values to and from what the registry stores, with the
+dispatch tables in pyreg.types against the linear search it used to do, and
+converting numbers one at a time against encodeNumbers()/decodeNumbers().
+
+Usage: python bench_types.py [iterations]
+"""
+import sys, timeit
+from pyreg import types
+from pyreg.backend import REG_DWORD, REG_NONE
+from pyreg.types import Binary, DWORD, DWORD_BigEndian, ExpandingString, MultiString, \
+    QWORD, String, encodeNumbers, decodeNumbers, str2reg, bin2reg, _Object2Registry, _Registry2Object, _registryDataClasses
+
+def _dict_index(d, val):
+    for k,v in d.items():
+        if v == val:
+            return k
+
+def oldObject2Registry(v):
+    """_Object2Registry() as it was."""
+    for _ in range(0, 2):
+        if v.__class__ in _registryDataClasses.values():
+            t = _dict_index(_registryDataClasses, v.__class__)
+            return (v.__to_registry__(), t)
+        elif hasattr(v, '__to_registry__'):
+            v = v.__to_registry__()
+        elif isinstance(v, str2reg):
+            return oldObject2Registry(String(v))
+        elif isinstance(v, bin2reg):
+            return oldObject2Registry(Binary(v))
+        elif hasattr(v, '__getitem__'):
+            return oldObject2Registry(MultiString(v))
+        elif isinstance(v, long) or isinstance(v, int):
+            return (DWORD(v).__to_registry__(), REG_DWORD)
+        elif v is None:
+            return ('', REG_NONE)
+    raise TypeError("Can't convert to a type acceptable by _winreg")
+
+def oldRegistry2Object(t, v):
+    """_Registry2Object() as it was."""
+    if t in _registryDataClasses:
+        return _registryDataClasses[t].__from_registry__(v)
+    else:
+        return types.rNone.__from_registry__(v)
+
+SAMPLES = [
+    ('String', String(u'spam')),
+    ('ExpandingString', ExpandingString(u'%PATH%')),
+    ('unicode', u'spam'),
+    ('int', 42),
+    ('list', [u'a', u'b']),
+    ('None', None),
+    ]
+
+def main(number=100000):
+    print "%-16s %10s %10s %7s" % ('to registry', 'before', 'after', '')
+    for name, value in SAMPLES:
+        before = min(timeit.repeat(lambda: oldObject2Registry(value), number=number, repeat=3))
+        after = min(timeit.repeat(lambda: _Object2Registry(value), number=number, repeat=3))
+        print "%-16s %9.3fs %9.3fs %6.1fx" % (name, before, after, before / after)
+    print "%-16s %10s %10s %7s" % ('from registry', 'before', 'after', '')
+    for name, value in SAMPLES[:-1]:
+        data, typ = _Object2Registry(value)
+        before = min(timeit.repeat(lambda: oldRegistry2Object(typ, data), number=number, repeat=3))
+        after = min(timeit.repeat(lambda: _Registry2Object(typ, data), number=number, repeat=3))
+        print "%-16s %9.3fs %9.3fs %6.1fx" % (name, before, after, before / after)
+    print "%-22s %10s %10s %7s" % ('10000 numbers', 'singly', 'batch', '')
+    numbers = range(0, 0xFFFFFFFF, 0xFFFFFFFF // 10000)[:10000]
+    for cls in (DWORD, DWORD_BigEndian, QWORD):
+        singly = min(timeit.repeat(lambda: [_Object2Registry(cls(n))[0] for n in numbers], number=number // 10000 or 1, repeat=3))
+        batch = min(timeit.repeat(lambda: encodeNumbers(cls, numbers), number=number // 10000 or 1, repeat=3))
+        print "%-22s %9.3fs %9.3fs %6.1fx" % ('encode ' + cls.__name__, singly, batch, singly / batch)
+        data = encodeNumbers(cls, numbers)
+        typ = _Object2Registry(cls(0))[1]
+        singly = min(timeit.repeat(lambda: [_Registry2Object(typ, d) for d in data], number=number // 10000 or 1, repeat=3))
+        batch = min(timeit.repeat(lambda: decodeNumbers(cls, data), number=number // 10000 or 1, repeat=3))
+        print "%-22s %9.3fs %9.3fs %6.1fx" % ('decode ' + cls.__name__, singly, batch, singly / batch)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,140 @@
+"""
+Writes tests/fixtures/small.hiv, the hive used by tests/test_hive.py.
+
+Run it again (with Python 2) if the fixture needs to change. It only writes
+what pyreg.hive reads: no security cells, no transaction logs.
+"""
+import os, struct
+
+FILETIME = 130000000000000000 # 2012-12-14
+KEY_HIVE_ENTRY = 0x04
+KEY_NO_DELETE = 0x08
+KEY_COMP_NAME = 0x20
+VALUE_COMP_NAME = 0x01
+REG_SZ, REG_EXPAND_SZ, REG_BINARY, REG_DWORD, REG_DWORD_BIG_ENDIAN, REG_MULTI_SZ = 1, 2, 3, 4, 5, 7
+
+class HiveWriter(object):
+    def __init__(self):
+        self.data = bytearray('\0' * 32) # hbin header, patched in finish()
+
+    def alloc(self, size):
+        size = (size + 4 + 7) & ~7
+        offset = len(self.data)
+        self.data += struct.pack('<i', -size) + '\0' * (size - 4)
+        return offset
+
+    def put(self, offset, raw):
+        self.data[offset+4:offset+4+len(raw)] = raw
+
+    def cell(self, raw):
+        offset = self.alloc(len(raw))
+        self.put(offset, raw)
+        return offset
+
+    def name(self, name):
+        try:
+            return name.encode('ascii'), True
+        except UnicodeError:
+            return name.encode('utf-16-le'), False
+
+    def value(self, name, typ, raw):
+        rawname, comp = self.name(name)
+        if len(raw) <= 4:
+            size, dataoff = len(raw) | 0x80000000, struct.unpack('<I', raw.ljust(4, '\0'))[0]
+        elif len(raw) > 16344:
+            segs = []
+            for i in range(0, len(raw), 16344):
+                segs.append(self.cell(raw[i:i+16344]))
+            seglist = self.cell(struct.pack('<%dI' % len(segs), *segs))
+            size, dataoff = len(raw), self.cell(struct.pack('<2sHI', 'db', len(segs), seglist))
+        else:
+            size, dataoff = len(raw), self.cell(raw)
+        return self.cell(struct.pack('<2sHIIIHH', 'vk', len(rawname), size, dataoff, typ,
+            comp and VALUE_COMP_NAME or 0, 0) + rawname)
+
+    def key(self, name, parent, values=(), subkeys=(), listtype='lh', flags=0):
+        rawname, comp = self.name(name)
+        offset = self.alloc(76 + len(rawname))
+        children = []
+        for sub in subkeys:
+            children.append((sub[0], self.key(sub[0], offset, *sub[1:])))
+        children.sort(key=lambda c: c[0].upper())
+        sublist = 0xFFFFFFFF
+        if children:
+            sublist = self.sublist(children, listtype)
+        vallist = 0xFFFFFFFF
+        if values:
+            vals = [self.value(*v) for v in values]
+            vallist = self.cell(struct.pack('<%dI' % len(vals), *vals))
+        if comp: flags |= KEY_COMP_NAME
+        self.put(offset, struct.pack('<2sHQIIIIIIIIIIIIIIIHH', 'nk', flags, FILETIME, 0, parent,
+            len(children), 0, sublist, 0xFFFFFFFF, len(values), vallist, 0xFFFFFFFF,
+            0xFFFFFFFF, 0, 0, 0, 0, 0, len(rawname), 0) + rawname)
+        return offset
+
+    def sublist(self, children, listtype):
+        if listtype == 'ri':
+            half = len(children) // 2
+            leaves = [self.sublist(children[:half], 'lh'), self.sublist(children[half:], 'lh')]
+            return self.cell(struct.pack('<2sH2I', 'ri', 2, *leaves))
+        raw = struct.pack('<2sH', listtype, len(children))
+        for name, off in children:
+            if listtype == 'li':
+                raw += struct.pack('<I', off)
+            elif listtype == 'lf':
+                raw += struct.pack('<I4s', off, name[:4].encode('latin-1', 'replace'))
+            else:
+                h = 0
+                for c in name.upper():
+                    h = (h * 37 + ord(c)) & 0xFFFFFFFF
+                raw += struct.pack('<II', off, h)
+        return self.cell(raw)
+
+    def finish(self, root):
+        size = (len(self.data) + 4095) & ~4095
+        if size > len(self.data):
+            free = size - len(self.data)
+            self.data += struct.pack('<i', free) + '\0' * (free - 4)
+        self.data[0:32] = struct.pack('<4sII8sQI', 'hbin', 0, size, '', FILETIME, 0)
+        base = bytearray(struct.pack('<4sIIQIIIIIII', 'regf', 1, 1, FILETIME, 1, 5, 0, 1, root, size, 1))
+        base += '\0' * (512 - len(base))
+        csum = 0
+        for dword in struct.unpack('<127I', str(base[:508])):
+            csum ^= dword
+        base[508:512] = struct.pack('<I', csum)
+        base += '\0' * (4096 - len(base))
+        return str(base + self.data)
+
+def build():
+    w = HiveWriter()
+    python = [
+        (u'', REG_SZ, u'default value\0'.encode('utf-16-le')),
+        (u'Version', REG_SZ, u'2.7\0'.encode('utf-16-le')),
+        (u'Count', REG_DWORD, struct.pack('<I', 42)),
+        (u'Big', REG_DWORD, struct.pack('<I', 0x87654321)),
+        (u'BE', REG_DWORD_BIG_ENDIAN, struct.pack('>I', 0x12345678)),
+        (u'Path', REG_EXPAND_SZ, u'%SystemRoot%\\py\0'.encode('utf-16-le')),
+        (u'List', REG_MULTI_SZ, u'a\0bb\0ccc\0\0'.encode('utf-16-le')),
+        (u'Blob', REG_BINARY, '\x12\x34\x56\x78\x90'),
+        (u'Huge', REG_BINARY, ''.join(chr(i % 251) for i in range(40000))),
+        (u'Empty', REG_BINARY, ''),
+        (u'\xdcn\xefcode', REG_SZ, u'\u2603\0'.encode('utf-16-le')),
+    ]
+    wide = [(u'Item%03i' % i,) for i in range(300)]
+    tree = [
+        (u'Software', (), [
+            (u'Python', python, [(u'PythonCore', (), [(u'2.7',)])]),
+            (u'Wide', (), wide, 'ri'),
+            (u'Hinted', (), [(u'Alpha',), (u'Be',), (u'Gamma',)], 'lf'),
+            (u'Plain', (), [(u'One',), (u'Two',)], 'li'),
+        ]),
+        (u'System', [(u'Flag', REG_DWORD, struct.pack('<I', 1))]),
+    ]
+    root = w.key(u'ROOT', 0xFFFFFFFF, (), tree, 'lh', KEY_HIVE_ENTRY | KEY_NO_DELETE)
+    return w.finish(root)
+
+if __name__ == '__main__':
+    out = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'small.hiv')
+    f = open(out, 'wb')
+    f.write(build())
+    f.close()
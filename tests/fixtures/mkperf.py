@@ -0,0 +1,110 @@
+"""
+Writes tests/fixtures/perf1.bin and perf2.bin, the performance data used by
+tests/test_perf.py: two samples, one second apart, laid out the way
+RegQueryValueEx(HKEY_PERFORMANCE_DATA, "Global") returns them.
+
+Run it again (with Python 2) if the fixtures need to change. NAMES is what
+HKEY_PERFORMANCE_TEXT's Counter value would hold for them.
+"""
+import os, struct
+
+PERF_COUNTER_COUNTER = 0x10410400
+PERF_100NSEC_TIMER_INV = 0x21510500
+PERF_COUNTER_LARGE_RAWCOUNT = 0x00010100
+PERF_RAW_FRACTION = 0x20020400
+PERF_RAW_BASE = 0x40030403
+PERF_AVERAGE_TIMER = 0x30020400
+PERF_AVERAGE_BULK = 0x40020500
+PERF_AVERAGE_BASE = 0x40030402
+PERF_ELAPSED_TIME = 0x30240500
+PERF_NO_INSTANCES = -1
+
+FREQ = 10000000
+PERFTIME = 1000000000
+FILETIME = 130000000000000000 # 2012-12-14
+
+NAMES = [u'2', u'System', u'4', u'Memory', u'6', u'% Processor Time',
+    u'24', u'Available Bytes', u'36', u'Cache Faults/sec', u'148', u'Interrupts/sec',
+    u'238', u'Processor', u'674', u'System Up Time',
+    u'208', u'Avg. Disk sec/Transfer', u'209', u'Avg. Disk sec/Transfer Base',
+    u'216', u'Avg. Disk Bytes/Transfer', u'217', u'Avg. Disk Bytes/Transfer Base',
+    u'234', u'PhysicalDisk',
+    u'1406', u'% Committed Bytes In Use', u'1407', u'% Committed Bytes In Use Base']
+
+def pad(raw):
+    return raw + '\0' * (-len(raw) % 8)
+
+def text(name):
+    return (name + u'\0').encode('utf-16-le')
+
+def block(counters, values):
+    """Returns a PERF_COUNTER_BLOCK holding values."""
+    raw = ''
+    for (index, typ, size), value in zip(counters, values):
+        raw += struct.pack(size == 8 and '<Q' or '<I', value)
+    raw = pad(raw)
+    return struct.pack('<I4x', 8 + len(raw)) + raw
+
+def definitions(counters):
+    raw = ''
+    offset = 8
+    for index, typ, size in counters:
+        raw += struct.pack('<IIIIIiIIII', 40, index, 0, index + 1, 0, 0, 100, typ, size, offset)
+        offset += size
+    return raw
+
+def perfobject(index, counters, instances, perftime=0, perffreq=0):
+    """instances is a list of (name, values), or just a tuple of the values
+    for an object without instances."""
+    defs = definitions(counters)
+    body = ''
+    if isinstance(instances, list):
+        for name, values in instances:
+            name = text(name)
+            length = 24 + len(pad(name))
+            body += struct.pack('<IIIiII', length, 0, 0, -1, 24, len(name)) + pad(name)
+            body += block(counters, values)
+        ninstances = len(instances)
+    else:
+        body = block(counters, instances)
+        ninstances = PERF_NO_INSTANCES
+    header = struct.calcsize('<IIIIIIIIIiiIqq')
+    total = header + len(defs) + len(body)
+    return struct.pack('<IIIIIIIIIiiIqq', total, header + len(defs), header, index, 0,
+        index + 1, 0, 100, len(counters), 0, ninstances, 0, perftime, perffreq) + defs + body
+
+def sample(n):
+    """Returns sample n (0 or 1)."""
+    processor = [(6, PERF_100NSEC_TIMER_INV, 8), (148, PERF_COUNTER_COUNTER, 4)]
+    memory = [(24, PERF_COUNTER_LARGE_RAWCOUNT, 8), (36, PERF_COUNTER_COUNTER, 4),
+        (1406, PERF_RAW_FRACTION, 4), (1407, PERF_RAW_BASE, 4)]
+    system = [(674, PERF_ELAPSED_TIME, 8)]
+    disk = [(208, PERF_AVERAGE_TIMER, 4), (209, PERF_AVERAGE_BASE, 4),
+        (216, PERF_AVERAGE_BULK, 8), (217, PERF_AVERAGE_BASE, 4)]
+    # One second later: CPU 0 is idle 75% of it, CPU 1 50%
+    objects = [
+        perfobject(238, processor, [
+            (u'0', [50000000 + n * 7500000, 1000 + n * 600]),
+            (u'1', [40000000 + n * 5000000, 2000 + n * 400]),
+            (u'_Total', [45000000 + n * 6250000, 3000 + n * 1000]),
+        ]),
+        perfobject(4, memory, (2**32 + 5 - n * 4096, 500 + n * 250, 3 + n * 3, 4 + n * 4)),
+        perfobject(2, system, (FILETIME,), FILETIME + (3600 + n) * FREQ, FREQ),
+        # 50 transfers of 4096 bytes, taking 0.2 seconds in all
+        perfobject(234, disk, (5000000 + n * 2000000, 100 + n * 50,
+            409600 + n * 204800, 100 + n * 50)),
+    ]
+    name = text(u'TESTBOX')
+    header = 88 + len(pad(name))
+    body = ''.join(objects)
+    systime = struct.pack('<8H', 2012, 12, 5, 14, 12, 0, n, 0)
+    return struct.pack('<8sIIIIIIi16s4xqqqII', u'PERF'.encode('utf-16-le'), 1, 1, 1,
+        header + len(body), header, len(objects), 238, systime,
+        PERFTIME + n * FREQ, FREQ, FILETIME + n * FREQ, len(name), 88) + pad(name) + body
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    for n in range(2):
+        f = open(os.path.join(here, 'perf%i.bin' % (n + 1)), 'wb')
+        f.write(sample(n))
+        f.close()
@@ -25,7 +25,7 @@ print "Defined names:",list(after - before)
 print ""
 print "The roots:"
 import pyreg.roots
-for rt in vars(pyreg.roots):
+for rt in dir(pyreg.roots):
     if rt[:5] == 'HKEY_':
         print rt,getattr(pyreg.roots, rt)
 print ""
@@ -0,0 +1,81 @@
+"""
+Tests for pyreg.aio. They wait on the Futures directly, as a thread other
+than an event loop's would.
+"""
+import threading, time, unittest
+from pyreg import backend
+from pyreg.aio import AsyncKey, Executor
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+
+def drain(aiter):
+    items = []
+    while True:
+        try:
+            items.append(aiter.fetch().result(5))
+        except StopIteration:
+            return items
+
+class AsyncKeyTest(unittest.TestCase):
+    def setUp(self):
+        backend.setDefault(MemoryRegistry())
+        self.executor = Executor(workers=2, maxpending=4)
+        self.top = AsyncKey(HKEY_CURRENT_USER, self.executor, chunk=2) / 'aio'
+
+    def tearDown(self):
+        self.executor.shutdown()
+        backend.setDefault(None)
+
+    def test_values(self):
+        self.top.set('x', 1).result(5)
+        self.assertEqual(self.top.get('X').result(5), 1)
+        self.assertEqual((HKEY_CURRENT_USER / 'aio')['x'], 1)
+        self.top.delete('x').result(5)
+        self.assertRaises(KeyError, self.top.get('x').result, 5)
+
+    def test_iterators(self):
+        for n in range(5):
+            (HKEY_CURRENT_USER / 'aio' / ('k%i' % n)).create()
+            self.top.set('v%i' % n, n).result(5)
+        self.assertEqual(drain(self.top.keys()), [u'k%i' % n for n in range(5)])
+        self.assertEqual(dict(drain(self.top.values())), dict((u'v%i' % n, n) for n in range(5)))
+        self.assertEqual([w[0] for w in drain(self.top.walk())][:2], [u'', u'k0'])
+        self.assertEqual(drain((self.top / 'k0').keys()), [])
+
+    def test_callbacks(self):
+        self.top.set('x', 1).result(5)
+        got = []
+        done = threading.Event()
+        def callback(future):
+            got.append((threading.currentThread().name, future.result()))
+            done.set()
+        self.top.get('x').add_done_callback(callback)
+        self.assertTrue(done.wait(5))
+        self.assertEqual(got[0][1], 1)
+        self.assertTrue(got[0][0].startswith('pyreg.aio-'))
+        future = self.top.get('x')
+        future.result(5)
+        future.add_done_callback(callback)
+        self.assertEqual(got[1], (threading.currentThread().name, 1))
+
+    def test_bounded(self):
+        gate = threading.Event()
+        executor = Executor(workers=2, maxpending=3)
+        futures = [executor.submit(gate.wait) for n in range(5)]
+        self.assertEqual(len(executor._threads), 2)
+        # Submitting never waits, even with more than maxpending waiting
+        start = time.time()
+        more = executor.submit(time.time)
+        self.assertTrue(time.time() - start < 0.5)
+        ready = executor.ready()
+        self.assertFalse(ready.done())
+        gate.set()
+        self.assertEqual(ready.result(5), None)
+        self.assertTrue(more.result(5) >= start)
+        self.assertTrue(executor.ready().done())
+        executor.shutdown()
+        self.assertEqual(len(executor._threads), 2)
+        self.assertRaises(RuntimeError, executor.submit, time.time)
+
+if __name__ == '__main__':
+    unittest.main()
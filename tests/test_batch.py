@@ -0,0 +1,100 @@
+"""
+Tests for pyreg.batch.
+"""
+import unittest
+from pyreg import backend
+from pyreg.backend import RegistryError, ERROR_ACCESS_DENIED
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+from pyreg.types import DWORD
+
+class CountingRegistry(MemoryRegistry):
+    """Counts writes and flushes, and refuses to write values named 'bad'."""
+    def __init__(self):
+        MemoryRegistry.__init__(self)
+        self.calls = []
+
+    def SetValueEx(self, key, name, reserved, typ, value):
+        if name == u'bad':
+            raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+        self.calls.append(('set', name))
+        return MemoryRegistry.SetValueEx(self, key, name, reserved, typ, value)
+
+    def DeleteValue(self, key, name):
+        self.calls.append(('delete', name))
+        return MemoryRegistry.DeleteValue(self, key, name)
+
+    def FlushKey(self, key):
+        self.calls.append(('flush', None))
+        return MemoryRegistry.FlushKey(self, key)
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = CountingRegistry()
+        backend.setDefault(self.reg)
+        self.top = HKEY_CURRENT_USER / 'batch'
+        self.top['old'] = 1
+        self.top['keep'] = u'x'
+        del self.reg.calls[:]
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+    def test_coalesce(self):
+        with self.top.batch() as batch:
+            for n in range(10):
+                self.top['count'] = n
+            (self.top / 'sub')['name'] = u'spam'
+            del self.top['old']
+            self.top['Old'] = 2
+            del self.top['missing']
+            self.top.flush()
+            self.assertEqual(self.top['count'], 9)
+            self.assertEqual(type(self.top['count']), DWORD)
+            self.assertEqual(self.reg.calls, [])
+        self.assertEqual(batch.coalesced, 10)
+        self.assertEqual(batch.writes, 4)
+        self.assertEqual(self.reg.calls, [('set', u'count'), ('set', u'Old'),
+            ('delete', u'missing'), ('set', u'name'), ('flush', None), ('flush', None)])
+        self.assertEqual(self.top['count'], 9)
+        self.assertEqual(self.top['old'], 2)
+        self.assertEqual((self.top / 'sub')['name'], u'spam')
+
+    def test_scope(self):
+        other = HKEY_CURRENT_USER / 'batched'
+        with self.top.batch(flush=False):
+            del self.top['keep']
+            self.assertRaises(KeyError, self.top.values.__getitem__, 'keep')
+            other['v'] = 1
+            self.assertEqual(self.reg.calls, [('set', u'v')])
+        self.assertEqual(self.reg.calls, [('set', u'v'), ('delete', u'keep')])
+
+    def test_errors(self):
+        try:
+            with self.top.batch():
+                self.top['new'] = 1
+                self.assertRaises(TypeError, self.top.values.__setitem__, 'obj', object())
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self.reg.calls, [])
+        self.assertFalse('new' in self.top.values)
+
+    def test_rollback(self):
+        def fail(rollback):
+            with self.top.batch(rollback=rollback):
+                self.top['old'] = 5
+                del self.top['keep']
+                (self.top / 'new')['v'] = 1
+                (self.top / 'new')['bad'] = 1
+        self.assertRaises(RegistryError, fail, True)
+        self.assertEqual(self.top['old'], 1)
+        self.assertEqual(self.top['keep'], u'x')
+        self.assertFalse('new' in self.top)
+        self.assertFalse(('flush', None) in self.reg.calls)
+        self.assertRaises(RegistryError, fail, False)
+        self.assertEqual(self.top['old'], 5)
+        self.assertTrue('new' in self.top)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Tests for pyreg.changes.
+"""
+import unittest
+from StringIO import StringIO
+from pyreg import backend
+from pyreg.changes import ScanState, KEY_ADDED, KEY_REMOVED, KEY_MODIFIED, \
+    VALUE_ADDED, VALUE_REMOVED, VALUE_MODIFIED
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+
+class ScanStateTest(unittest.TestCase):
+    def setUp(self):
+        backend.setDefault(MemoryRegistry())
+        self.top = HKEY_CURRENT_USER / 'changes'
+        for i in range(5):
+            for j in range(4):
+                (self.top / ('k%i' % i) / ('s%i' % j))['v'] = i * j
+        self.state = ScanState()
+        self.first = self.state.rescan(self.top)
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+    def test_first(self):
+        self.assertEqual(len(self.state), 26)
+        self.assertEqual(len([c for c in self.first if c[0] == KEY_ADDED]), 26)
+        self.assertTrue((VALUE_ADDED, u'k1\\s2', u'v') in self.first)
+
+    def test_unchanged(self):
+        self.assertEqual(self.state.rescan(self.top), [])
+        self.assertEqual((self.state.visited, self.state.reread), (26, 0))
+
+    def test_changes(self):
+        (self.top / 'k1' / 's2')['v'] = 42
+        (self.top / 'k1' / 's2')['w'] = 1
+        del (self.top / 'k2' / 's0')['v']
+        del self.top.keys['k3\\s3']
+        (self.top / 'k4' / 'new').create()
+        changes = self.state.rescan(self.top)
+        self.assertEqual(sorted(changes), sorted([
+            (KEY_MODIFIED, u'k1\\s2', None),
+            (VALUE_MODIFIED, u'k1\\s2', u'v'),
+            (VALUE_ADDED, u'k1\\s2', u'w'),
+            (KEY_MODIFIED, u'k2\\s0', None),
+            (VALUE_REMOVED, u'k2\\s0', u'v'),
+            (KEY_MODIFIED, u'k3', None),
+            (KEY_REMOVED, u'k3\\s3', None),
+            (KEY_MODIFIED, u'k4', None),
+            (KEY_ADDED, u'k4\\new', None),
+            ]))
+        self.assertEqual(self.state.reread, 5)
+        self.assertEqual(self.state.rescan(self.top), [])
+
+    def test_removed_tree(self):
+        for j in range(4):
+            del self.top.keys['k0\\s%i' % j]
+        del self.top.keys['k0']
+        changes = self.state.rescan(self.top)
+        self.assertEqual([c[1] for c in changes if c[0] == KEY_REMOVED],
+            [u'k0'] + [u'k0\\s%i' % j for j in range(4)])
+
+    def test_save(self):
+        f = StringIO()
+        self.state.save(f)
+        (self.top / 'k0')['x'] = u'y'
+        state = ScanState.load(StringIO(f.getvalue()))
+        self.assertEqual(state.rescan(self.top),
+            [(KEY_MODIFIED, u'k0', None), (VALUE_ADDED, u'k0', u'x')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests for pyreg.diff.
+"""
+import os, unittest
+from pyreg import backend
+from pyreg.backend import REG_DWORD, REG_SZ
+from pyreg.diff import diff, Patch, KEY_ADDED, KEY_REMOVED, VALUE_ADDED, VALUE_REMOVED, VALUE_MODIFIED
+from pyreg.hive import Hive
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'small.hiv')
+
+class CountingRegistry(MemoryRegistry):
+    def __init__(self):
+        MemoryRegistry.__init__(self)
+        self.enumerated = 0
+
+    def EnumValue(self, key, index):
+        self.enumerated += 1
+        return MemoryRegistry.EnumValue(self, key, index)
+
+class DiffTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = CountingRegistry()
+        backend.setDefault(self.reg)
+        self.old = HKEY_CURRENT_USER / 'old'
+        self.new = HKEY_CURRENT_USER / 'new'
+        for top in (self.old, self.new):
+            top['v'] = 1
+            for i in range(3):
+                (top / ('k%i' % i) / 'sub')['s'] = u'x%i' % i
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+    def test_changes(self):
+        self.assertEqual(list(diff(self.old, self.new)), [])
+        self.new['v'] = u'1'
+        self.new['w'] = 2
+        del (self.new / 'k0' / 'sub')['s']
+        (self.new / 'k1' / 'added' / 'deeper')['d'] = 3
+        del self.new.keys['k2\\sub']
+        self.assertEqual(list(diff(self.old, self.new)), [
+            (VALUE_MODIFIED, u'', u'v', (REG_DWORD, 1), (REG_SZ, u'1')),
+            (VALUE_ADDED, u'', u'w', None, (REG_DWORD, 2)),
+            (VALUE_REMOVED, u'k0\\sub', u's', (REG_SZ, u'x0'), None),
+            (KEY_ADDED, u'k1\\added', None, None, None),
+            (KEY_ADDED, u'k1\\added\\deeper', None, None, None),
+            (VALUE_ADDED, u'k1\\added\\deeper', u'd', None, (REG_DWORD, 3)),
+            (KEY_REMOVED, u'k2\\sub', None, None, None),
+            ])
+
+    def test_patch(self):
+        self.new['v'] = 5
+        (self.new / 'k1' / 'added')['a'] = u'b'
+        del self.new.keys['k2\\sub']
+        del self.new.keys['k2']
+        patch = Patch(diff(self.old, self.new))
+        target = HKEY_CURRENT_USER / 'target'
+        Patch(diff(target.create(), self.old)).apply(target)
+        self.assertEqual(list(diff(target, self.old, trustMTimes=False)), [])
+        patch.apply(target)
+        self.assertEqual(list(diff(target, self.new, trustMTimes=False)), [])
+        # Removed keys can't be put back
+        patch.reversed().apply(target)
+        self.assertEqual([c[:2] for c in diff(target, self.old, trustMTimes=False)],
+            [(KEY_ADDED, u'k2'), (KEY_ADDED, u'k2\\sub'), (VALUE_ADDED, u'k2\\sub')])
+
+    def test_mtimes(self):
+        self.reg.enumerated = 0
+        self.assertEqual(list(diff(self.old, self.old)), [])
+        self.assertEqual(self.reg.enumerated, 0)
+        self.assertEqual(list(diff(self.old, self.old, trustMTimes=False)), [])
+        self.assertTrue(self.reg.enumerated > 0)
+
+    def test_hive(self):
+        hive = Hive(FIXTURE)
+        try:
+            self.assertEqual(list(diff(hive.root, hive.root)), [])
+            copy = (HKEY_CURRENT_USER / 'copy').create()
+            patch = Patch(diff(copy, hive.root))
+            self.assertTrue(len(patch) > 300)
+            patch.apply(copy)
+            self.assertEqual(list(diff(copy, hive.root, trustMTimes=False)), [])
+        finally:
+            hive.close()
+
+if __name__ == '__main__':
+    unittest.main()
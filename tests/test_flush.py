@@ -0,0 +1,85 @@
+"""
+Tests for pyreg.flush.
+"""
+import time, unittest
+from pyreg import backend, flush
+from pyreg.backend import RegistryError, ERROR_ACCESS_DENIED
+from pyreg.flush import FlushScheduler
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER, HKEY_LOCAL_MACHINE
+
+class FlushingRegistry(MemoryRegistry):
+    """Remembers what was flushed, and when."""
+    def __init__(self):
+        MemoryRegistry.__init__(self)
+        self.flushed = []
+        self.fail = False
+
+    def FlushKey(self, key):
+        self.flushed.append((key, time.time()))
+        if self.fail:
+            raise RegistryError(ERROR_ACCESS_DENIED, "Access is denied")
+        return MemoryRegistry.FlushKey(self, key)
+
+class FlushSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = FlushingRegistry()
+        backend.setDefault(self.reg)
+        self.scheduler = FlushScheduler(quiet=0.05, maxdelay=0.5)
+        self.key = HKEY_CURRENT_USER / 'flush' / 'a'
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+        flush.setScheduler(None)
+        backend.setDefault(None)
+
+    def test_coalesce(self):
+        for i in range(10):
+            self.scheduler.request(self.key)
+            self.scheduler.request(HKEY_CURRENT_USER / 'flush' / 'b')
+        self.scheduler.request(HKEY_LOCAL_MACHINE)
+        time.sleep(0.3)
+        self.assertEqual(sorted(k for k, t in self.reg.flushed),
+            sorted([HKEY_CURRENT_USER._root, HKEY_LOCAL_MACHINE._root]))
+        stats = self.scheduler.getStats()
+        self.assertEqual((stats['requests'], stats['flushes'], stats['coalesced'], stats['pending']),
+            (21, 2, 19, 0))
+
+    def test_maxdelay(self):
+        start = time.time()
+        while time.time() - start < 0.8:
+            self.scheduler.request(self.key)
+            time.sleep(0.01)
+        self.assertTrue(self.reg.flushed)
+        self.assertTrue(self.reg.flushed[0][1] - start < 0.7)
+
+    def test_wait(self):
+        self.scheduler.quiet = 60
+        flush.setScheduler(self.scheduler)
+        self.key['v'] = 1
+        self.key.flush(later=True)
+        self.assertEqual(self.reg.flushed, [])
+        start = time.time()
+        self.assertTrue(self.scheduler.wait_durable(self.key, 5))
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(len(self.reg.flushed), 1)
+        self.assertTrue(self.scheduler.waitDurable())
+
+    def test_error(self):
+        self.reg.fail = True
+        self.scheduler.request(self.key)
+        self.assertRaises(RegistryError, self.scheduler.waitDurable, self.key)
+        self.assertEqual(self.scheduler.getStats()['errors'], 1)
+        self.reg.fail = False
+        self.scheduler.request(self.key)
+        self.assertTrue(self.scheduler.waitDurable(self.key))
+
+    def test_shutdown(self):
+        self.scheduler.quiet = 60
+        self.scheduler.request(self.key)
+        self.scheduler.shutdown()
+        self.assertEqual(len(self.reg.flushed), 1)
+        self.assertRaises(RuntimeError, self.scheduler.request, self.key)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for pyreg.hive, using the hive in tests/fixtures (see mkhive.py there).
+"""
+import os, unittest
+from pyreg.hive import Hive
+from pyreg.types import Binary, DWORD, DWORD_BigEndian, ExpandingString, MultiString, String
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'small.hiv')
+
+class HiveTest(unittest.TestCase):
+    def setUp(self):
+        self.hive = Hive(FIXTURE)
+        self.root = self.hive.root
+
+    def tearDown(self):
+        self.hive.close()
+
+    def test_subkeys(self):
+        self.assertEqual(list(self.root.keys), [u'Software', u'System'])
+        self.assertEqual(len(self.root.keys), 2)
+        self.assertTrue('software' in self.root)
+        self.assertFalse('Hardware' in self.root)
+
+    def test_subkey_lists(self):
+        sw = self.root / 'Software'
+        self.assertEqual(list((sw / 'Hinted').keys), [u'Alpha', u'Be', u'Gamma'])
+        self.assertEqual(list((sw / 'Plain').keys), [u'One', u'Two'])
+        wide = sw / 'Wide'
+        names = list(wide.keys)
+        self.assertEqual(len(names), 300)
+        self.assertEqual(names[0], u'Item000')
+        self.assertEqual(names[-1], u'Item299')
+        self.assertTrue('ITEM150' in wide)
+        self.assertTrue('be' in sw / 'Hinted')
+
+    def test_nested_path(self):
+        k = self.root / 'Software\\Python/PythonCore'
+        self.assertEqual(list(k.keys), [u'2.7'])
+        self.assertEqual(k.getParent().myname, u'Python')
+
+    def test_values(self):
+        k = self.root / 'Software' / 'Python'
+        self.assertEqual(k[None], String(u'default value'))
+        self.assertEqual(k['version'], u'2.7')
+        self.assertEqual(k['Count'], DWORD(42))
+        self.assertEqual(k['Big'], DWORD(0x87654321))
+        self.assertTrue(isinstance(k['BE'], DWORD_BigEndian))
+        self.assertEqual(k['BE'], 0x12345678)
+        self.assertTrue(isinstance(k['Path'], ExpandingString))
+        self.assertEqual(k['List'], MultiString([u'a', u'bb', u'ccc']))
+        self.assertEqual(k['Blob'], Binary('\x12\x34\x56\x78\x90'))
+        self.assertEqual(k['Huge'], ''.join(chr(i % 251) for i in range(40000)))
+        self.assertEqual(k[u'\xfcN\xcfCODE'], u'\u2603')
+        self.assertRaises(KeyError, k.__getitem__, 'Missing')
+
+    def test_enum_values(self):
+        k = self.root / 'Software' / 'Python'
+        self.assertEqual(len(k.values), 11)
+        items = dict(k.values.iteritems())
+        self.assertEqual(items[u'Count'], 42)
+        self.assertEqual(list(k.values)[:3], [u'', u'Version', u'Count'])
+
+    def test_info(self):
+        self.assertEqual(self.hive.QueryInfoKey(self.root._handle), (2, 0, 130000000000000000))
+        self.assertEqual(len((self.root / 'System').values), 1)
+
+    def test_read_only(self):
+        k = self.root / 'Software'
+        self.assertRaises(EnvironmentError, k.__setitem__, 'x', 1)
+        self.assertRaises(EnvironmentError, (k / 'Nonexistent').create)
+        self.assertRaises(KeyError, (k / 'Nonexistent').__getitem__, 'x')
+
+if __name__ == '__main__':
+    unittest.main()
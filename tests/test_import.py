@@ -0,0 +1,46 @@
+"""
+Tests for importing pyreg lazily (see pyreg._lazy). Each test runs in a new
+interpreter, since this one has imported everything already.
+"""
+import os, subprocess, sys, unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+def run(code):
+    """Runs code in a new interpreter, returning what it prints."""
+    env = dict(os.environ, PYTHONPATH=SRC)
+    proc = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, env=env)
+    out, err = proc.communicate()
+    if proc.returncode:
+        raise AssertionError(err)
+    return out.strip()
+
+LOADED = "; print(','.join(sorted(m for m in sys.modules if m.startswith('pyreg') and sys.modules[m])))"
+
+class ImportTest(unittest.TestCase):
+    def test_nothing_imported(self):
+        self.assertEqual(run("import sys, pyreg" + LOADED), 'pyreg,pyreg._lazy')
+
+    def test_on_demand(self):
+        loaded = run("import sys, pyreg; pyreg.KEY_READ" + LOADED)
+        self.assertEqual(loaded, 'pyreg,pyreg._lazy,pyreg.backend')
+        loaded = run("import sys, pyreg; pyreg.HKEY_CURRENT_USER" + LOADED).split(',')
+        self.assertTrue('pyreg.roots' in loaded and 'pyreg.key' in loaded)
+        self.assertFalse('pyreg.hive' in loaded)
+        self.assertEqual(run("import pyreg; print(pyreg.memory.__name__)"), 'pyreg.memory')
+
+    def test_roots(self):
+        self.assertEqual(run("import pyreg.roots as r; print('HKEY_USERS' in vars(r))"), 'False')
+        self.assertEqual(run("import pyreg, pyreg.roots as r; "
+            "print(pyreg.HKEY_USERS is r.HKEY_USERS is r.HKEY_USERS)"), 'True')
+        self.assertEqual(run("import pyreg.roots as r; print(len([n for n in dir(r) if n.startswith('HKEY_')]))"), '9')
+        self.assertEqual(run("from pyreg.roots import HKEY_LOCAL_MACHINE as k; print(k.getPath(False))"),
+            'HKEY_LOCAL_MACHINE')
+
+    def test_star(self):
+        self.assertEqual(run("from pyreg import *; print(Key.__name__ + HKEY_CURRENT_USER.getPath())"), 'KeyHKCU')
+        self.assertRaises(AssertionError, run, "import pyreg; pyreg.Nothing")
+
+if __name__ == '__main__':
+    unittest.main()
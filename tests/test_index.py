@@ -0,0 +1,87 @@
+"""
+Tests for pyreg.index.
+"""
+import unittest
+from pyreg import backend, index
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+
+class CountingRegistry(MemoryRegistry):
+    """A MemoryRegistry that counts EnumKey() and QueryInfoKey() calls."""
+    def __init__(self):
+        MemoryRegistry.__init__(self)
+        self.enums = self.infos = 0
+
+    def EnumKey(self, key, index):
+        self.enums += 1
+        return MemoryRegistry.EnumKey(self, key, index)
+
+    def QueryInfoKey(self, key):
+        self.infos += 1
+        return MemoryRegistry.QueryInfoKey(self, key)
+
+NAMES = [u'.py', u'.PYC', u'.pyw', u'.txt', u'Applications', u'CLSID', u'clsidFile', u'Folder']
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = CountingRegistry()
+        backend.setDefault(self.reg)
+        self.key = HKEY_CURRENT_USER / 'Software' / 'Classes'
+        for name in NAMES:
+            (self.key / name).create()
+        self.index = index.NameIndex(self.key)
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+    def test_sorted(self):
+        self.assertEqual(list(self.index), sorted(NAMES, key=unicode.lower))
+        self.assertEqual(len(self.index), len(NAMES))
+
+    def test_queries(self):
+        self.assertEqual(list(self.index.prefix(u'.py')), [u'.py', u'.PYC', u'.pyw'])
+        self.assertEqual(list(self.index.prefix(u'CLS')), [u'CLSID', u'clsidFile'])
+        self.assertEqual(list(self.index.prefix(u'zzz')), [])
+        self.assertEqual(list(self.index.range(u'a', u'D')), [u'Applications', u'CLSID', u'clsidFile'])
+        self.assertEqual(list(self.index.range(stop=u'.q')), [u'.py', u'.PYC', u'.pyw'])
+        self.assertEqual(list(self.index.range(u'F')), [u'Folder'])
+        self.assertEqual(list(self.index.glob(u'.py?')), [u'.PYC', u'.pyw'])
+        self.assertEqual(list(self.index.glob(u'*id*')), [u'CLSID', u'clsidFile'])
+        self.assertTrue(u'clsid' in self.index)
+        self.assertFalse(u'clsi' in self.index)
+        self.assertEqual(self.index.members([u'Folder', u'missing', u'.pyc', u'.py', u'zzz']),
+            [u'Folder', u'.pyc', u'.py'])
+        self.assertEqual(self.index.members(n for n in [u'missing', u'Folder']), [u'Folder'])
+
+    def test_one_check(self):
+        list(self.index.prefix(u'.py'))
+        enums, infos = self.reg.enums, self.reg.infos
+        self.assertTrue(enums >= len(NAMES))
+        for n in range(5):
+            self.assertTrue(u'CLSID' in self.index)
+            self.index.members(NAMES)
+        self.assertEqual(self.reg.enums, enums)
+        self.assertEqual(self.reg.infos, infos + 10)
+        self.assertEqual(self.index.builds, 1)
+
+    def test_invalidated(self):
+        self.assertFalse(u'New' in self.index)
+        (self.key / 'New').create()
+        self.assertTrue(u'New' in self.index)
+        del self.key.keys['Folder']
+        self.assertFalse(u'Folder' in self.index)
+        self.assertEqual(self.index.builds, 3)
+
+    def test_shared(self):
+        self.assertTrue(index.getIndex(self.key) is index.getIndex(HKEY_CURRENT_USER / 'software' / 'classes'))
+        old = index.getMaxSize()
+        try:
+            index.setMaxSize(1)
+            first = index.getIndex(self.key)
+            index.getIndex(HKEY_CURRENT_USER)
+            self.assertFalse(index.getIndex(self.key) is first)
+        finally:
+            index.setMaxSize(old)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for pyreg.instrument.
+"""
+import unittest
+from pyreg import backend, instrument
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+
+class InstrumentTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = MemoryRegistry()
+        backend.setDefault(self.reg)
+        self.wrapped = instrument.enable()
+        self.key = HKEY_CURRENT_USER / 'Software' / 'Test'
+        self.key['dword'] = 7
+        (self.key / 'sub').create()
+
+    def tearDown(self):
+        instrument.disable()
+        backend.setDefault(None)
+
+    def test_backend(self):
+        self.assertTrue(backend.getDefault() is self.wrapped)
+        self.assertTrue(instrument.enable() is self.wrapped)
+        self.assertTrue(self.wrapped.backend is self.reg)
+        self.assertTrue(self.key._backend is self.wrapped)
+        instrument.disable()
+        self.assertTrue(backend.getDefault() is self.reg)
+
+    def test_apis(self):
+        with instrument.measure() as recorder:
+            self.assertEqual(self.key.values['dword'], 7)
+            self.assertEqual(self.key['dword'], 7)
+            self.assertEqual(len(self.key.values), 1)
+            self.assertTrue('sub' in self.key.keys)
+            self.assertFalse('missing' in self.key.keys)
+        stats = recorder.getStats()
+        get = stats['QueryValueEx']['key.Key.values.__getitem__']
+        self.assertEqual(get['count'], 1)
+        self.assertEqual(get['bytes'], len(u'dword') * 2 + 4)
+        self.assertEqual(get['paths'], {u'HKEY_CURRENT_USER\\Software\\Test': 1})
+        self.assertEqual(stats['QueryValueEx']['key.Key.__getitem__']['count'], 1)
+        self.assertEqual(stats['QueryInfoKey']['key.Key.values.__len__']['count'], 1)
+        contains = stats['OpenKey']['key.Key.keys.__contains__']
+        self.assertEqual((contains['count'], contains['errors']), (2, 1))
+        self.assertEqual(contains['buckets'][-1], (float('inf'), 2))
+        # Not recorded once it has stopped
+        self.key.values['dword']
+        self.assertEqual(recorder.getStats()['QueryValueEx']['key.Key.values.__getitem__']['count'], 1)
+
+    def test_nested(self):
+        outer = instrument.measure()
+        with outer:
+            self.key['dword'] = 8
+            with instrument.measure() as inner:
+                self.key.values.keys()
+        self.assertFalse(outer.isRecording())
+        self.assertEqual(inner.getStats().keys(), ['EnumValue'])
+        self.assertEqual(sorted(outer.getStats()), ['EnumValue', 'SetValueEx'])
+        enum = outer.getStats()['EnumValue']['key.Key.values.keys']
+        self.assertEqual((enum['count'], enum['errors']), (2, 1))
+        outer.reset()
+        self.assertEqual(outer.getStats(), {})
+
+    def test_paths(self):
+        with instrument.measure(maxpaths=2) as recorder:
+            for i in range(4):
+                (self.key / ('k%i' % i))['v'] = i
+        paths = recorder.getStats()['SetValueEx']['key.Key.__setitem__']['paths']
+        self.assertEqual(paths, {u'HKEY_CURRENT_USER\\Software\\Test\\k0': 1,
+            u'HKEY_CURRENT_USER\\Software\\Test\\k1': 1, u'(other)': 2})
+
+    def test_prometheus(self):
+        with instrument.measure() as recorder:
+            self.key.values['dword']
+        text = recorder.toPrometheus()
+        labels = 'op="QueryValueEx",api="key.Key.values.__getitem__"'
+        self.assertTrue('# TYPE pyreg_calls_total counter\n' in text)
+        self.assertTrue('pyreg_calls_total{%s} 1\n' % labels in text)
+        self.assertTrue('pyreg_call_seconds_bucket{%s,le="+Inf"} 1\n' % labels in text)
+        self.assertTrue('pyreg_call_seconds_count{%s} 1\n' % labels in text)
+        self.assertTrue('pyreg_path_calls_total{%s,path="HKEY_CURRENT_USER\\\\Software\\\\Test"} 1\n'
+            % labels in text)
+        for line in text.splitlines():
+            self.assertTrue(line.startswith('# ') or line.startswith('pyreg_'), line)
+
+if __name__ == '__main__':
+    unittest.main()
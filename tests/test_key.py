@@ -0,0 +1,288 @@
+"""
+Tests for pyreg.key, against a pyreg.memory.MemoryRegistry.
+"""
+import gc, unittest, weakref
+from pyreg import backend
+from pyreg import key as _key
+from pyreg.cache import getCache
+from pyreg.keypath import canonical, fold
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+from pyreg.types import DWORD, String
+
+class KeyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.reg = MemoryRegistry()
+        backend.setDefault(self.reg)
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+class SnapshotTest(KeyTestCase):
+    def test_snapshot(self):
+        k = HKEY_CURRENT_USER / 'snap'
+        k['One'] = 1
+        k['two'] = u'2'
+        k[None] = u'default'
+        snap = k.snapshot()
+        self.assertEqual(len(snap), 3)
+        self.assertEqual(snap.keys(), [u'One', u'two', u''])
+        self.assertEqual(snap['ONE'], DWORD(1))
+        self.assertTrue(isinstance(snap['Two'], String))
+        self.assertEqual(snap[None], u'default')
+        self.assertTrue('one' in snap)
+        self.assertFalse('three' in snap)
+        self.assertEqual(snap.mtime, self.reg.QueryInfoKey(k._reader())[2])
+        self.assertRaises(TypeError, snap.__setitem__, 'x', 1)
+        k['One'] = 2
+        self.assertEqual(snap['One'], 1)
+        self.assertEqual(k.values.copy(), dict(k.snapshot().iteritems()))
+
+    def test_empty(self):
+        self.assertEqual(len((HKEY_CURRENT_USER / 'empty').create().snapshot()), 0)
+
+class WalkTest(KeyTestCase):
+    def setUp(self):
+        KeyTestCase.setUp(self)
+        self.top = HKEY_CURRENT_USER / 'walk'
+        for path in ('a\\x', 'a\\y\\deep', 'b'):
+            (self.top / path).create()
+        (self.top / 'a')['v'] = 1
+        self.top['w'] = u'top'
+
+    def paths(self, **kwargs):
+        return [path for path, subkeys, values in self.top.walk(**kwargs)]
+
+    def test_topdown(self):
+        walked = list(self.top.walk())
+        self.assertEqual([w[0] for w in walked],
+            [u'', u'a', u'a\\x', u'a\\y', u'a\\y\\deep', u'b'])
+        self.assertEqual(walked[0][1], [u'a', u'b'])
+        self.assertEqual(dict(walked[0][2]), {u'w': u'top'})
+        self.assertEqual(walked[1][2]['V'], 1)
+
+    def test_bottomup(self):
+        self.assertEqual(self.paths(topdown=False),
+            [u'a\\x', u'a\\y\\deep', u'a\\y', u'a', u'b', u''])
+
+    def test_limits(self):
+        self.assertEqual(self.paths(maxdepth=1), [u'', u'a', u'b'])
+        self.assertEqual(self.paths(prune=lambda p: p == u'a\\y'),
+            [u'', u'a', u'a\\x', u'b'])
+        walked = []
+        for path, subkeys, values in self.top.walk():
+            walked.append(path)
+            if path == u'a':
+                subkeys.remove(u'x')
+        self.assertEqual(walked, [u'', u'a', u'a\\y', u'a\\y\\deep', u'b'])
+
+    def test_errors(self):
+        errors = []
+        missing = HKEY_CURRENT_USER / 'nowhere'
+        self.assertEqual(list(missing.walk(onerror=errors.append)), [])
+        self.assertEqual(len(errors), 1)
+        self.assertFalse('nowhere' in HKEY_CURRENT_USER)
+
+class OpeningRegistry(MemoryRegistry):
+    """Keeps the handles OpenKey() returns, to see which are still open."""
+    def __init__(self):
+        MemoryRegistry.__init__(self)
+        self.opened = []
+        self.most = 0
+
+    def OpenKey(self, key, sub_key, res=0, sam=None):
+        handle = MemoryRegistry.OpenKey(self, key, sub_key, res, sam)
+        self.opened.append(handle)
+        self.most = max(self.most, self.open())
+        return handle
+
+    def open(self, *keys):
+        pooled = [k._reader() for k in keys]
+        return len([h for h in self.opened if not h.closed and h not in pooled])
+
+class WalkHandleTest(unittest.TestCase):
+    """Walking a tree closes each key once its subkeys have been opened."""
+    def setUp(self):
+        self.reg = OpeningRegistry()
+        backend.setDefault(self.reg)
+        self.top = HKEY_CURRENT_USER / 'tree'
+        paths = [u'']
+        for depth in range(3):
+            paths = [p + u'\\k%i' % n for p in paths for n in range(4)]
+        for path in paths:
+            (self.top / path[1:])['x'] = 1
+        self.other = HKEY_CURRENT_USER / 'other'
+        (self.other / 'k0' / 'k1' / 'new' / 'deeper').create()
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+    def open(self):
+        return self.reg.open(self.top, self.other)
+
+    def check(self, walked, count):
+        self.assertEqual(len(walked), count)
+        self.assertEqual(self.open(), 0)
+        # The pool's handles, and a few on the way down
+        self.assertTrue(self.reg.most <= 2 + 3 * 2, self.reg.most)
+
+    def test_walk(self):
+        self.check(list(self.top.walk()), 85)
+        self.check(list(self.top.walk(topdown=False)), 85)
+        walk = self.top.walk()
+        for n in range(10):
+            next(walk)
+        self.assertTrue(self.open() > 0)
+        walk.close()
+        self.assertEqual(self.open(), 0)
+
+    def test_others(self):
+        from pyreg.changes import ScanState
+        from pyreg.diff import diff
+        from pyreg.regfile import exportLines
+        self.check(ScanState().rescan(self.top), 85 + 64)
+        self.check([l for l in exportLines(self.top) if l.startswith(u'[')], 85)
+        self.check(list(diff(self.top, self.other)), 12)
+
+class ValueCacheTest(KeyTestCase):
+    def setUp(self):
+        KeyTestCase.setUp(self)
+        self.cache = getCache()
+        self.cache.enable(ttl=3600, maxsize=4)
+        self.cache.resetStats()
+
+    def tearDown(self):
+        self.cache.disable()
+        KeyTestCase.tearDown(self)
+
+    def test_hits(self):
+        k = HKEY_CURRENT_USER / 'cached'
+        k['x'] = 1
+        for i in range(10):
+            self.assertEqual(k['x'], 1)
+        stats = self.cache.getStats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['checks']), (9, 1, 1))
+        self.assertRaises(KeyError, k.__getitem__, 'missing')
+
+    def test_writes_invalidate(self):
+        k = HKEY_CURRENT_USER / 'cached'
+        k['x'] = 1
+        self.assertEqual(k['x'], 1)
+        (HKEY_CURRENT_USER / 'CACHED')['X'] = 2
+        self.assertEqual(k['x'], 2)
+        del k['x']
+        self.assertRaises(KeyError, k.__getitem__, 'x')
+
+    def test_outside_writes(self):
+        k = HKEY_CURRENT_USER / 'cached'
+        k['x'] = 1
+        self.cache.ttl = 0
+        self.assertEqual(k['x'], 1)
+        self.reg.SetValueEx(k._writer(), 'x', 0, 4, 2)
+        self.assertEqual(k['x'], 2)
+
+    def test_eviction(self):
+        k = HKEY_CURRENT_USER / 'cached'
+        for i in range(10):
+            k[str(i)] = i
+            self.assertEqual(k[str(i)], i)
+        stats = self.cache.getStats()
+        self.assertEqual((stats['size'], stats['evictions']), (4, 6))
+
+    def test_checks_bounded(self):
+        for i in range(50):
+            k = HKEY_CURRENT_USER / 'scan' / str(i)
+            k['x'] = i
+            self.assertEqual(k['x'], i)
+        self.assertEqual(len(self.cache._values), 4)
+        self.assertEqual(len(self.cache._checked), 4)
+        self.assertEqual((HKEY_CURRENT_USER / 'scan' / '0')['x'], 0)
+
+class PathTest(KeyTestCase):
+    def test_keypath(self):
+        p = canonical('Software/Spam')
+        self.assertEqual(type(p), unicode)
+        self.assertEqual(p, u'Software\\Spam')
+        self.assertTrue(canonical('Software/Spam') is p)
+        self.assertTrue(canonical(p) is p)
+        self.assertNotEqual(p, u'SOFTWARE\\spam')
+        self.assertEqual(fold(p), u'software\\spam')
+        self.assertTrue(fold(u'SOFTWARE/spam') is fold(p))
+        # Names and paths are plain strings, that hash as they compare
+        k = HKEY_CURRENT_USER / 'Software'
+        self.assertEqual(type(k.myname), unicode)
+        self.assertEqual(type((HKEY_CURRENT_USER / 'Software/Spam').myname), unicode)
+        self.assertTrue(k.myname in {u'Software': 1})
+        self.assertEqual(len(set([k.myname, u'Software'])), 1)
+
+    def test_resolution(self):
+        k = HKEY_CURRENT_USER / 'Software' / 'Spam'
+        self.assertTrue(HKEY_CURRENT_USER / 'Software' / 'Spam' is k)
+        self.assertTrue(HKEY_CURRENT_USER.keys['Software'].keys['Spam'] is k)
+        # The same key, however it is reached or spelled
+        self.assertTrue(HKEY_CURRENT_USER / 'Software/Spam' is k)
+        self.assertTrue(HKEY_CURRENT_USER / 'software' / 'SPAM' is k)
+        self.assertTrue(_key.Key(HKEY_CURRENT_USER, 'Software') / 'Spam' is k)
+        self.assertEqual(str(k), 'HKCU\\Software\\Spam')
+        self.assertTrue(k.getPath() is k.getPath())
+        self.assertEqual(k.getPath(False), u'HKEY_CURRENT_USER\\Software\\Spam')
+        self.assertTrue(k in k.parent)
+        # Keys don't outlive a change of backend
+        backend.setDefault(MemoryRegistry())
+        self.assertFalse(HKEY_CURRENT_USER / 'Software' / 'Spam' is k)
+
+    def test_bounded(self):
+        size = _key._maxChildren
+        _key._maxChildren = 10
+        try:
+            made = [HKEY_CURRENT_USER / str(i) for i in range(25)]
+            self.assertTrue(len(_key._children) <= 10)
+            # The most recently used are kept
+            self.assertTrue(HKEY_CURRENT_USER / '24' is made[24])
+            self.assertFalse(HKEY_CURRENT_USER / '0' is made[0])
+        finally:
+            _key._maxChildren = size
+
+class ClosingRegistry(MemoryRegistry):
+    def __init__(self):
+        MemoryRegistry.__init__(self)
+        self.closed = []
+
+    def CloseKey(self, key):
+        self.closed.append(key)
+        return MemoryRegistry.CloseKey(self, key)
+
+class CompactKeyTest(KeyTestCase):
+    def test_no_cycles(self):
+        k = HKEY_CURRENT_USER / 'compact' / 'a'
+        k['x'] = 1
+        self.assertFalse(hasattr(k, '__dict__'))
+        self.assertEqual(k.values['x'], 1)
+        self.assertEqual(list(k.parent.keys), [u'a'])
+        ref = weakref.ref(k)
+        _key._children.clear()
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            del k
+            # Freed by its reference count alone, without the collector
+            self.assertTrue(ref() is None)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def test_fixed_handles_closed(self):
+        self.reg = ClosingRegistry()
+        backend.setDefault(self.reg)
+        (HKEY_CURRENT_USER / 'fixed').create()
+        k = HKEY_CURRENT_USER.openKey('fixed')
+        handle = k._handle
+        del k
+        self.assertEqual(self.reg.closed, [handle])
+        k = HKEY_CURRENT_USER.openKey('fixed')
+        k.close()
+        del k
+        self.assertEqual(len(self.reg.closed), 2)
+
+if __name__ == '__main__':
+    unittest.main()
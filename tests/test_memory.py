@@ -0,0 +1,97 @@
+"""
+Tests for pyreg.memory, run through Key the way everything else uses it.
+"""
+import unittest
+from pyreg import backend
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER, HKEY_LOCAL_MACHINE
+from pyreg.types import Binary, DWORD, DWORD_BigEndian, ExpandingString, Link, MultiString, String, rNone
+
+class MemoryRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = MemoryRegistry()
+        backend.setDefault(self.reg)
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+    def test_roots_are_separate(self):
+        (HKEY_CURRENT_USER / 'Software').create()
+        self.assertEqual(list(HKEY_CURRENT_USER.keys), [u'Software'])
+        self.assertEqual(list(HKEY_LOCAL_MACHINE.keys), [])
+
+    def test_types_round_trip(self):
+        k = HKEY_CURRENT_USER / 'test'
+        values = {
+            'bin': Binary('\x12\x34\x56\x78\x90'),
+            'dword': DWORD(0x87654321),
+            'bdword': DWORD_BigEndian(0x87654321),
+            'estr': ExpandingString(u'You are %USER%'),
+            'link': Link(u'some link?'),
+            'mstr': MultiString([u'a', u'b']),
+            'none': rNone('\xde\xad\xbe\xef'),
+            'str': String(u'plain'),
+        }
+        for name, value in values.items():
+            k[name] = value
+        for name, value in values.items():
+            self.assertEqual(k[name], value)
+            self.assertTrue(isinstance(k[name], type(value)), name)
+        self.assertEqual(len(k.values), len(values))
+
+    def test_case_insensitive(self):
+        k = HKEY_CURRENT_USER / 'Software' / 'Python'
+        k['Version'] = u'2.7'
+        self.assertTrue('software\\PYTHON' in HKEY_CURRENT_USER)
+        self.assertEqual((HKEY_CURRENT_USER / 'SOFTWARE\\python')['version'], u'2.7')
+        k['VERSION'] = u'2.6'
+        self.assertEqual(list(k.values), [u'Version'])
+
+    def test_enum_order(self):
+        k = HKEY_CURRENT_USER / 'order'
+        for name in ['b', 'C', 'a']:
+            (k / name).create()
+            k[name] = 1
+        self.assertEqual(list(k.keys), [u'a', u'b', u'C'])
+        self.assertEqual(list(k.values), [u'b', u'C', u'a'])
+
+    def test_mtime(self):
+        k = (HKEY_CURRENT_USER / 'times').create()
+        before = k.getMTime()
+        k['x'] = 1
+        self.assertTrue(k.getMTime() > before)
+        parent = HKEY_CURRENT_USER.getMTime()
+        (k / 'child').create()
+        self.assertTrue(k.getMTime() > before)
+        self.assertEqual(HKEY_CURRENT_USER.getMTime(), parent)
+
+    def test_delete(self):
+        k = (HKEY_CURRENT_USER / 'gone').create()
+        (k / 'child').create()
+        self.assertRaises(EnvironmentError, HKEY_CURRENT_USER.keys.__delitem__, 'gone')
+        del k.keys['child']
+        del HKEY_CURRENT_USER.keys['gone']
+        self.assertFalse('gone' in HKEY_CURRENT_USER)
+        k['x'] = 1
+        self.assertTrue('gone' in HKEY_CURRENT_USER)
+        self.assertEqual(list(k.keys), [])
+
+    def test_lazy(self):
+        k = HKEY_CURRENT_USER / 'a' / 'b\\c'
+        self.assertEqual(k.getPath(), u'HKCU\\a\\b\\c')
+        self.assertEqual(k.getParent().getPath(), u'HKCU\\a\\b')
+        self.assertFalse('a' in HKEY_CURRENT_USER)
+        self.assertRaises(KeyError, k.__getitem__, 'x')
+        self.assertFalse('a' in HKEY_CURRENT_USER)
+        k['x'] = 1
+        self.assertTrue('a\\b\\c' in HKEY_CURRENT_USER)
+        self.assertEqual(k['x'], 1)
+
+    def test_access(self):
+        (HKEY_CURRENT_USER / 'ro').create()
+        ro = HKEY_CURRENT_USER.openKey('ro')
+        self.assertRaises(EnvironmentError, ro.values.__setitem__, 'x', 1)
+        self.assertRaises(EnvironmentError, HKEY_CURRENT_USER.openKey, 'missing')
+
+if __name__ == '__main__':
+    unittest.main()
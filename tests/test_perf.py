@@ -0,0 +1,102 @@
+"""
+Tests for pyreg.perf.
+"""
+import os, unittest
+from pyreg import backend, perf
+from pyreg.backend import REG_BINARY, HKEY_PERFORMANCE_DATA
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_PERFORMANCE_TEXT
+from pyreg.types import MultiString
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+NAMES = [u'2', u'System', u'4', u'Memory', u'6', u'% Processor Time',
+    u'24', u'Available Bytes', u'36', u'Cache Faults/sec', u'148', u'Interrupts/sec',
+    u'238', u'Processor', u'674', u'System Up Time',
+    u'208', u'Avg. Disk sec/Transfer', u'209', u'Avg. Disk sec/Transfer Base',
+    u'216', u'Avg. Disk Bytes/Transfer', u'217', u'Avg. Disk Bytes/Transfer Base',
+    u'234', u'PhysicalDisk',
+    u'1406', u'% Committed Bytes In Use', u'1407', u'% Committed Bytes In Use Base']
+
+def fixture(n):
+    f = open(os.path.join(FIXTURES, 'perf%i.bin' % n), 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+class PerfTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = MemoryRegistry()
+        backend.setDefault(self.reg)
+        perf.resetCounterNames()
+        HKEY_PERFORMANCE_TEXT['Counter'] = MultiString(NAMES)
+
+    def tearDown(self):
+        backend.setDefault(None)
+        perf.resetCounterNames()
+
+    def record(self, n):
+        self.reg.SetValueEx(HKEY_PERFORMANCE_DATA, u'Global', 0, REG_BINARY, fixture(n))
+
+    def test_parse(self):
+        self.record(1)
+        data = perf.read()
+        self.assertEqual(data.systemName, u'TESTBOX')
+        self.assertEqual(data.perfFreq, 10000000)
+        self.assertEqual(data.systemTime[:3], (2012, 12, 5))
+        self.assertEqual([o.name for o in data.objects], [u'Processor', u'Memory', u'System', u'PhysicalDisk'])
+        processor = data[u'Processor']
+        self.assertTrue(data[238] is processor)
+        self.assertEqual([i.name for i in processor.instances], [u'0', u'1', u'_Total'])
+        self.assertEqual([c.name for c in processor.counters], [u'% Processor Time', u'Interrupts/sec'])
+        self.assertEqual(processor.instance(u'1')[u'Interrupts/sec'], 2000)
+        self.assertEqual(processor.instance(u'0')[6], 50000000)
+        self.assertRaises(KeyError, processor.instance, u'2')
+        memory = data[u'Memory']
+        self.assertEqual(memory.instance().values(), {
+            u'Available Bytes': 2**32 + 5,
+            u'Cache Faults/sec': 500,
+            u'% Committed Bytes In Use': 3,
+            u'% Committed Bytes In Use Base': 4,
+            })
+        fraction = memory.counter(u'% Committed Bytes In Use')
+        self.assertTrue(fraction.base is memory.counter(1407))
+        self.assertTrue(fraction.base.isBase())
+        self.assertRaises(ValueError, perf.PerfData, 'x' * 100)
+
+    def test_names(self):
+        self.assertEqual(perf.getCounterNames()[238], u'Processor')
+        HKEY_PERFORMANCE_TEXT['Counter'] = MultiString([u'238', u'Changed'])
+        # Read once, and remembered
+        self.assertEqual(perf.getCounterNames()[238], u'Processor')
+        perf.resetCounterNames()
+        self.assertEqual(perf.getCounterNames(), {238: u'Changed'})
+        # Without names, there are just the indexes
+        data = perf.PerfData(fixture(1))
+        self.assertEqual([o.name for o in data.objects], [238, 4, 2, 234])
+
+    def test_sampler(self):
+        sampler = perf.Sampler()
+        self.record(1)
+        first = sampler.sample()
+        # Rates and averages need two samples
+        self.assertEqual(first, {
+            (u'Memory', None, u'Available Bytes'): 2**32 + 5,
+            (u'Memory', None, u'% Committed Bytes In Use'): 75.0,
+            (u'System', None, u'System Up Time'): 3600.0,
+            })
+        self.record(2)
+        second = sampler.sample()
+        self.assertEqual(second[u'Processor', u'0', u'% Processor Time'], 25.0)
+        self.assertEqual(second[u'Processor', u'1', u'% Processor Time'], 50.0)
+        self.assertEqual(second[u'Processor', u'_Total', u'% Processor Time'], 37.5)
+        self.assertEqual(second[u'Processor', u'_Total', u'Interrupts/sec'], 1000.0)
+        self.assertEqual(second[u'Memory', None, u'Cache Faults/sec'], 250.0)
+        self.assertEqual(second[u'Memory', None, u'Available Bytes'], 2**32 + 5 - 4096)
+        self.assertEqual(second[u'System', None, u'System Up Time'], 3601.0)
+        self.assertAlmostEqual(second[u'PhysicalDisk', None, u'Avg. Disk sec/Transfer'], 0.004)
+        self.assertEqual(second[u'PhysicalDisk', None, u'Avg. Disk Bytes/Transfer'], 4096.0)
+        self.assertEqual(len(second), 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for pyreg.pool.
+"""
+import unittest
+from pyreg import backend
+from pyreg.backend import HKEY_CURRENT_USER as HKCU
+from pyreg.memory import MemoryRegistry
+from pyreg.pool import getPool
+from pyreg.roots import HKEY_CURRENT_USER
+
+class HandlePoolTest(unittest.TestCase):
+    def setUp(self):
+        self.reg = MemoryRegistry()
+        backend.setDefault(self.reg)
+        self.pool = getPool()
+        self.pool.clear()
+        self.pool.resetStats()
+        self.maxsize = self.pool.getMaxSize()
+
+    def tearDown(self):
+        self.pool.setMaxSize(self.maxsize)
+        self.pool.clear()
+        backend.setDefault(None)
+
+    def test_shared(self):
+        (HKEY_CURRENT_USER / 'a' / 'b')['x'] = 1
+        self.assertEqual((HKEY_CURRENT_USER / 'A\\B')['x'], 1)
+        self.assertEqual(HKEY_CURRENT_USER / 'a' / 'b' | 'x', 1)
+        stats = self.pool.getStats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['size'], 1)
+
+    def test_eviction(self):
+        self.pool.setMaxSize(3)
+        for i in range(10):
+            (HKEY_CURRENT_USER / str(i))['x'] = i
+        stats = self.pool.getStats()
+        self.assertEqual(stats['size'], 3)
+        self.assertEqual(stats['evictions'], 7)
+        self.assertEqual((HKEY_CURRENT_USER / '0')['x'], 0)
+
+    def test_iteration_survives_eviction(self):
+        for i in range(5):
+            (HKEY_CURRENT_USER / 'wide' / str(i)).create()
+        self.pool.setMaxSize(1)
+        names = []
+        for name in (HKEY_CURRENT_USER / 'wide').keys:
+            names.append(name)
+            (HKEY_CURRENT_USER / 'elsewhere' / name)['x'] = 1
+        self.assertEqual(names, ['0', '1', '2', '3', '4'])
+
+    def test_close(self):
+        with HKEY_CURRENT_USER / 'c' as k:
+            k['x'] = 1
+            self.assertEqual(self.pool.getStats()['size'], 1)
+        self.assertEqual(self.pool.getStats()['size'], 0)
+        ro = HKEY_CURRENT_USER.openKey('c')
+        ro.close()
+        self.assertEqual(ro['x'], 1)
+
+    def test_deleted_behind_back(self):
+        cfg = HKEY_CURRENT_USER / 'svc' / 'cfg'
+        cfg['x'] = 1
+        cfg['y'] = 2
+        self.assertEqual(cfg['x'], 1)
+        # Deleted and made again without going through pyreg
+        handle = self.reg.CreateKey(HKCU, u'svc')
+        self.reg.DeleteKey(handle, u'cfg')
+        self.reg.SetValueEx(self.reg.CreateKey(handle, u'cfg'), u'x', 0, 4, 7)
+        self.assertEqual(self.pool.getStats()['size'], 1)
+        self.assertEqual((HKEY_CURRENT_USER / 'svc' / 'cfg')['x'], 7)
+        self.assertEqual(self.pool.getStats()['stale'], 1)
+        self.assertEqual(list(cfg.values), [u'x'])
+        self.assertFalse('y' in cfg.values)
+        self.reg.DeleteKey(handle, u'cfg')
+        self.reg.CreateKey(handle, u'cfg')
+        cfg['z'] = 3
+        self.assertEqual(dict(cfg.snapshot()), {u'z': 3})
+        self.assertEqual(len(cfg.values), 1)
+        self.reg.DeleteKey(handle, u'cfg')
+        self.assertRaises(KeyError, lambda: cfg['z'])
+        self.assertRaises(EnvironmentError, list, cfg.keys)
+        self.reg.CreateKey(handle, u'cfg')
+        self.assertEqual([p for p, k, v in cfg.walk()], [u''])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+"""
+Tests for pyreg.regfile.
+"""
+import codecs, unittest
+from StringIO import StringIO
+from pyreg import backend
+from pyreg.backend import REG_BINARY, REG_NONE
+from pyreg.memory import MemoryRegistry
+from pyreg.regfile import exportLines, exportReg, importReg, parseReg, \
+    KEY, DELETE_KEY, VALUE, DELETE_VALUE
+from pyreg.roots import HKEY_CURRENT_USER
+from pyreg.types import Binary, DWORD, DWORD_BigEndian, ExpandingString, Link, MultiString, \
+    QWORD, ResourceList, String, rNone
+
+VALUES = {
+    u'': String(u'default'),
+    u'string': String(u'quotes " and \\ backslashes \u2603'),
+    u'lines': String(u'two\r\nlines'),
+    u'expand': ExpandingString(u'%PATH%;C:\\bin'),
+    u'binary': Binary(''.join(map(chr, range(256)))),
+    u'empty': Binary(''),
+    u'dword': DWORD(0xDEADBEEF),
+    u'big endian': DWORD_BigEndian(42),
+    u'qword': QWORD(2**40 + 7),
+    u'multi': MultiString([u'a', u'b c', u'\u00e9']),
+    u'no multi': MultiString([]),
+    u'link': Link(u'\\Registry\\Machine'),
+    u'resources': ResourceList('\1\2\3'),
+    u'none': rNone('\xff'),
+    u'name with "quotes"': DWORD(1),
+    }
+
+class RegFileTest(unittest.TestCase):
+    def setUp(self):
+        backend.setDefault(MemoryRegistry())
+        self.top = HKEY_CURRENT_USER / 'Software' / 'Export'
+        for name, value in VALUES.iteritems():
+            self.top[name] = value
+        for i in range(3):
+            (self.top / ('k%i' % i) / 'deeper')['n'] = i
+        (self.top / 'empty key').create()
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+    def exported(self):
+        f = StringIO()
+        exportReg(self.top, f)
+        return f.getvalue()
+
+    def test_format(self):
+        lines = list(exportLines(self.top))
+        self.assertEqual(lines[:3], [u'Windows Registry Editor Version 5.00', u'',
+            u'[HKEY_CURRENT_USER\\Software\\Export]'])
+        self.assertTrue(u'@="default"' in lines)
+        self.assertTrue(u'"string"="quotes \\" and \\\\ backslashes \u2603"' in lines)
+        self.assertTrue(u'"dword"=dword:deadbeef' in lines)
+        self.assertTrue(u'"big endian"=hex(5):00,00,00,2a' in lines)
+        self.assertTrue(u'"qword"=hex(b):07,00,00,00,00,01,00,00' in lines)
+        self.assertTrue(u'"empty"=hex:' in lines)
+        self.assertTrue(u'"multi"=hex(7):61,00,00,00,62,00,20,00,63,00,00,00,e9,00,00,00,00,00' in lines)
+        for line in u'\r\n'.join(lines).split(u'\r\n'):
+            self.assertTrue(len(line) <= 80, line)
+        data = self.exported()
+        self.assertTrue(data.startswith(codecs.BOM_UTF16_LE))
+        self.assertTrue(data.decode('utf-16').endswith(u'"n"=dword:00000002\r\n\r\n'))
+
+    def test_round_trip(self):
+        data = self.exported()
+        before = dict((name, self.top[name]) for name in VALUES)
+        backend.setDefault(MemoryRegistry())
+        self.assertEqual(importReg(StringIO(data)), (8, 18))
+        self.assertEqual(self.exported(), data)
+        for name, value in before.iteritems():
+            self.assertEqual(type(self.top[name]), type(value), name)
+            self.assertEqual(self.top[name], value, name)
+        self.assertEqual((self.top / 'k2' / 'deeper')['n'], 2)
+        self.assertTrue('empty key' in self.top)
+
+    def test_batches(self):
+        data = self.exported()
+        backend.setDefault(MemoryRegistry())
+        importReg(StringIO(data), batchsize=2)
+        self.assertEqual(self.exported(), data)
+
+    def test_parse(self):
+        text = u'\r\n'.join([
+            u'REGEDIT4',
+            u'',
+            u'; A comment',
+            u'[-HKEY_CURRENT_USER\\Software\\Gone]',
+            u'[HKCU\\Software\\Here]',
+            u'"a"=-',
+            u'@=hex:01,02,\\',
+            u'    03',
+            u'"b"=hex(0):',
+            u'',
+            ])
+        self.assertEqual(list(parseReg(StringIO(text.encode('latin-1')))), [
+            (DELETE_KEY, u'HKEY_CURRENT_USER\\Software\\Gone'),
+            (KEY, u'HKCU\\Software\\Here'),
+            (DELETE_VALUE, u'HKCU\\Software\\Here', u'a'),
+            (VALUE, u'HKCU\\Software\\Here', u'', REG_BINARY, '\1\2\3'),
+            (VALUE, u'HKCU\\Software\\Here', u'b', REG_NONE, None),
+            ])
+        for bad in (u'Not a reg file\r\n', u'REGEDIT4\r\n"a"="b"\r\n',
+                u'REGEDIT4\r\n[HKCU\\x]\r\n"a"=dword:xyz\r\n', u'REGEDIT4\r\n[HKCU\\x]\r\n"a\r\n'):
+            self.assertRaises(ValueError, list, parseReg(StringIO(bad.encode('utf-8'))))
+
+    def test_strings_by_header(self):
+        # The hex of strings is ANSI in REGEDIT4 files, and UTF-16 in REGEDIT5
+        for header, encode in ((u'REGEDIT4', lambda text: text.encode('cp1252')),
+                (u'Windows Registry Editor Version 5.00',
+                 lambda text: codecs.BOM_UTF16_LE + text.encode('utf-16-le'))):
+            if header == u'REGEDIT4':
+                expand, multi, sz = u'25,50,41,54,48,25,00', u'61,00,62,00,00', u'80,e9,00'
+            else:
+                expand = u'25,00,50,00,41,00,54,00,48,00,25,00,00,00'
+                multi = u'61,00,00,00,62,00,00,00,00,00'
+                sz = u'ac,20,e9,00,00,00'
+            text = u'\r\n'.join([
+                header,
+                u'[HKEY_CURRENT_USER\\Software\\Imported]',
+                u'"expand"=hex(2):' + expand,
+                u'"multi"=hex(7):' + multi,
+                u'"sz"=hex(1):' + sz,
+                u'',
+                ])
+            backend.setDefault(MemoryRegistry())
+            importReg(StringIO(encode(text)), 'cp1252')
+            key = HKEY_CURRENT_USER / 'Software' / 'Imported'
+            self.assertEqual(type(key['expand']), ExpandingString, header)
+            self.assertEqual(key['expand'], u'%PATH%', header)
+            self.assertEqual(type(key['multi']), MultiString, header)
+            self.assertEqual(key['multi'], [u'a', u'b'], header)
+            self.assertEqual(key['sz'], u'\u20ac\u00e9', header)
+            # And back out (as REGEDIT5) and in again
+            f = StringIO()
+            exportReg(key, f)
+            backend.setDefault(MemoryRegistry())
+            importReg(StringIO(f.getvalue()))
+            self.assertEqual(key['expand'], u'%PATH%', header)
+            self.assertEqual(key['multi'], [u'a', u'b'], header)
+            self.assertEqual(key['sz'], u'\u20ac\u00e9', header)
+
+    def test_deletions(self):
+        text = u'\r\n'.join([
+            u'Windows Registry Editor Version 5.00',
+            u'[-HKEY_CURRENT_USER\\Software\\Export\\k1]',
+            u'[-HKEY_CURRENT_USER\\Software\\Missing]',
+            u'[HKEY_CURRENT_USER\\Software\\Export]',
+            u'"dword"=-',
+            u'"missing"=-',
+            u'"new"="value"',
+            ])
+        self.assertEqual(importReg(StringIO(codecs.BOM_UTF16_LE + text.encode('utf-16-le'))), (3, 3))
+        self.assertFalse('k1' in self.top)
+        self.assertTrue('k2' in self.top)
+        self.assertFalse('dword' in self.top.values)
+        self.assertEqual(self.top['new'], u'value')
+
+    def test_delete_root(self):
+        for root in (u'HKEY_CURRENT_USER', u'HKEY_CURRENT_USER\\', u'HKCU'):
+            text = u'\r\n'.join([
+                u'Windows Registry Editor Version 5.00',
+                u'[HKEY_CURRENT_USER\\Software\\Export]',
+                u'"before"=dword:00000001',
+                u'[-%s]' % root,
+                u'"after"=dword:00000001',
+                ])
+            data = StringIO(codecs.BOM_UTF16_LE + text.encode('utf-16-le'))
+            self.assertRaises(ValueError, importReg, data)
+            self.assertEqual(self.top['before'], 1)
+            self.assertFalse('after' in self.top.values)
+            self.assertEqual((self.top / 'k2' / 'deeper')['n'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for pyreg.scan.
+"""
+import struct, unittest
+from pyreg import backend
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+from pyreg.scan import scan
+
+class ScanTest(unittest.TestCase):
+    def setUp(self):
+        backend.setDefault(MemoryRegistry())
+        self.top = HKEY_CURRENT_USER / 'scan'
+        for i in range(12):
+            for j in range(5):
+                (self.top / ('k%02d' % i) / ('s%d' % j))['v'] = i * j
+        self.walked = [path for path, subkeys, values in self.top.walk()]
+
+    def tearDown(self):
+        backend.setDefault(None)
+
+    def paths(self, *args, **kwargs):
+        return [path for path, subkeys, values in scan(self.top, *args, **kwargs)]
+
+    def test_ordered(self):
+        for maxqueue in (1, 4, 256):
+            self.assertEqual(self.paths(4, True, maxqueue=maxqueue, maxhandles=2), self.walked)
+
+    def test_unordered(self):
+        for maxqueue in (1, 256):
+            self.assertEqual(sorted(self.paths(3, maxqueue=maxqueue)), sorted(self.walked))
+
+    def test_values(self):
+        for path, subkeys, values in scan(self.top, 2, True):
+            if path == u'k03\\s4':
+                self.assertEqual(values['v'], 12)
+
+    def test_limits(self):
+        self.assertEqual(self.paths(3, True, maxdepth=1, prune=lambda p: p > u'k01'),
+            [u'', u'k00', u'k01'])
+
+    def test_cancel(self):
+        s = scan(self.top, 2, True, maxqueue=2)
+        it = iter(s)
+        self.assertEqual(it.next()[0], u'')
+        s.cancel()
+        self.assertEqual(list(it), [])
+        s.join()
+        self.assertFalse([t for t in s._threads if t.isAlive()])
+
+    def test_errors(self):
+        errors = []
+        self.assertEqual(list(scan(HKEY_CURRENT_USER / 'nowhere', onerror=errors.append)), [])
+        self.assertEqual(len(errors), 1)
+
+    def test_failures(self):
+        def prune(path):
+            if path == u'k07':
+                raise RuntimeError(path)
+        for ordered in (False, True):
+            s = scan(self.top, 3, ordered, prune=prune)
+            self.assertRaises(RuntimeError, list, s)
+            s.join()
+            self.assertFalse([t for t in s._threads if t.isAlive()])
+        # A value that can't be read isn't an EnvironmentError either
+        reg = backend.getDefault()
+        handle = reg.OpenKey(backend.HKEY_CURRENT_USER, u'scan\\k03\\s2', 0, backend.KEY_ALL_ACCESS)
+        reg.SetValueEx(handle, u'short', 0, backend.REG_DWORD_BIG_ENDIAN, '\1\2')
+        self.assertRaises(struct.error, list, self.top.walk())
+        for ordered in (False, True):
+            self.assertRaises(struct.error, list, scan(self.top, 3, ordered))
+
+if __name__ == '__main__':
+    unittest.main()
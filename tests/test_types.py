@@ -0,0 +1,222 @@
+"""
+Tests for pyreg.types.
+"""
+import unittest
+from pyreg import backend, types
+from pyreg.backend import _packData, _setData, REG_BINARY, REG_DWORD, REG_DWORD_BIG_ENDIAN, REG_MULTI_SZ, REG_NONE, REG_QWORD, REG_SZ
+from pyreg.batch import Batch
+from pyreg.memory import MemoryRegistry
+from pyreg.roots import HKEY_CURRENT_USER
+from pyreg.types import Binary, BinaryView, DWORD, DWORD_BigEndian, DWORD_LittleEndian, LazyMultiString, MultiString, \
+    QWORD, QWORD_LittleEndian, RegistryType, String, rNone, register, \
+    encodeNumbers, decodeNumbers, _Object2Registry, _Registry2Object
+
+class Version(tuple, RegistryType):
+    """A dotted version number, stored as a string."""
+    def __to_registry__(self):
+        return u'.'.join(map(unicode, self))
+    @classmethod
+    def __from_registry__(cls, v):
+        return cls(map(int, v.split(u'.')))
+
+class DispatchTest(unittest.TestCase):
+    def tearDown(self):
+        types._encoders.pop(Version, None)
+        types._resolved.clear()
+        register(String, REG_SZ, True)
+
+    def test_classes(self):
+        self.assertEqual(_Object2Registry(DWORD(1)), (1, REG_DWORD))
+        self.assertEqual(_Object2Registry(DWORD(0xFFFFFFFF)), (-1, REG_DWORD))
+        self.assertEqual(_Object2Registry(DWORD_LittleEndian(2)), (2, REG_DWORD))
+        self.assertEqual(_Object2Registry(DWORD_BigEndian(1)), ('\0\0\0\1', REG_DWORD_BIG_ENDIAN))
+        self.assertEqual(_Object2Registry(Binary('ab')), ('ab', REG_BINARY))
+        self.assertEqual(type(_Registry2Object(REG_DWORD, -1)), DWORD)
+        self.assertEqual(_Registry2Object(REG_DWORD, -1), 0xFFFFFFFF)
+        self.assertEqual(type(_Registry2Object(99, 'x')), rNone)
+
+    def test_natives(self):
+        self.assertEqual(_Object2Registry(u'x'), (u'x', REG_SZ))
+        self.assertEqual(type(_Object2Registry('x')[0]), String)
+        self.assertEqual(_Object2Registry(7), (7, REG_DWORD))
+        self.assertEqual(_Object2Registry(True), (1, REG_DWORD))
+        self.assertEqual(_Object2Registry(None), ('', REG_NONE))
+        self.assertEqual(_Object2Registry(('a', 'b')), ([u'a', u'b'], REG_MULTI_SZ))
+        self.assertEqual(_Object2Registry(x for x in 'ab'), ([u'a', u'b'], REG_MULTI_SZ))
+        self.assertRaises(TypeError, _Object2Registry, object())
+
+    def test_subclasses(self):
+        class Name(String): pass
+        class Flags(DWORD): pass
+        self.assertEqual(_Object2Registry(Name(u'x')), (u'x', REG_SZ))
+        self.assertEqual(_Object2Registry(Flags(3)), (3, REG_DWORD))
+        # One with its own __to_registry__() is converted by it
+        class Upper(String):
+            def __to_registry__(self):
+                return String(self.upper())
+        self.assertEqual(_Object2Registry(Upper(u'abc')), (u'ABC', REG_SZ))
+
+    def test_register(self):
+        # Unregistered, it still converts itself
+        self.assertEqual(_Object2Registry(Version((1, 2))), (u'1.2', REG_SZ))
+        register(Version, REG_SZ, True)
+        self.assertEqual(_Object2Registry(Version((1, 2))), (u'1.2', REG_SZ))
+        self.assertEqual(_Registry2Object(REG_SZ, u'3.4'), (3, 4))
+        self.assertEqual(type(_Registry2Object(REG_SZ, u'3.4')), Version)
+
+class NumberTest(unittest.TestCase):
+    numbers = [0, 1, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF]
+
+    def test_qword(self):
+        self.assertEqual(QWORD(-1), 0xFFFFFFFFFFFFFFFF)
+        self.assertEqual(_Object2Registry(QWORD(0x0102030405060708)),
+            ('\x08\x07\x06\x05\x04\x03\x02\x01', REG_QWORD))
+        self.assertEqual(_Object2Registry(QWORD_LittleEndian(1))[1], REG_QWORD)
+        backend.setDefault(MemoryRegistry())
+        try:
+            key = HKEY_CURRENT_USER / 'numbers'
+            key['big'] = QWORD(2**40 + 5)
+            self.assertEqual(type(key['big']), QWORD)
+            self.assertEqual(key['big'], 2**40 + 5)
+        finally:
+            backend.setDefault(None)
+
+    def test_batch(self):
+        for cls in (DWORD, DWORD_LittleEndian, DWORD_BigEndian, QWORD, QWORD_LittleEndian):
+            data = encodeNumbers(cls, self.numbers)
+            self.assertEqual(data, [_Object2Registry(cls(n))[0] for n in self.numbers])
+            self.assertEqual(decodeNumbers(cls, data), self.numbers)
+        self.assertEqual(encodeNumbers(QWORD, []), [])
+        self.assertRaises(TypeError, encodeNumbers, String, [1])
+
+class LazyMultiStringTest(unittest.TestCase):
+    strings = [u'spam', u'ab', u'b', u'\u2603 snow', u'x']
+
+    def setUp(self):
+        self.raw = _packData(REG_MULTI_SZ, self.strings)
+        self.lazy = LazyMultiString(self.raw)
+
+    def tearDown(self):
+        register(MultiString, REG_MULTI_SZ, True)
+
+    def test_raw(self):
+        self.assertEqual(len(self.lazy), 5)
+        self.assertEqual(list(self.lazy), self.strings)
+        self.assertEqual(self.lazy[-2], u'\u2603 snow')
+        self.assertEqual(self.lazy, self.strings)
+        self.assertEqual(self.lazy.toUTF16(), self.raw)
+        self.assertEqual(list(LazyMultiString('a\0\0\0b\0\0\0\0\0')), [u'a', u'b'])
+        self.assertEqual(list(LazyMultiString('\0\0')), [])
+        self.assertEqual(LazyMultiString('').toUTF16(), '\0\0')
+
+    def test_contains(self):
+        for s in self.strings:
+            self.assertTrue(s in self.lazy)
+        for s in (u'a', u'pam', u'spamab', u'', u'\u2603', u'\0'):
+            self.assertFalse(s in self.lazy)
+        # Matches that straddle characters don't count
+        self.assertFalse(u'\u6100' in LazyMultiString(u'xa\0'.encode('utf-16-le')))
+
+    def test_slices(self):
+        self.assertEqual(self.lazy[1:3], [u'ab', u'b'])
+        self.assertTrue(self.lazy[1:3]._raw is self.raw)
+        self.assertEqual(self.lazy[1:3].toUTF16(), _packData(REG_MULTI_SZ, [u'ab', u'b']))
+        self.assertFalse(u'spam' in self.lazy[1:3])
+        self.assertEqual(self.lazy[::2], [u'spam', u'b', u'x'])
+        self.assertEqual(self.lazy[3:1], [])
+
+    def test_changes(self):
+        self.lazy.append(42)
+        self.lazy[0] = u'eggs'
+        del self.lazy[1]
+        self.assertEqual(self.lazy, [u'eggs', u'b', u'\u2603 snow', u'x', u'42'])
+        self.assertEqual(self.lazy.toUTF16(), _packData(REG_MULTI_SZ, list(self.lazy)))
+
+    def test_registry(self):
+        backend.setDefault(MemoryRegistry())
+        try:
+            key = HKEY_CURRENT_USER / 'lazy'
+            key['list'] = self.lazy
+            self.assertEqual(type(key['list']), MultiString)
+            register(LazyMultiString, REG_MULTI_SZ, True)
+            value = key['list']
+            self.assertEqual(type(value), LazyMultiString)
+            self.assertTrue(u'ab' in value)
+            self.assertEqual(type(MultiString.__from_registry__([u'a'])), MultiString)
+        finally:
+            backend.setDefault(None)
+
+    def test_written_raw(self):
+        written = []
+        class Spy(MemoryRegistry):
+            def SetValueEx(self, key, name, reserved, typ, value):
+                written.append(value)
+                MemoryRegistry.SetValueEx(self, key, name, reserved, typ, value)
+        backend.setDefault(Spy())
+        try:
+            key = HKEY_CURRENT_USER / 'lazy'
+            key['list'] = self.lazy
+            with Batch(key):
+                key['batched'] = self.lazy
+            # Passed on as it is, and never decoded
+            self.assertTrue(written[0] is self.lazy)
+            self.assertTrue(written[1] is self.lazy)
+            self.assertTrue(self.lazy._items is None and self.lazy._starts is None)
+            self.assertEqual(key['list'], self.strings)
+            self.assertEqual(key['batched'], self.strings)
+        finally:
+            backend.setDefault(None)
+        # _winreg only takes lists
+        self.assertEqual(_setData(object(), REG_MULTI_SZ, self.lazy), self.strings)
+        self.assertEqual(type(_setData(object(), REG_MULTI_SZ, self.lazy)), list)
+
+class BinaryViewTest(unittest.TestCase):
+    data = ''.join(map(chr, range(256))) * 100
+
+    def setUp(self):
+        backend.setDefault(MemoryRegistry())
+        self.key = HKEY_CURRENT_USER / 'binary'
+
+    def tearDown(self):
+        register(Binary, REG_BINARY, True)
+        backend.setDefault(None)
+
+    def test_slices(self):
+        value = BinaryView.__from_registry__(self.data)
+        part = value[1000:2000:]
+        self.assertTrue(part._data is self.data)
+        self.assertEqual(len(part), 1000)
+        self.assertEqual(part, self.data[1000:2000])
+        self.assertEqual(part[10:20], self.data[1010:1020])
+        self.assertEqual(part[-1], self.data[1999])
+        self.assertEqual(str(part.__to_registry__()), self.data[1000:2000])
+        self.assertTrue(value.__to_registry__() is self.data)
+        # Single bytes are strs, whatever the bytes are held in
+        for data in (bytearray('AB'), memoryview('AB'), buffer('AB')):
+            self.assertEqual(BinaryView(data)[0], 'A')
+            self.assertEqual(BinaryView(data)[-1], 'B')
+            self.assertEqual(BinaryView(data)[1:][0], 'B')
+
+    def test_streaming(self):
+        value = BinaryView(bytearray(self.data))
+        buf = bytearray(300)
+        self.assertEqual(value.readinto(buf, len(self.data) - 100), 100)
+        self.assertEqual(buf[:100], self.data[-100:])
+        self.assertEqual(''.join(c.tobytes() for c in value.chunks(1000)), self.data)
+        f = value.reader()
+        f.seek(256)
+        self.assertEqual(f.read(3), '\0\1\2')
+        self.assertEqual(f.tell(), 259)
+
+    def test_registry(self):
+        for v in (buffer(self.data, 5, 10), bytearray('abc'), memoryview('abc')):
+            self.key['v'] = v
+            self.assertEqual(self.key['v'], str(v) if not isinstance(v, memoryview) else v.tobytes())
+        register(BinaryView, REG_BINARY, True)
+        self.key['v'] = BinaryView(self.data)[10:20]
+        value = self.key['v']
+        self.assertEqual(type(value), BinaryView)
+        self.assertEqual(value, self.data[10:20])
+
+if __name__ == '__main__':
+    unittest.main()